@@ -5,6 +5,8 @@ import os
 import argparse
 
 from describe.spec.coordinator import SpecCoordinator
+from describe.spec.finders import SpecFileFinder
+from describe.spec.formatters import StandardResultsFormatter, FormatterGroup
 
 
 class Options(object):
@@ -26,19 +28,141 @@ class Options(object):
             help="Amount of information the runner prints out. (default: %(default)s)")
         parser.add_argument('--trace', '-t', action='store_true',
             help="Prints out full traceback when errors occur (default: %(default)s)")
+        parser.add_argument('--locals', action='store_true',
+            help="Prints the local variables of every frame in the tracebacks of failures. (default: %(default)s)")
         parser.add_argument('--color', '-c', action='store_true',
             help="Prints results in color. (default: %(default)s)")
         parser.add_argument('--version', '-v', action='store_true',
             help="Returns version number of %(prog)s.")
         parser.add_argument('--formatter', '-f', default='standard',
             help="Sets the output format. (Defaults to standard)")
+        parser.add_argument('-k', dest='expressions', metavar='EXPR', action='append', default=[],
+            help="Only runs examples whose prettyprinted path (like 'describe cake it is tasty') or key "
+                 "contains EXPR or matches it as a regular expression. Can be given more than once.")
+        parser.add_argument('--tag', dest='tags', metavar='TAG', action='append', default=[],
+            help="Only runs examples tagged with TAG, by their own or their spec classes' `tags` attribute.")
+        parser.add_argument('--skip-tag', dest='skipped_tags', metavar='TAG', action='append', default=[],
+            help="Doesn't run examples tagged with TAG.")
         parser.add_argument('--include', '-i', dest='paths', metavar='DIR', action='append',
             default=[], help="Adds the given path to sys.path before running.")
+        parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+            help="Runs spec files in N worker processes. (default: %(default)s)")
+        parser.add_argument('--max-files-per-worker', type=int, default=None, metavar='N',
+            help="Replaces a worker process after it has run N spec files. (default: unlimited)")
+        parser.add_argument('--max-worker-rss', type=int, default=None, metavar='MB',
+            help="Replaces a worker process once it uses more than MB megabytes of memory. (default: unlimited)")
+        parser.add_argument('--stream', action='store_true',
+            help="Runs each spec file as soon as it is found, instead of finding all spec files first. "
+                 "The timing history and --failed-first then only reorder examples within each spec file.")
+        parser.add_argument('--ignore', dest='ignore', metavar='GLOB', action='append',
+            default=[], help="Skips files and directories matching the gitignore-style GLOB while looking for specs.")
+        parser.add_argument('--no-gitignore', action='store_true',
+            help="Doesn't skip the files and directories listed in .gitignore files. (default: %(default)s)")
+        parser.add_argument('--zygote', action='store_true',
+            help="Imports the modules spec files depend on once, before starting worker processes. (default: %(default)s)")
+        parser.add_argument('--preload', dest='preload', metavar='MODULE', action='append',
+            default=[], help="Imports the given module once, before starting worker processes.")
+        parser.add_argument('--server', action='store_true',
+            help="Keeps running, executing specs for each --client run in a fresh child process. (default: %(default)s)")
+        parser.add_argument('--client', action='store_true',
+            help="Runs the specs on a running --server instead of in this process. (default: %(default)s)")
+        parser.add_argument('--socket', default=None, metavar='PATH',
+            help="The unix domain socket --server and --client use. (default: .describe/server.sock)")
+        parser.add_argument('--watch', '-w', action='store_true',
+            help="Keeps running, re-running specs affected by changed files. Always runs in a single process. (default: %(default)s)")
+        parser.add_argument('--watch-interval', type=float, default=1.0, metavar='SECONDS',
+            help="How often --watch checks for changed files. (default: %(default)s)")
+        parser.add_argument('--watch-path', dest='watch_paths', metavar='DIR', action='append',
+            default=[], help="Adds a source directory for --watch to check for changes, besides the spec directories.")
+        parser.add_argument('--history', default=None, metavar='PATH',
+            help="Where to remember how long specs take, to run the slowest first. (default: .describe/timings.sqlite3)")
+        parser.add_argument('--no-history', action='store_true',
+            help="Doesn't read or record how long specs take. (default: %(default)s)")
+        parser.add_argument('--index', default=None, metavar='PATH',
+            help="Where to remember which examples spec files contain, to list them without importing them. "
+                 "(default: .describe/index.json)")
+        parser.add_argument('--no-index', action='store_true',
+            help="Doesn't read or record which examples spec files contain. (default: %(default)s)")
+        parser.add_argument('--list', action='store_true',
+            help="Prints the keys of the examples that would run instead of running them. "
+                 "Spec files are parsed instead of imported where possible. (default: %(default)s)")
+        parser.add_argument('--count', action='store_true',
+            help="Prints the number of examples that would run instead of running them. (default: %(default)s)")
+        parser.add_argument('--shard', default=None, metavar='INDEX/COUNT',
+            help="Only runs the INDEX-th of COUNT equal parts of the spec files, starting from 1/COUNT. "
+                 "Every run with the same COUNT and spec files picks the same parts, by a hash of the spec "
+                 "files' module paths unless --shard-history is given.")
+        parser.add_argument('--shard-history', default=None, metavar='PATH',
+            help="Balances the --shard parts by the spec file durations in the timing history at PATH. "
+                 "Every run of the shards must be given the same file, or spec files may be run twice "
+                 "or not at all. (default: not balanced)")
+        parser.add_argument('--results-out', default=None, metavar='FILE',
+            help="Writes the results to FILE, which can be combined with others with `%(prog)s merge`.")
+        parser.add_argument('--durations', type=int, default=None, metavar='N',
+            help="Prints the N slowest examples, with the time spent in their hooks. 0 prints all of them.")
+        parser.add_argument('--profile-tree', action='store_true',
+            help="Prints the total and self time of every example group, and the time spent in its "
+                 "before_all, after_all, before_each, after_each and global run.* functions. (default: %(default)s)")
+        parser.add_argument('--profile', action='store_true',
+            help="Runs every example under cProfile and prints the functions that took the most cumulative "
+                 "time, for the whole run and for the slowest example groups. Always runs in a single process. "
+                 "(default: %(default)s)")
+        parser.add_argument('--profile-out', default=None, metavar='FILE',
+            help="Writes the --profile of the whole run to FILE, for pstats or other profile viewers.")
+        parser.add_argument('--sample-profile', action='store_true',
+            help="Samples the stack every --sample-interval seconds of CPU time, and writes folded stacks "
+                 "for flame graphs, for the whole run and for every sampled example. (default: %(default)s)")
+        parser.add_argument('--sample-out', default=None, metavar='DIR',
+            help="The directory --sample-profile writes its folded stacks to. (default: .describe/samples)")
+        parser.add_argument('--sample-interval', type=float, default=0.005, metavar='SECONDS',
+            help="How often --sample-profile samples the stack. (default: %(default)s)")
+        parser.add_argument('--trace-out', default=None, metavar='FILE',
+            help="Writes a timeline of finding, importing and running the specs to FILE, in the trace event "
+                 "format of chrome://tracing and Perfetto. Parallel runs get a track for every worker.")
+        parser.add_argument('--fail-fast', '-x', action='store_true',
+            help="Stops running examples after the first failure. (default: %(default)s)")
+        parser.add_argument('--max-failures', type=int, default=None, metavar='K',
+            help="Stops running examples after K failures. (default: unlimited)")
+        parser.add_argument('--timeout', type=float, default=None, metavar='SECONDS',
+            help="Fails examples that run longer than SECONDS, unless their group sets its own timeout. (default: none)")
+        parser.add_argument('--group-timeout', type=float, default=None, metavar='SECONDS',
+            help="Fails example groups that run longer than SECONDS, unless they set their own group_timeout. (default: none)")
+        parser.add_argument('--worker-memory-limit', type=int, default=None, metavar='MB',
+            help="Limits the address space of each worker process to MB megabytes. (default: unlimited)")
+        parser.add_argument('--worker-cpu-limit', type=int, default=None, metavar='SECONDS',
+            help="Fails the running example once a worker process spent SECONDS of CPU time on a spec file. (default: unlimited)")
+        parser.add_argument('--failed-first', action='store_true',
+            help="Runs the examples that failed last time before all others. (default: %(default)s)")
+        parser.add_argument('--only-failed', action='store_true',
+            help="Only runs the examples that failed last time, or all if none did. (default: %(default)s)")
+        parser.add_argument('--failures', default=None, metavar='PATH',
+            help="Where to remember which examples failed. (default: .describe/failures.json)")
+        parser.add_argument('--no-failures', action='store_true',
+            help="Doesn't read or record which examples failed. (default: %(default)s)")
 
         parser.add_argument('targets', metavar='SPEC_DIRS_OR_FILES', nargs='*',
             help="The directories or files of specs to run. Defaults to current working directory.")
 
         self.__args = parser.parse_args(args)
+        if self.__args.no_failures and (self.__args.failed_first or self.__args.only_failed):
+            parser.error("--failed-first and --only-failed can't be used together with --no-failures.")
+        if self.__args.sample_profile:
+            from describe.spec.sampling import StackSampler
+            if not StackSampler.is_supported():
+                parser.error("--sample-profile needs signal.setitimer, which this platform doesn't have.")
+            if self.__args.profile or self.__args.profile_out:
+                parser.error("--sample-profile can't be used together with --profile.")
+        if self.__args.shard is not None:
+            from describe.spec.shards import Shard
+            try:
+                Shard.parse(self.__args.shard)
+            except ValueError as e:
+                parser.error(str(e))
+        if self.__args.shard_history is not None:
+            if self.__args.shard is None:
+                parser.error("--shard-history can only be used together with --shard.")
+            if not os.path.isfile(self.__args.shard_history):
+                parser.error("--shard-history %s doesn't exist." % self.__args.shard_history)
         return self
 
     @property
@@ -48,10 +172,171 @@ class Options(object):
     @property
     def should_show_traceback(self): return self.args.trace
     @property
+    def should_show_locals(self): return self.args.locals
+    @property
     def should_use_color(self): return self.args.color
     @property
     def should_show_version(self): return self.args.version
 
+    @property
+    def jobs(self): return max(self.args.jobs, 1)
+    @property
+    def max_files_per_worker(self): return self.args.max_files_per_worker
+    @property
+    def max_worker_rss(self):
+        if self.args.max_worker_rss is None:
+            return None
+        return self.args.max_worker_rss * 1024 * 1024
+
+    @property
+    def should_stream(self): return self.args.stream
+
+    @property
+    def should_use_zygote(self): return self.args.zygote or bool(self.args.preload)
+    @property
+    def preload_modules(self): return self.args.preload
+
+    @property
+    def should_serve(self): return self.args.server
+    @property
+    def should_use_client(self): return self.args.client
+    @property
+    def socket_path(self):
+        from describe.spec.server import default_socket_path
+        return self.args.socket or default_socket_path()
+
+    @property
+    def should_watch(self): return self.args.watch
+    @property
+    def watch_interval(self): return self.args.watch_interval
+    @property
+    def watch_paths(self): return list(self.args.watch_paths) + list(self.args.paths)
+
+    @property
+    def history_path(self):
+        if self.args.no_history:
+            return None
+        from describe.spec.history import default_history_path
+        return self.args.history or default_history_path()
+
+    @property
+    def index_path(self):
+        if self.args.no_index:
+            return None
+        from describe.spec.index import default_index_path
+        return self.args.index or default_index_path()
+
+    def index(self):
+        if self.index_path is None:
+            return None
+        from describe.spec.index import DiscoveryIndex
+        return DiscoveryIndex(self.index_path)
+
+    @property
+    def should_list(self): return self.args.list
+    @property
+    def should_count(self): return self.args.count
+
+    @property
+    def results_path(self): return self.args.results_out
+
+    def durations_report(self):
+        if self.args.durations is None and not self.args.profile_tree:
+            return None
+        from describe.spec.durations import DurationsReport
+        slowest = None if self.args.durations is None else max(self.args.durations, 0)
+        return DurationsReport(slowest=slowest, tree=self.args.profile_tree)
+
+    def profiler(self):
+        if not self.args.profile and not self.args.profile_out:
+            return None
+        from describe.spec.profiling import ExampleProfiler
+        return ExampleProfiler(path=self.args.profile_out)
+
+    def sampler(self):
+        if not self.args.sample_profile:
+            return None
+        from describe.spec.sampling import StackSampler, default_samples_path
+        return StackSampler(self.args.sample_out or default_samples_path(), self.args.sample_interval)
+
+    def tracer(self):
+        if not self.args.trace_out:
+            return None
+        from describe.spec.tracing import Tracer
+        return Tracer(self.args.trace_out)
+
+    @property
+    def max_failures(self):
+        if self.args.fail_fast:
+            return 1
+        return self.args.max_failures
+
+    def timeouts(self):
+        if self.args.timeout is None and self.args.group_timeout is None:
+            return None
+        from describe.spec.runners import Timeouts
+        return Timeouts(self.args.timeout, self.args.group_timeout)
+
+    def worker_limits(self):
+        if self.args.worker_memory_limit is None and self.args.worker_cpu_limit is None:
+            return None
+        from describe.spec.parallel import ResourceLimits
+        memory = self.args.worker_memory_limit and self.args.worker_memory_limit * 1024 * 1024
+        return ResourceLimits(memory, self.args.worker_cpu_limit)
+
+    @property
+    def failures_path(self):
+        if self.args.no_failures:
+            return None
+        from describe.spec.failures import default_failures_path
+        return self.args.failures or default_failures_path()
+
+    def failures(self):
+        if self.failures_path is None:
+            return None
+        from describe.spec.failures import FailureCache
+        return FailureCache(self.failures_path, only_failed=self.args.only_failed)
+
+    @property
+    def should_order_by_failures(self): return self.args.failed_first or self.args.only_failed
+
+    def retention(self):
+        from describe.spec.runners import RetentionPolicy
+        return RetentionPolicy(keep_locals=self.should_show_locals)
+
+    def failure_limit(self):
+        if self.max_failures is None:
+            return None
+        from describe.spec.runners import FailureLimit
+        return FailureLimit(self.max_failures)
+
+    def shard(self):
+        if self.args.shard is None:
+            return None
+        from describe.spec.shards import Shard
+        history = None
+        if self.args.shard_history:
+            from describe.spec.history import TimingHistory
+            history = TimingHistory(self.args.shard_history)
+        return Shard.parse(self.args.shard, history)
+
+    def selection(self):
+        if not (self.args.expressions or self.args.tags or self.args.skipped_tags):
+            return None
+        from describe.spec.selection import Selection
+        return Selection(self.args.expressions, self.args.tags, self.args.skipped_tags)
+
+    def spec_finder(self, selection=None):
+        from describe.spec.finders import StandardSpecFinder
+        return StandardSpecFinder(selection)
+
+    def static_finder(self, spec_finder):
+        from describe.spec.static import StaticSpecFinder
+        return StaticSpecFinder(spec_finder)
+
+    def file_finder(self):
+        return SpecFileFinder(ignore=self.args.ignore, use_gitignore=not self.args.no_gitignore)
+
     @property
     def run_targets(self):
         return self.args.targets or [os.getcwd()]
@@ -66,19 +351,173 @@ class Runner(object):
         self.options_parser = options
 
     def run(self, progn, *args):
+        if args and args[0] == 'merge':
+            return self.merge(progn, args[1:])
         options = self.options_parser.parse(progn, args)
         if options.should_show_version:
             from describe.meta import __version__
             print "Version:", __version__
             return 0
+        if options.should_serve:
+            return self.serve(progn, options)
+        if options.should_use_client:
+            return self.run_on_server(progn, args, options)
+        return self.run_specs(options)
+
+    def run_specs(self, options):
         options.append_paths_to(sys.path)
+        if options.should_list or options.should_count:
+            return self.list_specs(options)
+        if options.should_watch:
+            return self.watch(options)
 
-        # simple for now
-        executor = SpecCoordinator()
+        executor = self.coordinator(options)
         num_successes, num_errors, num_skips = executor.run(options.run_targets)
 
         return num_errors
 
+    def list_specs(self, options):
+        failures = options.failures() if options.should_order_by_failures else None
+        selection = options.selection()
+        spec_finder = options.spec_finder(selection)
+        coordinator = SpecCoordinator(file_finder=options.file_finder(), spec_finder=spec_finder,
+            shard=options.shard(), failures=failures, index=options.index(),
+            static_finder=options.static_finder(spec_finder), selection=selection)
+        entries = coordinator.outline(options.run_targets)
+        keys = [entry.key(names) for entry in entries for names, tags in entry.examples()
+                if not selection or selection.matches(entry.modulepath, names, tags)]
+        if failures is not None and failures.only_failed and failures.keys:
+            keys = [key for key in keys if failures.failed(key)]
+        if options.should_list:
+            for key in keys:
+                print key
+        if options.should_count:
+            print "%d examples in %d spec files." % (len(keys), len(entries))
+        return 0
+
+    def merge(self, progn, args):
+        from describe.spec.results import merge_results, ResultFileError
+        parser = argparse.ArgumentParser(
+            prog=progn + ' merge',
+            description='Combines result files written with --results-out into one report.')
+        parser.add_argument('files', metavar='RESULT_FILE', nargs='+',
+            help="The result files to combine.")
+        files = parser.parse_args(args).files
+
+        formatter = StandardResultsFormatter(pass_char='', fail_char='', skip_char='')
+        try:
+            num_successes, num_errors, num_skips = merge_results(files, formatter)
+        except (IOError, ResultFileError) as e:
+            parser.error(str(e))
+        return num_errors
+
+    def watch(self, options):
+        from describe.spec.watch import SpecWatcher
+        file_finder = options.file_finder()
+        coordinator = SpecCoordinator(file_finder=file_finder, spec_finder=options.spec_finder(options.selection()))
+        watcher = SpecWatcher(coordinator, StandardResultsFormatter,
+            interval=options.watch_interval, watch_paths=options.watch_paths, file_finder=file_finder)
+        return watcher.run(options.run_targets)
+
+    def serve(self, progn, options):
+        from describe.spec.server import SpecServer
+        from describe.spec.parallel import Zygote
+        zygote = Zygote(options.preload_modules, discover=options.args.zygote)
+        spec_files = []
+        if options.args.zygote:
+            coordinator = SpecCoordinator(file_finder=options.file_finder())
+            for target in options.run_targets:
+                spec_files.extend(coordinator.find_spec_files(target))
+        zygote.preload(spec_files)
+
+        def run_request(args):
+            request_options = Options().parse(progn, args)
+            request_options.args.server = request_options.args.client = False
+            return self.run_specs(request_options)
+
+        server = SpecServer(options.socket_path, run_request)
+        print "Listening on", options.socket_path
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    def run_on_server(self, progn, args, options):
+        import socket
+        from describe.spec.server import SpecClient
+        try:
+            return SpecClient(options.socket_path).run(args)
+        except socket.error as e:
+            print >>sys.stderr, "Could not connect to %s (%s), running locally." % (options.socket_path, e)
+            return self.run_specs(options)
+
+    def coordinator(self, options):
+        failures = options.failures()
+        formatters, history = [StandardResultsFormatter()], None
+        if failures is not None:
+            from describe.spec.failures import FailureRecorder
+            formatters.append(FailureRecorder(failures))
+        if options.history_path:
+            from describe.spec.history import TimingHistory, TimingRecorder
+            history = TimingHistory(options.history_path)
+            formatters.append(TimingRecorder(history))
+        if options.results_path:
+            from describe.spec.results import ResultFileWriter
+            formatters.append(ResultFileWriter(options.results_path))
+        durations_report = options.durations_report()
+        if durations_report is not None:
+            formatters.append(durations_report)
+        profiler, sampler = options.profiler(), options.sampler()
+        if profiler is not None:
+            formatters.append(profiler)
+        if sampler is not None:
+            formatters.append(sampler.start())
+        formatter = FormatterGroup(*formatters)
+        tracer = options.tracer()
+        if tracer is not None:
+            from describe.spec.tracing import TracingFormatter
+            formatter = TracingFormatter(formatter, tracer)
+        if not options.should_order_by_failures:
+            failures = None
+        selection = options.selection()
+        spec_finder = options.spec_finder(selection)
+        static_finder = options.static_finder(spec_finder) if selection else None
+
+        # profiles are only collected in this process.
+        if options.jobs > 1 and profiler is None:
+            from describe.spec.parallel import ParallelSpecCoordinator, Zygote
+            zygote = None
+            if options.should_use_zygote:
+                zygote = Zygote(options.preload_modules, discover=options.args.zygote)
+            return ParallelSpecCoordinator(
+                file_finder=options.file_finder(),
+                spec_finder=spec_finder,
+                jobs=options.jobs,
+                max_files_per_worker=options.max_files_per_worker,
+                max_worker_rss=options.max_worker_rss,
+                zygote=zygote,
+                formatter=formatter,
+                history=history,
+                shard=options.shard(),
+                failure_limit=options.failure_limit(),
+                failures=failures,
+                timeouts=options.timeouts(),
+                limits=options.worker_limits(),
+                retention=options.retention(),
+                stream=options.should_stream,
+                static_finder=static_finder,
+                selection=selection,
+                sampler=sampler,
+                tracer=tracer,
+            )
+        return SpecCoordinator(file_finder=options.file_finder(), spec_finder=spec_finder, formatter=formatter,
+            history=history, shard=options.shard(), failure_limit=options.failure_limit(),
+            failures=failures, timeouts=options.timeouts(), retention=options.retention(),
+            stream=options.should_stream, index=options.index(), static_finder=static_finder,
+            selection=selection, profiler=profiler or sampler, tracer=tracer)
+
 
 def main(progn, *args):
     options = Options()
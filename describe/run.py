@@ -16,5 +16,16 @@ class _Collector(object):
     def clear(self):
         self.fns = []
 
-for name in 'before_each before_all after_each after_all'.split(' '):
+    def forget_module(self, module_name):
+        "Removes all the functions defined in the given module."
+        self.fns = [fn for fn in self.fns if getattr(fn, '__module__', None) != module_name]
+
+COLLECTORS = 'before_each before_all after_each after_all'.split(' ')
+
+for name in COLLECTORS:
     globals()[name] = _Collector(name)
+
+def forget_module(module_name):
+    "Removes all the global hooks the given module has registered, usually before reloading it."
+    for name in COLLECTORS:
+        globals()[name].forget_module(module_name)
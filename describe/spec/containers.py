@@ -27,54 +27,99 @@ class SpecFile(object):
         }
 
 
+_EMPTY = {}
+_MISSING = object()
+
+
 class Context(object):
     """An object that the test functions can use to pass data to each other.
 
+    Items and properties set on a context shadow those of its parents, like a chain of
+    dictionaries. The merged view of the whole chain is cached, and only rebuilt after
+    a write to the context or one of its parents.
+
     All public methods are prefixed with an underscore to avoid conflicts.
     """
+    __slots__ = ('_items', '_properties', '_parent', '_views')
+
     def __init__(self, items=None, properties=None, parent=None):
         self._items = dict(items or {})
         self._properties = dict(properties or {})
         self._parent = parent
-        super(self.__class__, self).__init__()
+        # (parent view, merged view) pairs of items and properties.
+        self._views = [None, None, None, None]
+
+    def _view(self, index, own):
+        "Returns the merged dictionary of own with the same view of all the parents."
+        parent_view = _EMPTY if self._parent is None else self._parent._view(index, own)
+        views = self._views
+        if views[index] is parent_view and views[index + 1] is not None:
+            return views[index + 1]
+        values = getattr(self, own)
+        if values:
+            view = dict(parent_view)
+            view.update(values)
+        else:
+            view = parent_view
+        views[index], views[index + 1] = parent_view, view
+        return view
+
+    def _items_view(self):
+        return self._view(0, '_items')
+
+    def _properties_view(self):
+        return self._view(2, '_properties')
 
     def inject_into_self(self, fn):
-        # inject into self
-        if getattr(fn, 'im_self', None):
-            props = self._combined_properties()
-            for name, value in props.items():
-                setattr(fn.im_self, name, value)
+        """Sets all the properties of this context as attributes of the instance of the
+        given method. Only the attributes whose values differ are set again.
+        """
+        instance = getattr(fn, 'im_self', None)
+        if instance:
+            attributes = getattr(instance, '__dict__', None)
+            for name, value in self._properties_view().iteritems():
+                if attributes is None or attributes.get(name, _MISSING) is not value:
+                    setattr(instance, name, value)
 
     def __getitem__(self, name):
-        if name not in self._items and self._parent:
-            return self._parent[name]
-        return self._items[name]
+        return self._items_view()[name]
 
     def __delitem__(self, name):
         del self._items[name]
+        self._views[1] = None
 
     def __setitem__(self, name, value):
         self._items[name] = value
+        self._views[1] = None
+
+    def __contains__(self, name):
+        return name in self._items_view()
 
     def __getattr__(self, name):
-        if name not in self._properties and self._parent:
-            return getattr(self._parent, name)
-        return self._properties[name]
+        if name in Context.__slots__:
+            raise AttributeError(name)
+        try:
+            return self._properties_view()[name]
+        except KeyError:
+            raise AttributeError(name)
 
     def __setattr__(self, name, value):
-        if name in ('_items', '_properties', '_parent'):
-            super(self.__class__, self).__setattr__(name, value)
+        if name in Context.__slots__:
+            super(Context, self).__setattr__(name, value)
         else:
             self._properties[name] = value
+            self._views[3] = None
 
     def __delattr__(self, name):
         del self._properties[name]
+        self._views[3] = None
 
     def __iter__(self):
-        return set(self._items.keys() + iter(self._parent))
+        return iter(self._items_view())
 
     def _update_properties(self, newproperties):
         self._properties.update(newproperties)
+        self._views[3] = None
 
     def _combined_properties(self):
         """Returns a dictionary with this object's properties merged with all its parent's
@@ -83,26 +128,16 @@ class Context(object):
         The returned dictionary is all the available properties for this object (and their
         associated values).
         """
-        result = dict(self._properties)
-        par = self._parent
-        while par:
-            result.update(par._properties)
-            par = par._parent
-        return result
+        return dict(self._properties_view())
 
     def _combined_items(self):
-        """Returns a dictionary with this object's properties merged with all its parent's
-        properties.
+        """Returns a dictionary with this object's items merged with all its parent's
+        items.
 
-        The returned dictionary is all the available properties for this object (and their
+        The returned dictionary is all the available items for this object (and their
         associated values).
         """
-        result = dict(self._items)
-        par = self._parent
-        while par:
-            result.update(par._items)
-            par = par._parent
-        return result
+        return dict(self._items_view())
 
     def __repr__(self):
         return "<%s(%r)[%r]>" % (
@@ -135,9 +170,14 @@ class Failure(object):
 
 class Example(object):
     "Represents an individual behavior to test."
+    __slots__ = ('testfn', '_module', 'timeout', '_before', '_after', 'parents', 'traceback', 'error',
+                 'user_time', 'real_time', 'phase_times', 'stdout', 'stderr', '_identity')
+
     def __init__(self, testfn, before=(), after=(), parents=None, user_time=-1, real_time=-1,
-            error=None, traceback=None, stdout=None, stderr=None):
+            error=None, traceback=None, stdout=None, stderr=None, module=None, timeout=None):
         self.testfn = testfn
+        self._module = module
+        self.timeout = timeout
         self._before = self._filter_callables(before)
         self._after = self._filter_callables(after)
         self.parents = tuple(parents or ())
@@ -145,8 +185,11 @@ class Example(object):
         self.error = error
         self.user_time = user_time
         self.real_time = real_time
+        # the time spent in each of the PHASES of running it, once it has run.
+        self.phase_times = None
         self.stdout = stdout
         self.stderr = stderr
+        self._identity = None
 
     def unittest_equiv(self, context):
         return FunctionTestCase(self.testfn,
@@ -156,6 +199,27 @@ class Example(object):
     def name(self):
         return getattr(self.testfn, '__name__', None) or str(self.testfn)
 
+    @property
+    def module(self):
+        "The name of the module this example was defined in."
+        return self._module or getattr(self.testfn, '__module__', None)
+
+    @property
+    def identity(self):
+        """Identifies this example as a hashable (module, parent names, name) tuple. It is
+        computed once, so it shouldn't be read before the example is fully built.
+        """
+        if self._identity is None:
+            names = tuple(getattr(parent, '__name__', None) or parent.__class__.__name__
+                          for parent in self.parents)
+            self._identity = (self.module, names, self.name)
+        return self._identity
+
+    @property
+    def key(self):
+        "Identifies this example across runs, as 'module:Parent.Child.name'."
+        module, names, name = self.identity
+        return '%s:%s' % (module, '.'.join(names + (name,)))
 
     def __repr__(self):
         return '%s(%s, \n%r)' % (self.__class__.__name__, self.name, self.testfn)
@@ -211,16 +275,80 @@ class ExampleGroupTestSuite(TestSuite):
         return result
 
 
+def _identity(example):
+    return example.identity if isinstance(example, Example) else example
+
+
 class ExampleGroup(Example):
-    "Represents a collection of examples to run."
+    """Represents a collection of examples to run.
+
+    Examples are indexed by their identity and name, so checking if the group contains
+    an example or looking one up by name doesn't have to compare it to every example.
+
+    Instead of examples, a loader can be given: a function that returns the examples
+    once they are first needed. Loaded examples can be let go of again with release().
+    """
+    __slots__ = ('_examples', '_index', '_names', '_indexed_length', '_loader')
+
     def __init__(self, obj, before=(), after=(), parents=None, examples=None, user_time=-1,
-            real_time=-1, error=None, traceback=None):
-        self.examples = list(examples or [])
+            real_time=-1, error=None, traceback=None, module=None, timeout=None, loader=None):
+        self.examples = examples or []
+        if loader is not None and examples is None:
+            self._examples, self._loader = None, loader
         super(ExampleGroup, self).__init__(
             obj, [CallOnce(before)], [CallOnce(after)], parents,
-            user_time, real_time, error, traceback, None, None
+            user_time, real_time, error, traceback, None, None, module, timeout
         )
 
+    @property
+    def examples(self):
+        if self._examples is None:
+            self._examples = list(self._loader())
+        return self._examples
+
+    @examples.setter
+    def examples(self, examples):
+        self._examples = list(examples)
+        self._index = self._names = None
+        self._loader = None
+
+    @property
+    def is_loaded(self):
+        "False if the examples haven't been loaded yet."
+        return self._examples is not None
+
+    def release(self):
+        "Lets go of loaded examples, if they can be loaded again."
+        if self._loader is not None:
+            self._examples = self._index = self._names = None
+
+    def transform(self, fn):
+        """Replaces the examples with those fn returns for them. Groups with a loader keep
+        it, fn is applied to the examples every time they are loaded.
+        """
+        loader = self._loader
+        if self._examples is not None:
+            self._examples = list(fn(self._examples))
+            self._index = self._names = None
+        if loader is not None:
+            self._loader = lambda: fn(loader())
+
+    def _build_index(self):
+        # also rebuilt when examples were added to the list directly.
+        examples = self.examples
+        if self._index is None or self._indexed_length != len(examples):
+            self._index, self._names = {}, {}
+            for example in examples:
+                self._add_to_index(example)
+            self._indexed_length = len(examples)
+        return self._index
+
+    def _add_to_index(self, example):
+        self._index.setdefault(_identity(example), example)
+        name = getattr(example, 'name', None)
+        if isinstance(name, basestring):
+            self._names.setdefault(name, example)
+
     def unittest_equiv(self, context):
         return ExampleGroupTestSuite(
             [ex.unittest_equiv(context) for ex in self.examples],
@@ -249,11 +377,19 @@ class ExampleGroup(Example):
     def append(self, example):
         if example not in self:
             self.examples.append(example)
+            self._add_to_index(example)
+            self._indexed_length += 1
         return self
 
     def remove(self, example):
         self.examples.remove(example)
+        self._index = self._names = None
+
+    def get(self, name, default=None):
+        "Returns the (first) example with the given name."
+        self._build_index()
+        return self._names.get(name, default)
 
     def __contains__(self, example):
-        return example in self.examples
+        return _identity(example) in self._build_index()
 
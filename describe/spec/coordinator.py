@@ -2,35 +2,228 @@ import os
 import sys
 
 from describe.spec.finders import SpecFileFinder, StandardSpecFinder
-from describe.spec.runners import ExampleRunner
+from describe.spec.runners import ExampleRunner, RetentionPolicy
 from describe.spec.formatters import StandardResultsFormatter
+from describe.spec.containers import ExampleGroup
+from describe.spec.ignore import unique_directories
+from describe.spec.index import IndexEntry
+from describe.spec.utils import clock
 
 
 class SpecCoordinator(object):
-    """Performs the finding and execution of specs."""
-    def __init__(self, file_finder=None, spec_finder=None, formatter=None):
+    """Performs the finding and execution of specs.
+
+    Spec files are found by the file_finder, the specs in them by the spec_finder, and
+    their results are recorded by the formatter. The other options are described by the
+    methods that use them.
+    """
+    def __init__(self, file_finder=None, spec_finder=None, formatter=None, history=None, shard=None,
+            failure_limit=None, failures=None, timeouts=None, retention=None, stream=False, index=None,
+            static_finder=None, selection=None, profiler=None, tracer=None):
         self.file_finder = file_finder or SpecFileFinder()
         self.spec_finder = spec_finder or StandardSpecFinder()
         self.formatter = formatter or StandardResultsFormatter()
+        self.history = history
+        self.shard = shard
+        self.failure_limit = failure_limit
+        self.failures = failures
+        self.timeouts = timeouts
+        self.retention = retention or RetentionPolicy()
+        self.stream = stream
+        self.index = index
+        self.static_finder = static_finder
+        self.selection = selection
+        self.profiler = profiler
+        self.tracer = tracer
+
+    def find_spec_files(self, directory):
+        """Finds all spec files in a given directory without importing them. Returns a list
+        of (directory, filepath, modulepath) tuples.
+        """
+        return list(self.walk_spec_files(directory))
+
+    def walk_spec_files(self, directory):
+        "Like find_spec_files, but yields the tuples as they are found."
+        directory = os.path.abspath(directory)
+        found = self.file_finder.walk(directory)
+        if self.tracer is not None:
+            found = self._trace_walk(directory, found)
+        for filepath, modulepath in found:
+            yield directory, filepath, modulepath
+
+    def _trace_walk(self, directory, found):
+        "Adds a span for the walking it takes to find each spec file."
+        found = iter(found)
+        while True:
+            start = clock()
+            try:
+                filepath, modulepath = next(found)
+            except StopIteration:
+                self.tracer.add('walk', 'discovery', start, clock(), {'directory': directory})
+                return
+            self.tracer.add('walk', 'discovery', start, clock(), {'directory': directory, 'found': filepath})
+            yield filepath, modulepath
+
+    def stream_spec_files(self, directories):
+        """Yields the (directory, filepath, modulepath) tuples of the spec files to run in
+        all the given directories, as they are found. Shards must already be assigned.
+        """
+        for spec_file in self._stream_candidates(directories):
+            if self.may_select(spec_file):
+                yield spec_file
+
+    def _stream_candidates(self, directories):
+        for directory in directories:
+            for spec_file in self.walk_spec_files(directory):
+                if self.shard is not None and not self.shard.includes(spec_file[2]):
+                    continue
+                if self.failures is not None and not self.failures.select([spec_file]):
+                    continue
+                yield spec_file
+
+    def may_select(self, spec_file):
+        """Returns False if the outline of the (directory, filepath, modulepath) spec file
+        (from the index or the static_finder) shows that none of its examples are selected.
+        Never imports the spec file.
+        """
+        if not self.selection:
+            return True
+        entry = self._entry(spec_file, load=False)
+        return entry is None or self.selection.selects(entry)
+
+    def assign_shards(self, directories):
+        "Assigns the spec files of all the given directories to shards at once."
+        spec_files = []
+        for directory in directories:
+            spec_files.extend(self.find_spec_files(directory))
+        self.shard.assign(modulepath for _, _, modulepath in spec_files)
 
     def find_specs(self, directory):
         """Finds all specs in a given directory. Returns a list of
         Example and ExampleGroup instances.
+
+        Only the spec files of the shard (or with failures, for an only_failed FailureCache)
+        are imported. Given a Selection (which the spec_finder should also use), neither
+        are spec files whose outline shows no selected examples (see may_select).
         """
         specs = []
-        spec_files = self.file_finder.find(directory)
+        if self.shard is not None or self.failures is not None or self.selection or self.tracer is not None:
+            spec_files = self.find_spec_files(directory)
+            if self.shard is not None:
+                spec_files = self.shard.select(spec_files)
+            if self.failures is not None:
+                spec_files = self.failures.select(spec_files)
+            spec_files = [self.load_spec_file(spec_file) for spec_file in spec_files
+                          if self.may_select(spec_file)]
+        else:
+            spec_files = self.file_finder.find(directory)
         for spec_file in spec_files:
-            specs.extend(self.spec_finder.find(spec_file.module))
+            self._index(spec_file)
+            specs.extend(self.extract_specs(spec_file))
         return specs
 
+    def load_spec_file(self, spec_file):
+        "Imports the (directory, filepath, modulepath) spec file. Returns its SpecFile."
+        if self.tracer is None:
+            return self.file_finder.load(*spec_file)
+        with self.tracer.span(spec_file[2], 'import', file=spec_file[1]):
+            return self.file_finder.load(*spec_file)
+
+    def extract_specs(self, spec_file):
+        "Returns the list of specs the spec_finder finds in an imported SpecFile."
+        if self.tracer is None:
+            return list(self.spec_finder.find(spec_file.module))
+        with self.tracer.span(spec_file.modulepath, 'extract'):
+            return list(self.spec_finder.find(spec_file.module))
+
+    def _index(self, spec_file):
+        """Stores the outline of an imported spec file in the DiscoveryIndex, unless it is
+        already there, so outline() can describe it later without importing it again.
+        """
+        if self.index is not None and self.index.lookup(spec_file.filepath) is None:
+            self.index.update(spec_file.filepath, spec_file.modulepath, self.spec_finder.outline(spec_file.module))
+
+    def _entry(self, spec_file, load=True):
+        """Returns the IndexEntry of the (directory, filepath, modulepath) spec file, from
+        the index or the static_finder if possible. Otherwise, the spec file is imported,
+        unless load is False, in which case None is returned.
+        """
+        directory, filepath, modulepath = spec_file
+        entry = self.index.lookup(filepath, modulepath) if self.index is not None else None
+        if entry is not None:
+            return entry
+        # the file may change while it is being read.
+        stat = os.stat(filepath)
+        outlines = None
+        if self.static_finder is not None:
+            outlines = self.static_finder.outline_file(filepath)
+        if outlines is None:
+            if not load:
+                return None
+            outlines = self.spec_finder.outline(self.load_spec_file(spec_file).module)
+        if self.index is not None:
+            return self.index.update(filepath, modulepath, outlines, stat)
+        return IndexEntry(filepath, modulepath, stat.st_mtime, stat.st_size, outlines)
+
+    def outline(self, directories=None):
+        """Returns an IndexEntry for every spec file that would run in the given
+        directories, leaving out those without selected examples. Spec files the index
+        doesn't know about are parsed by the static_finder, and only imported if that
+        isn't possible.
+        """
+        if directories is None:
+            directories = [os.getcwd()]
+        directories = unique_directories(directories)
+        if self.shard is not None:
+            self.assign_shards(directories)
+        entries = []
+        for spec_file in self._stream_candidates(directories):
+            entry = self._entry(spec_file)
+            if not self.selection or self.selection.selects(entry):
+                entries.append(entry)
+        if self.index is not None:
+            self.index.save()
+        return entries
+
+    def _stream_specs(self, directories):
+        "Imports the spec files one at a time, yielding the specs of each."
+        for spec_file in self.stream_spec_files(directories):
+            if self.failure_limit is not None and self.failure_limit.reached:
+                break
+            spec_file = self.load_spec_file(spec_file)
+            self._index(spec_file)
+            yield self.extract_specs(spec_file)
+
     def execute(self, example_groups):
         """Runs the specs. Returns a tuple indicating the
         number of (succeses, failures, skipped)>
+
+        A TimingHistory given as history runs the slowest example groups first, and a
+        FailureCache given as failures runs the examples that failed last time first (or
+        only those). No more examples are started once the failure_limit is reached.
+
+        The runners use the default timeouts, enable the profiler while examples run and
+        add spans to the tracer. The RetentionPolicy releases the output of passing
+        examples by default, and example groups are let go of once they have run (see
+        ExampleGroup.release).
         """
+        if self.history is not None:
+            example_groups = self.history.longest_first(example_groups, 'group', key=lambda group: group.key)
+        if self.failures is not None:
+            example_groups = self.failures.order(example_groups)
         total_successes, total_errors, total_skipped = 0, 0, 0
-        for group in example_groups:
-            runner = ExampleRunner(group, self.formatter)
+        # popped off as they run, so finished groups can be freed.
+        pending = list(reversed(example_groups))
+        del example_groups
+        while pending:
+            if self.failure_limit is not None and self.failure_limit.reached:
+                break
+            group = pending.pop()
+            runner = ExampleRunner(group, self.formatter, self.failure_limit, self.timeouts,
+                                   self.retention, self.profiler, self.tracer)
             successes, errors, skips = runner.run()
+            if isinstance(group, ExampleGroup):
+                group.release()
             total_successes += successes
             total_errors += errors
             total_skipped += skips
@@ -39,18 +232,30 @@ class SpecCoordinator(object):
     def run(self, directories=None):
         """Finds and runs the specs. Returns a tuple indicating the
         number of (succeses, failures, skipped)>
+
+        With stream, every spec file is imported and run as soon as it is found, instead of
+        importing all the spec files of a directory first. The history and failures then
+        only reorder the examples within each spec file.
         """
         if directories is None:
             directories = [os.getcwd()]
+        directories = unique_directories(directories)
+        if self.shard is not None:
+            self.assign_shards(directories)
 
+        if self.stream:
+            batches = self._stream_specs(directories)
+        else:
+            batches = (self.find_specs(directory) for directory in directories)
         total_successes, total_errors, total_skipped = 0, 0, 0
-        for directory in directories:
-            successes, errors, skips = self.execute(self.find_specs(directory))
+        for specs in batches:
+            successes, errors, skips = self.execute(specs)
             total_successes += successes
             total_errors += errors
             total_skipped += skips
 
-
         self.formatter.finalize()
+        if self.index is not None:
+            self.index.save()
         return total_successes, total_errors, total_skipped
 
@@ -0,0 +1,167 @@
+"""durations.py - Reports where the time of a run went.
+
+DurationsReport is a formatter that prints the slowest examples and a tree of the
+example groups with their total time, their self time (the time that wasn't spent in
+the examples and groups inside them) and the time spent in each kind of hook.
+
+The time of an example or group is split into the PHASES a Benchmark laps: the
+global run.* functions, the before functions, the example itself (or the examples of
+a group), the after functions and the global run.* functions again. Results without
+phase times, like those of old result files, count as all example.
+"""
+import sys
+import heapq
+
+from describe.spec.formatters import prettyprint
+from describe.spec.utils import PHASES, EXAMPLE_PHASE_NAMES, GROUP_PHASE_NAMES
+
+
+GLOBAL_SETUP, SETUP, BODY, TEARDOWN, GLOBAL_TEARDOWN = range(len(PHASES))
+
+
+def format_seconds(seconds):
+    return '%.4fs' % seconds
+
+
+def format_times(items):
+    "Formats (name, seconds) tuples, leaving out those that took no measurable time."
+    return ', '.join('%s %s' % (name, format_seconds(seconds))
+                     for name, seconds in items if seconds >= 0.00005)
+
+
+class GroupTimes(object):
+    "The timings of an example group, with those of the examples directly in it added up."
+    __slots__ = ('name', 'depth', 'total', 'children', 'phase_times', 'example_phase_times')
+
+    def __init__(self, name, depth):
+        self.name, self.depth = name, depth
+        self.total = self.children = 0.0
+        self.phase_times = None
+        self.example_phase_times = [0.0] * len(PHASES)
+
+    def __repr__(self):
+        return "GroupTimes(%r, total=%r, self=%r)" % (self.name, self.total, self.self_time)
+
+    @property
+    def self_time(self):
+        return max(self.total - self.children, 0.0)
+
+    def hooks(self):
+        "Returns (name, seconds) tuples of the time spent in each kind of hook."
+        own = self.phase_times or (0.0,) * len(PHASES)
+        examples = self.example_phase_times
+        return [
+            (GROUP_PHASE_NAMES[SETUP], own[SETUP]),
+            (GROUP_PHASE_NAMES[TEARDOWN], own[TEARDOWN]),
+            (EXAMPLE_PHASE_NAMES[SETUP], examples[SETUP]),
+            (EXAMPLE_PHASE_NAMES[TEARDOWN], examples[TEARDOWN]),
+            (EXAMPLE_PHASE_NAMES[GLOBAL_SETUP], own[GLOBAL_SETUP] + examples[GLOBAL_SETUP]),
+            (EXAMPLE_PHASE_NAMES[GLOBAL_TEARDOWN], own[GLOBAL_TEARDOWN] + examples[GLOBAL_TEARDOWN]),
+        ]
+
+
+class DurationsReport(object):
+    """A formatter that prints where the time of a run went when finalized.
+
+    Parameters:
+        - slowest is the number of slowest examples to print. 0 prints all of them and
+          None none of them.
+        - tree prints the times of every example group, in the order they ran.
+    """
+    def __init__(self, stdout=sys.stdout, slowest=10, tree=False):
+        self.stdout = stdout
+        self.slowest, self.tree = slowest, tree
+        self.examples = []
+        self.groups = []
+        self._stack = []
+        self._count = 0
+
+    def __repr__(self):
+        return "DurationsReport(slowest=%r, tree=%r)" % (self.slowest, self.tree)
+
+    def start_example_group(self, example):
+        group = GroupTimes(example.name, len(self._stack))
+        self._stack.append(group)
+        if self.tree:
+            self.groups.append(group)
+
+    def end_example_group(self, example):
+        group = self._stack.pop()
+        group.total = max(example.real_time, 0.0)
+        group.phase_times = example.phase_times
+        if self._stack:
+            self._stack[-1].children += group.total
+
+    def skip_example_group(self, example):
+        pass
+
+    def record_example(self, example):
+        real_time = max(example.real_time, 0.0)
+        phase_times = example.phase_times
+        if self._stack:
+            parent = self._stack[-1]
+            parent.children += real_time
+            if phase_times:
+                totals = parent.example_phase_times
+                for i, seconds in enumerate(phase_times):
+                    totals[i] += seconds
+        if self.slowest is not None:
+            self._keep(real_time, example.name, phase_times)
+        return not example.error
+
+    def skip_example(self, example):
+        pass
+
+    def finalize(self):
+        if self.slowest is not None:
+            self._write_slowest()
+        if self.tree:
+            self._write_tree()
+        self.examples, self.groups, self._count = [], [], 0
+
+    #################### Internal Methods ####################
+    def _keep(self, real_time, name, phase_times):
+        # only the slowest examples are kept, so the names of the path are only joined
+        # for examples that make it in.
+        self._count += 1
+        examples = self.examples
+        if self.slowest and len(examples) >= self.slowest and real_time <= examples[0][0]:
+            return
+        path = [group.name for group in self._stack] + [name]
+        item = (real_time, -self._count, path, phase_times)
+        if self.slowest and len(examples) >= self.slowest:
+            heapq.heapreplace(examples, item)
+        else:
+            heapq.heappush(examples, item)
+
+    def _path(self, names):
+        return ' '.join(' '.join(prettyprint(name).split()) for name in names)
+
+    def _write(self, line=''):
+        self.stdout.write(line + '\n')
+
+    def _write_slowest(self):
+        examples = sorted(self.examples, reverse=True)
+        if not examples:
+            return
+        self._write()
+        self._write("Slowest %d examples:" % len(examples))
+        for real_time, _, path, phase_times in examples:
+            self._write("  %10s  %s" % (format_seconds(real_time), self._path(path)))
+            phases = format_times(zip(EXAMPLE_PHASE_NAMES, phase_times or ()))
+            if phases:
+                self._write("  %10s  %s" % ('', phases))
+
+    def _write_tree(self):
+        if not self.groups:
+            return
+        self._write()
+        self._write("Example group times:")
+        self._write("  %10s  %10s  %s" % ('total', 'self', 'group'))
+        for group in self.groups:
+            indent = '  ' * group.depth
+            self._write("  %10s  %10s  %s%s" % (format_seconds(group.total), format_seconds(group.self_time),
+                                                indent, self._path([group.name])))
+            hooks = format_times(group.hooks())
+            if hooks:
+                self._write("  %10s  %10s  %s  %s" % ('', '', indent, hooks))
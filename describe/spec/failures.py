@@ -0,0 +1,161 @@
+"""failures.py - Remembers which examples failed, to run them again first (or only).
+
+FailureCache stores the keys of failed examples (and example groups whose before or
+after functions failed) in a JSON file. With it, a coordinator only imports the spec
+files that contain failures and can prune their example groups down to the failed
+examples, or run the failed examples ahead of everything else.
+"""
+import json
+
+from describe.spec.containers import ExampleGroup
+from describe.spec.utils import describe_path, ensure_directory
+
+
+def default_failures_path(directory=None):
+    return describe_path('failures.json', directory)
+
+
+def _key_prefixes(key):
+    "Yields the keys of the example groups that contain the example with the given key."
+    module, _, path = key.partition(':')
+    names = path.split('.')
+    for i in range(1, len(names)):
+        yield '%s:%s' % (module, '.'.join(names[:i]))
+
+
+class FailureCache(object):
+    """The failures of the last run, stored as JSON at the given path.
+
+    If only_failed is True, only the failed examples are selected to run. Otherwise,
+    every example is run, but the failed ones first. When there are no known
+    failures, everything is run as usual.
+    """
+    def __init__(self, path, only_failed=False):
+        self.path = path
+        self.only_failed = only_failed
+        self._keys = None
+        self._prefixes = None
+
+    def __repr__(self):
+        return "FailureCache(%r, only_failed=%r)" % (self.path, self.only_failed)
+
+    @property
+    def keys(self):
+        "The set of keys of the examples and example groups that failed."
+        if self._keys is None:
+            self._keys = set()
+            try:
+                with open(self.path) as handle:
+                    self._keys = set(key.encode('utf-8') for key in json.load(handle))
+            except (IOError, ValueError, TypeError, AttributeError):
+                pass
+        return self._keys
+
+    @property
+    def prefixes(self):
+        "The keys of every example group that contains a failure."
+        if self._prefixes is None:
+            self._prefixes = set()
+            for key in self.keys:
+                self._prefixes.update(_key_prefixes(key))
+        return self._prefixes
+
+    @property
+    def modules(self):
+        return set(key.partition(':')[0] for key in self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, failed, passed):
+        """Adds the failed keys and removes the passed keys. Failures of examples that
+        weren't run this time are kept. Returns True if successfully saved.
+        """
+        keys = (self.keys - set(passed)) | set(failed)
+        self._keys, self._prefixes = keys, None
+        try:
+            ensure_directory(self.path)
+            with open(self.path, 'w') as handle:
+                json.dump(sorted(keys), handle, indent=0)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def failed(self, key):
+        "Returns True if the example (or a group containing it) with the given key failed."
+        return key in self.keys or any(prefix in self.keys for prefix in _key_prefixes(key))
+
+    def contains_failure(self, key):
+        "Returns True if the given key failed or is a group containing a failure."
+        return key in self.prefixes or self.failed(key)
+
+    def select(self, spec_files):
+        """Filters (only_failed) or reorders the given (directory, filepath, modulepath)
+        tuples so that the spec files with failures come first.
+        """
+        if not self.keys:
+            return list(spec_files)
+        modules = self.modules
+        if self.only_failed:
+            return [spec_file for spec_file in spec_files if spec_file[2] in modules]
+        return sorted(spec_files, key=lambda spec_file: spec_file[2] not in modules)
+
+    def order(self, examples):
+        """Prunes (only_failed) or reorders the given examples and the examples of their
+        groups, so that the failed ones come first. Returns the new list of examples.
+
+        Groups that load their examples lazily aren't loaded, their examples are pruned or
+        reordered once they are.
+        """
+        if not self.keys:
+            return list(examples)
+        if self.only_failed:
+            return self._prune(examples)
+        return self._failed_first(examples)
+
+    def _prune(self, examples):
+        pruned = []
+        for example in examples:
+            if self.failed(example.key):
+                pruned.append(example)
+            elif isinstance(example, ExampleGroup) and example.key in self.prefixes:
+                example.transform(self._prune)
+                if not example.is_loaded or len(example):
+                    pruned.append(example)
+        return pruned
+
+    def _failed_first(self, examples):
+        for example in examples:
+            if isinstance(example, ExampleGroup):
+                example.transform(self._failed_first)
+        return sorted(examples, key=lambda example: not self.contains_failure(example.key))
+
+
+class FailureRecorder(object):
+    "A formatter that records which examples failed or passed into a FailureCache."
+    def __init__(self, cache):
+        self.cache = cache
+        self.failed, self.passed = [], []
+
+    def __repr__(self):
+        return "FailureRecorder(%r)" % (self.cache,)
+
+    def start_example_group(self, example):
+        pass
+
+    def end_example_group(self, example):
+        (self.failed if example.error else self.passed).append(example.key)
+
+    def skip_example_group(self, example):
+        pass
+
+    def record_example(self, example):
+        (self.failed if example.error else self.passed).append(example.key)
+        return not example.error
+
+    def skip_example(self, example):
+        pass
+
+    def finalize(self):
+        self.cache.update(self.failed, self.passed)
+        self.failed, self.passed = [], []
@@ -1,11 +1,20 @@
 import os
 import sys
 import inspect
+from functools import partial
 from cStringIO import StringIO
 
+try:
+    from scandir import scandir
+except ImportError:
+    scandir = getattr(os, 'scandir', None)
+
 from describe.utils import Replace
 from describe.spec.utils import locals_from_function
 from describe.spec.containers import SpecFile, Context, Example, ExampleGroup
+from describe.spec.ignore import IgnoreRules, DEFAULT_IGNORES
+from describe.spec.index import Outline
+from describe.spec.selection import get_tags
 
 
 class StandardSpecFinder(object):
@@ -13,20 +22,42 @@ class StandardSpecFinder(object):
 
     Behaves more like traditional python testers - nose, py.test, etc.
 
+    Spec classes can set `timeout` to the number of seconds each of their examples
+    (including those of nested contexts) may take, and `group_timeout` to the number of
+    seconds the whole group may take. Example methods can set their own `timeout`.
+
+    Spec classes are instantiated as they are found, but the examples and contexts
+    inside them are only looked for once the group's examples are first needed.
+    outline() describes the same specs from the classes alone, without instantiating them.
+
+    With a Selection, examples and groups without selected examples are left out
+    before their classes are instantiated, so none of their code runs.
     """
+    hooks = ('before_all', 'after_all', 'before_each', 'after_each')
+
+    def __init__(self, selection=None):
+        self.selection = selection
+
+    def is_spec_name(self, name):
+        return name.startswith('describe_') or name.startswith('Describe')
+
+    def is_context_name(self, name):
+        return self.is_spec_name(name) or (
+            name.startswith('context_') or name.startswith('Context') or
+            name.startswith('when_') or name.startswith('When')
+        )
+
+    def is_example_name(self, name):
+        return name.lower().startswith('it_')
+
     def is_spec(self, name, obj):
-        return (name.startswith('describe_') or name.startswith('Describe')) and inspect.isclass(obj)
+        return self.is_spec_name(name) and inspect.isclass(obj)
 
     def is_context(self, name, obj):
-        return self.is_spec(name, obj) or (
-            (
-             name.startswith('context_') or name.startswith('Context') or
-             name.startswith('when_') or name.startswith('When')
-            ) and inspect.isclass(obj)
-        )
+        return self.is_context_name(name) and inspect.isclass(obj)
 
     def is_example(self, name, obj, parent_before_each=None, parent_after_each=None):
-        return name.lower().startswith('it_') and callable(obj)
+        return self.is_example_name(name) and callable(obj)
 
     def _is_valid(self, name, obj):
         return self.is_spec(name, obj) or self.is_context(name, obj) or self.is_example(name, obj)
@@ -37,46 +68,118 @@ class StandardSpecFinder(object):
             return (method,)
         return ()
 
-    def __extract_examples(self, name, obj, parents=(), parent_before_each=(), parent_after_each=()):
+    def __extract_hook(self, obj, name):
+        method = getattr(obj, name, None)
+        if callable(method):
+            return method
+        return None
+
+    def __selected_names(self, name, obj):
+        """Returns the names of the selected examples of a spec and of the groups they are in,
+        or None to select everything.
+        """
+        if not self.selection:
+            return None
+        module = getattr(obj, '__module__', None)
+        return self.selection.selected_names(module, self.__outline(name, obj))
+
+    def __extract_examples(self, name, obj, parents=(), parent_before_each=(), parent_after_each=(),
+            parent_timeout=None, names=(), selected=None):
         if self.is_spec(name, obj) or self.is_context(name, obj):
             instance = obj()
             before_each = parent_before_each + self.__extract_method(instance, 'before_each')
             after_each = parent_after_each + self.__extract_method(instance, 'after_each')
-            newparents = parents + (instance,)
-            examples = []
-            for n in dir(instance):
-                subobj = getattr(instance, n)
-                if self._is_valid(n, subobj):
-                    example = self.__extract_examples(n, subobj, newparents, before_each, after_each)
-                    if example:
-                        examples.append(example)
+            timeout = getattr(instance, 'timeout', parent_timeout)
             return ExampleGroup(
                 getattr(obj, '__name__', None),
-                before=self.__extract_method(instance, 'before_all'),
-                after=self.__extract_method(instance, 'after_all'),
+                before=self.__extract_hook(instance, 'before_all'),
+                after=self.__extract_hook(instance, 'after_all'),
                 parents=parents,
-                examples=examples
+                module=getattr(obj, '__module__', None),
+                timeout=getattr(instance, 'group_timeout', None),
+                loader=partial(self.__extract_contents, instance, parents + (instance,),
+                               before_each, after_each, timeout,
+                               names + (getattr(obj, '__name__', name),), selected),
             )
         elif self.is_example(name, obj):
             before_each = parent_before_each + self.__extract_method(obj, 'before_each')
             after_each = parent_after_each + self.__extract_method(obj, 'after_each')
-            return Example(obj, parents=parents, before=before_each, after=after_each)
+            return Example(obj, parents=parents, before=before_each, after=after_each,
+                timeout=getattr(obj, 'timeout', parent_timeout))
         else:
             return None
 
+    def __extract_contents(self, instance, parents, before_each, after_each, timeout, names, selected):
+        examples = []
+        for n in dir(instance):
+            subobj = getattr(instance, n)
+            if not self._is_valid(n, subobj):
+                continue
+            if selected is None or names + (getattr(subobj, '__name__', n),) in selected:
+                example = self.__extract_examples(n, subobj, parents, before_each, after_each, timeout,
+                                                  names, selected)
+                if example:
+                    examples.append(example)
+        return examples
+
+    def __outline(self, name, obj):
+        if self.is_spec(name, obj) or self.is_context(name, obj):
+            children = []
+            for n in dir(obj):
+                subobj = getattr(obj, n)
+                if self._is_valid(n, subobj):
+                    children.append(self.__outline(n, subobj))
+            hooks = any(callable(getattr(obj, hook, None)) for hook in self.hooks)
+            return Outline(getattr(obj, '__name__', name), True, hooks, children, get_tags(obj))
+        return Outline(getattr(obj, '__name__', name), tags=get_tags(obj))
+
+    def outline(self, module):
+        "Returns Outlines of the specs find() would return for the module, in the same order."
+        outlines = []
+        for name in dir(module):
+            obj = getattr(module, name)
+            if self._is_valid(name, obj):
+                outlines.append(self.__outline(name, obj))
+        return outlines
+
     def find(self, module):
         specs = []
         for name in dir(module):
             obj = getattr(module, name)
-            if self._is_valid(name, obj):
-                specs.append(self.__extract_examples(name, obj))
+            if not self._is_valid(name, obj):
+                continue
+            # the spec is outlined once, for all of its nested groups.
+            selected = self.__selected_names(name, obj)
+            if selected is None or (getattr(obj, '__name__', name),) in selected:
+                specs.append(self.__extract_examples(name, obj, selected=selected))
         return ExampleGroup('Specs', examples=specs)
 
+def _list_directory(path):
+    "Returns (name, is_directory, is_link) tuples for the entries of the given directory."
+    if scandir is not None:
+        return [(entry.name, entry.is_dir(), entry.is_symlink()) for entry in scandir(path)]
+    entries = []
+    for name in os.listdir(path):
+        full_path = os.path.join(path, name)
+        entries.append((name, os.path.isdir(full_path), os.path.islink(full_path)))
+    return entries
+
+
 class SpecFileFinder(object):
-    "Searches the file system for python files that might contain specs."
-    def __init__(self, import_fn=__import__, dir_fn=dir):
+    """Searches the file system for python files that might contain specs.
+
+    Directories matching the ignore rules aren't descended into: version control,
+    virtualenvs, caches and build output by default (see DEFAULT_IGNORES), the
+    gitignore-style patterns given as ignore, and the patterns of any .gitignore files
+    found along the way, unless use_gitignore is False.
+    """
+    def __init__(self, import_fn=__import__, dir_fn=dir, ignore=(), use_gitignore=True,
+            default_ignores=DEFAULT_IGNORES):
         self._import = import_fn
         self._dir = dir_fn
+        self.ignore = tuple(ignore)
+        self.use_gitignore = use_gitignore
+        self.default_ignores = default_ignores
 
     def find_in_module(self, module):
         specs = []
@@ -102,21 +205,57 @@ class SpecFileFinder(object):
             mod = getattr(mod, module_path.rsplit('.', 1)[-1])
         return mod
 
+    def walk(self, directory):
+        """Yields (filepath, modulepath) pairs for every spec file in the given
+        directory without importing any of them.
+        """
+        directory = os.path.abspath(directory)
+        for full_path in self.iter_files(directory):
+            if self.is_py_file(full_path):
+                yield full_path, self.convert_to_module(os.path.relpath(full_path, directory))
+
+    def iter_files(self, directory):
+        """Yields the paths of all files in the given directory that aren't ignored, in
+        the same order as os.walk. Symbolic links to directories aren't followed.
+        """
+        directory = os.path.abspath(directory)
+        rules = IgnoreRules(self.ignore, self.default_ignores)
+        pending = [(directory, '')]
+        while pending:
+            path, relpath = pending.pop()
+            try:
+                entries = _list_directory(path)
+            except OSError:
+                continue
+            if self.use_gitignore and any(name == '.gitignore' and not is_dir for name, is_dir, _ in entries):
+                rules.add_file(os.path.join(path, '.gitignore'), relpath)
+            directories = []
+            for name, is_dir, is_link in entries:
+                entry_relpath = relpath + '/' + name if relpath else name
+                if rules.ignores(entry_relpath, is_dir):
+                    continue
+                if not is_dir:
+                    yield os.path.join(path, name)
+                elif not is_link:
+                    directories.append((os.path.join(path, name), entry_relpath))
+            pending.extend(reversed(directories))
+
+    def load(self, directory, filepath, modulepath):
+        "Imports a single spec file found by walk(). Returns a SpecFile."
+        old_paths = list(sys.path)
+        sys.path.insert(0, os.path.abspath(directory))
+        try:
+            return SpecFile(filepath, modulepath, self.get_module(modulepath))
+        finally:
+            sys.path = old_paths
+
     def find(self, directory):
         directory = os.path.abspath(directory)
         old_paths = list(sys.path)
         sys.path.insert(0, directory)
         specs = []
-        for root, dirs, files in os.walk(directory):
-            for filename in files:
-                full_path = os.path.join(root, filename)
-                if not self.is_py_file(full_path):
-                    continue
-                module_path = self.convert_to_module(os.path.relpath(full_path, directory))
-                #specs = self.get_module(self.get_specs(module_path))
-                specs.append(SpecFile(full_path, module_path, self.get_module(module_path)))
-
+        for full_path, module_path in self.walk(directory):
+            specs.append(SpecFile(full_path, module_path, self.get_module(module_path)))
 
         sys.path = old_paths
         return specs
-
@@ -7,7 +7,8 @@ import sys
 import traceback
 import types
 
-from describe.spec.utils import tabulate, filter_traceback, str_traceback
+from describe.spec.utils import tabulate, filter_traceback, str_traceback, FailureRecord
+from describe.spec.results import GroupResult
 
 
 def prettyprint_camelcase(name):
@@ -31,7 +32,8 @@ class ErrorFormat(object):
     Parameters:
         - name is the descriptive name of the example.
         - error is the exception that occurred
-        - traceback is the stacktrace of the exception being raised
+        - traceback is the stacktrace of the exception being raised, preferably
+          as a FailureRecord
         - parents is a list of descriptive describes & contexts above this
           example.
         - stdout is the stdout contents
@@ -76,7 +78,9 @@ class ErrorFormat(object):
 
     def _traceback(self):
         sb = []
-        if self.traceback:
+        if isinstance(self.traceback, FailureRecord):
+            sb.append(self.traceback.format(filtered=self.filter_traceback))
+        elif self.traceback:
             if self.filter_traceback:
                 sb.append(filter_traceback(self.error, self.traceback or None))
             else:
@@ -147,6 +151,11 @@ class StandardResultsFormatter(object):
     def end_example_group(self, example):
         assert self.group_stack[-1] == example, "Example Group to remove must be the most recent started."
         self.group_stack.pop()
+        if example.error:
+            # its before or after functions failed, or it timed out.
+            self.num_failed += 1
+            self._write_example_failed(example)
+            self._add_error(example)
 
     def skip_example_group(self, example):
         pass
@@ -166,11 +175,7 @@ class StandardResultsFormatter(object):
         else:
             self.num_failed += 1
             self._write_example_failed(example)
-            error = ErrorFormat(
-                example.name, example.error, example.traceback,
-                tuple(self.group_stack), example.stdout, example.stderr
-            )
-            self.errors.append(error)
+            self._add_error(example)
         return not example.error
 
     def finalize(self):
@@ -193,6 +198,18 @@ class StandardResultsFormatter(object):
         })
 
     ################ Private methods
+    def _add_error(self, example):
+        # copy the parent names now, instead of keeping their example groups (and any
+        # live traceback) around until the end of the run.
+        traceback = example.traceback
+        if not isinstance(traceback, FailureRecord):
+            traceback = filter_traceback(example.error, traceback)
+        self.errors.append(ErrorFormat(
+            example.name, example.error, traceback,
+            tuple(GroupResult(group.name) for group in self.group_stack),
+            example.stdout, example.stderr
+        ))
+
     def _errors(self):
         return '\n\n'.join(self._error_format(e) for e in self.errors)
 
@@ -275,3 +292,37 @@ class MinimalResultsFormatter(StandardResultsFormatter):
         return statusline
 
 
+
+
+class FormatterGroup(object):
+    """Sends the results it is given to several formatters, in order.
+
+    Return values are taken from the first formatter.
+    """
+    def __init__(self, *formatters):
+        self.formatters = list(formatters)
+
+    def __repr__(self):
+        return "FormatterGroup(%s)" % ', '.join(map(repr, self.formatters))
+
+    def _send(self, method, *args):
+        results = [getattr(formatter, method)(*args) for formatter in self.formatters]
+        return results[0] if results else None
+
+    def skip_example(self, example):
+        return self._send('skip_example', example)
+
+    def start_example_group(self, example):
+        return self._send('start_example_group', example)
+
+    def end_example_group(self, example):
+        return self._send('end_example_group', example)
+
+    def skip_example_group(self, example):
+        return self._send('skip_example_group', example)
+
+    def record_example(self, example):
+        return self._send('record_example', example)
+
+    def finalize(self):
+        return self._send('finalize')
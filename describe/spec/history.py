@@ -0,0 +1,157 @@
+"""history.py - Remembers how long specs took to run.
+
+TimingHistory keeps the durations of examples, example groups and spec files in a
+SQLite database, so later runs can start the slowest work first instead of finding
+it last. The history is only an optimization: if the database can't be read or
+written, specs still run as if there was no history.
+"""
+import os
+import sqlite3
+
+from describe.spec.utils import describe_path, ensure_directory
+
+
+def default_history_path(directory=None):
+    return describe_path('timings.sqlite3', directory)
+
+
+class TimingHistory(object):
+    """The durations of previous runs, stored in a SQLite database at the given path.
+
+    Durations are averaged over (up to) the last `smoothing` runs, so a single
+    slow run doesn't reorder everything.
+    """
+    smoothing = 5
+
+    def __init__(self, path):
+        self.path = path
+        self._durations = None
+        self._changed = {}
+
+    def __repr__(self):
+        return "TimingHistory(%r)" % (self.path,)
+
+    def _connect(self):
+        ensure_directory(self.path)
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS durations ('
+            'kind TEXT NOT NULL, key TEXT NOT NULL, real_time REAL NOT NULL, '
+            'user_time REAL NOT NULL, runs INTEGER NOT NULL, PRIMARY KEY (kind, key))'
+        )
+        return connection
+
+    @property
+    def durations(self):
+        "A dictionary of (kind, key) => (real_time, user_time, runs)."
+        if self._durations is None:
+            self._durations = {}
+            if os.path.exists(self.path):
+                try:
+                    connection = self._connect()
+                    try:
+                        for kind, key, real_time, user_time, runs in connection.execute(
+                                'SELECT kind, key, real_time, user_time, runs FROM durations'):
+                            self._durations[(kind, key)] = (real_time, user_time, runs)
+                    finally:
+                        connection.close()
+                except (sqlite3.Error, OSError):
+                    pass
+        return self._durations
+
+    def __len__(self):
+        return len(self.durations)
+
+    def duration(self, kind, key, default=None):
+        "Returns the average real time of the given kind ('example', 'group' or 'file') and key."
+        value = self.durations.get((kind, key))
+        if value is None:
+            return default
+        return value[0]
+
+    def record(self, kind, key, real_time, user_time=0):
+        "Adds a duration to the history. It is only stored once save() is called."
+        if key is None or real_time < 0:
+            return
+        user_time = max(user_time, 0)
+        previous = self.durations.get((kind, key))
+        if previous:
+            old_real_time, old_user_time, runs = previous
+            runs = min(runs + 1, self.smoothing)
+            real_time = old_real_time + (real_time - old_real_time) / runs
+            user_time = old_user_time + (user_time - old_user_time) / runs
+        else:
+            runs = 1
+        self.durations[(kind, key)] = self._changed[(kind, key)] = (real_time, user_time, runs)
+
+    def save(self):
+        "Writes the recorded durations to the database. Returns True if successful."
+        if not self._changed:
+            return True
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO durations (kind, key, real_time, user_time, runs) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        [key + value for key, value in self._changed.items()]
+                    )
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError):
+            return False
+        self._changed = {}
+        return True
+
+    def estimates(self, items, kind, key=lambda item: item):
+        """Returns the expected duration of each of the given items. Items without any
+        history are assumed to take as long as the average item that has one.
+        """
+        durations = [self.duration(kind, key(item)) for item in items]
+        known = [duration for duration in durations if duration is not None]
+        default = sum(known) / len(known) if known else 0
+        return [default if duration is None else duration for duration in durations]
+
+    def longest_first(self, items, kind, key=lambda item: item):
+        "Sorts the given items by their expected duration, slowest first."
+        items = list(items)
+        estimates = self.estimates(items, kind, key)
+        order = sorted(range(len(items)), key=lambda i: estimates[i], reverse=True)
+        return [items[i] for i in order]
+
+
+class TimingRecorder(object):
+    "A formatter that records the durations it is given into a TimingHistory."
+    def __init__(self, history):
+        self.history = history
+        self.depth = 0
+        self.file_times = {}
+
+    def __repr__(self):
+        return "TimingRecorder(%r)" % (self.history,)
+
+    def start_example_group(self, example):
+        self.depth += 1
+
+    def end_example_group(self, example):
+        self.depth -= 1
+        self.history.record('group', example.key, example.real_time, example.user_time)
+        if self.depth == 0 and example.module and example.real_time >= 0:
+            self.file_times[example.module] = self.file_times.get(example.module, 0) + example.real_time
+
+    def skip_example_group(self, example):
+        pass
+
+    def record_example(self, example):
+        self.history.record('example', example.key, example.real_time, example.user_time)
+        return not example.error
+
+    def skip_example(self, example):
+        pass
+
+    def finalize(self):
+        for module, real_time in self.file_times.items():
+            self.history.record('file', module, real_time)
+        self.file_times = {}
+        self.history.save()
@@ -0,0 +1,146 @@
+"""ignore.py - Decides which files and directories to skip while looking for spec files.
+
+IgnoreRules understands the patterns of .gitignore files: globs (including `**`),
+patterns anchored with a slash, directory-only patterns ending in a slash and
+negated patterns starting with `!`. The last matching pattern wins.
+"""
+import os
+import re
+
+
+# version control, virtualenvs, caches and build output never contain specs to run.
+DEFAULT_IGNORES = (
+    '.git/', '.hg/', '.svn/', '.bzr/', '.tox/', '.nox/', '.venv/', 'venv/', 'virtualenv/',
+    'site-packages/', 'node_modules/', '__pycache__/', '.eggs/', '*.egg-info/', 'build/',
+    'dist/', '.describe/', '.mypy_cache/', '.pytest_cache/', '.cache/',
+)
+
+
+def _translate(glob):
+    "Converts a gitignore glob into a regular expression that matches relative paths."
+    regex, i = [], 0
+    while i < len(glob):
+        if glob.startswith('**/', i):
+            regex.append('(?:.*/)?')
+            i += 3
+        elif glob.startswith('**', i):
+            regex.append('.*')
+            i += 2
+        elif glob[i] == '*':
+            regex.append('[^/]*')
+            i += 1
+        elif glob[i] == '?':
+            regex.append('[^/]')
+            i += 1
+        elif glob[i] == '[' and ']' in glob[i + 1:]:
+            end = glob.index(']', i + 1)
+            contents = glob[i + 1:end]
+            if contents.startswith('!'):
+                contents = '^' + contents[1:]
+            regex.append('[%s]' % contents.replace('\\', '\\\\'))
+            i = end + 1
+        else:
+            regex.append(re.escape(glob[i]))
+            i += 1
+    return ''.join(regex)
+
+
+class IgnorePattern(object):
+    """A single gitignore-style pattern, relative to the directory at base (a relative
+    path using forward slashes, or '' for the directory being searched).
+    """
+    def __init__(self, pattern, base=''):
+        self.pattern, self.base = pattern, base
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        self.directories_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        prefix = '' if anchored else '(?:.*/)?'
+        self.regex = re.compile('^%s%s$' % (prefix, _translate(pattern)))
+        # plain names are checked with a set lookup instead.
+        self.name = None if anchored or re.search(r'[*?\[\\]', pattern) else pattern
+
+    def __repr__(self):
+        return "IgnorePattern(%r, %r)" % (self.pattern, self.base)
+
+    def matches(self, path, is_directory):
+        "Returns True if the relative path matches this pattern."
+        if self.directories_only and not is_directory:
+            return False
+        if self.base:
+            if not path.startswith(self.base + '/'):
+                return False
+            path = path[len(self.base) + 1:]
+        if self.name is not None:
+            return path == self.name or path.endswith('/' + self.name)
+        return self.regex.match(path) is not None
+
+
+class IgnoreRules(object):
+    """An ordered list of IgnorePatterns.
+
+    Parameters:
+        - patterns are gitignore-style patterns relative to the directory being searched.
+        - defaults are checked before any other pattern, so they can be negated.
+    """
+    def __init__(self, patterns=(), defaults=DEFAULT_IGNORES):
+        self.patterns = [IgnorePattern(pattern) for pattern in tuple(defaults) + tuple(patterns)]
+
+    def __repr__(self):
+        return "IgnoreRules(%r)" % ([pattern.pattern for pattern in self.patterns],)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def add(self, pattern, base=''):
+        self.patterns.append(IgnorePattern(pattern, base))
+
+    def add_lines(self, lines, base=''):
+        "Adds the patterns of a .gitignore file's lines, relative to base."
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if line.endswith('\\ '):
+                line = line[:-2].rstrip() + ' '
+            else:
+                line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('\\'):
+                line = line[1:]
+            self.add(line, base)
+
+    def add_file(self, filepath, base=''):
+        "Adds the patterns of the given .gitignore file. Missing files are ignored."
+        try:
+            with open(filepath) as handle:
+                self.add_lines(handle, base)
+        except (IOError, OSError):
+            pass
+
+    def ignores(self, path, is_directory=False):
+        "Returns True if the given relative path (using forward slashes) should be skipped."
+        ignored = False
+        for pattern in self.patterns:
+            if pattern.negated == ignored and pattern.matches(path, is_directory):
+                ignored = not ignored
+        return ignored
+
+
+def unique_directories(directories):
+    """Returns the given directories without duplicates and without directories that are
+    inside another one of them, in their original order.
+    """
+    directories = list(directories)
+    paths = [os.path.join(os.path.realpath(directory), '') for directory in directories]
+    unique = []
+    for i, path in enumerate(paths):
+        contained = any(
+            path.startswith(other) and (path != other or j < i)
+            for j, other in enumerate(paths) if j != i
+        )
+        if not contained:
+            unique.append(directories[i])
+    return unique
@@ -0,0 +1,200 @@
+"""index.py - Remembers which examples spec files contain.
+
+Importing a spec file just to learn which examples are in it is slow. DiscoveryIndex
+stores an outline of the groups and examples of every spec file it has seen, along
+with the modification time and size of the file, in a JSON file. As long as a spec
+file hasn't changed, its examples can be listed, counted and selected from the index
+without importing it.
+
+Like the timing history, the index is only an optimization: if it can't be read or
+written, spec files are imported as if there was no index.
+"""
+import os
+import json
+
+from describe.spec.utils import describe_path, ensure_directory, native_string
+
+
+INDEX_FORMAT = 'describe-index'
+INDEX_VERSION = 2
+
+
+def default_index_path(directory=None):
+    return describe_path('index.json', directory)
+
+
+class Outline(object):
+    """The name and tags of an example or example group, found without running it.
+    Groups also know whether they have any before or after functions, and the outlines
+    of the examples in them.
+    """
+    __slots__ = ('name', 'is_group', 'hooks', 'children', 'tags')
+
+    def __init__(self, name, is_group=False, hooks=False, children=(), tags=frozenset()):
+        self.name, self.is_group = name, is_group
+        self.hooks = hooks
+        self.children = list(children)
+        self.tags = frozenset(tags)
+
+    def __repr__(self):
+        return "Outline(%r, is_group=%r, <%d children>)" % (self.name, self.is_group, len(self.children))
+
+    def __eq__(self, other):
+        return isinstance(other, Outline) and self.to_list() == other.to_list()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def walk(self, parents=()):
+        "Yields (parent names, outline) tuples for this outline and everything in it."
+        yield parents, self
+        names = parents + (self.name,)
+        for child in self.children:
+            for item in child.walk(names):
+                yield item
+
+    def to_list(self):
+        tags = sorted(self.tags)
+        if not self.is_group:
+            return [self.name, tags] if tags else self.name
+        return [self.name, self.hooks, [child.to_list() for child in self.children], tags]
+
+    @classmethod
+    def from_list(cls, value):
+        if not isinstance(value, list):
+            return cls(native_string(value))
+        if len(value) == 2:
+            name, tags = value
+            return cls(native_string(name), tags=map(native_string, tags))
+        name, hooks, children, tags = value
+        return cls(native_string(name), True, hooks, [cls.from_list(child) for child in children],
+                   map(native_string, tags))
+
+
+class IndexEntry(object):
+    "What the index knows about a single spec file."
+    def __init__(self, filepath, modulepath, mtime, size, outlines):
+        self.filepath, self.modulepath = filepath, modulepath
+        self.mtime, self.size = mtime, size
+        self.outlines = outlines
+
+    def __repr__(self):
+        return "IndexEntry(%r, %r)" % (self.filepath, self.modulepath)
+
+    def __len__(self):
+        "The number of examples in the spec file."
+        return sum(1 for _, outline in self.walk() if not outline.is_group)
+
+    def walk(self):
+        "Yields (parent names, outline) tuples for every group and example in the spec file."
+        for outline in self.outlines:
+            for item in outline.walk():
+                yield item
+
+    def examples(self):
+        "Yields (names, tags) tuples for every example, including the names and tags of its groups."
+        pending = [((), frozenset(), outline) for outline in reversed(self.outlines)]
+        while pending:
+            names, tags, outline = pending.pop()
+            names, tags = names + (outline.name,), tags | outline.tags
+            if outline.is_group:
+                pending.extend((names, tags, child) for child in reversed(outline.children))
+            else:
+                yield names, tags
+
+    def key(self, names):
+        "Returns the key of the example or group with the given names (including its groups)."
+        return '%s:%s' % (self.modulepath, '.'.join(names))
+
+    def keys(self, groups=False):
+        "Yields the keys of the examples (and groups, if groups is True) in the spec file."
+        for parents, outline in self.walk():
+            if groups or not outline.is_group:
+                yield self.key(parents + (outline.name,))
+
+    def matches(self, stat):
+        return self.mtime == stat.st_mtime and self.size == stat.st_size
+
+
+class DiscoveryIndex(object):
+    "The outlines of spec files, stored as JSON at the given path."
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._changed = False
+
+    def __repr__(self):
+        return "DiscoveryIndex(%r)" % (self.path,)
+
+    @property
+    def entries(self):
+        "A dictionary of filepath => IndexEntry, including those of changed files."
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path) as handle:
+                    document = json.load(handle)
+                if document.get('format') == INDEX_FORMAT and document.get('version') == INDEX_VERSION:
+                    for filepath, (modulepath, mtime, size, outlines) in document['files'].items():
+                        filepath = native_string(filepath)
+                        self._entries[filepath] = IndexEntry(filepath, native_string(modulepath), mtime, size,
+                            [Outline.from_list(outline) for outline in outlines])
+            except (IOError, ValueError, TypeError, AttributeError, KeyError):
+                self._entries = {}
+        return self._entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, filepath, modulepath=None):
+        """Returns the IndexEntry of the given spec file, or None if it changed since it was indexed.
+
+        The same file has a different module path when it is found from a different
+        spec directory, so give the modulepath the entry should have.
+        """
+        entry = self.entries.get(filepath)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        if not entry.matches(stat):
+            return None
+        if modulepath is not None and modulepath != entry.modulepath:
+            return IndexEntry(filepath, modulepath, entry.mtime, entry.size, entry.outlines)
+        return entry
+
+    def update(self, filepath, modulepath, outlines, stat=None):
+        """Stores the outlines of the given spec file. Give the stat of the file from
+        before it was imported, in case it changes in the meantime. Returns the IndexEntry.
+        """
+        try:
+            stat = stat or os.stat(filepath)
+        except OSError:
+            return IndexEntry(filepath, modulepath, None, None, outlines)
+        entry = IndexEntry(filepath, modulepath, stat.st_mtime, stat.st_size, outlines)
+        self.entries[filepath] = entry
+        self._changed = True
+        return entry
+
+    def save(self):
+        """Writes the index, without the spec files that no longer exist, if anything was
+        updated. Returns True if successfully saved.
+        """
+        if not self._changed:
+            return True
+        files = {}
+        for filepath, entry in self.entries.items():
+            if os.path.exists(filepath):
+                files[filepath] = [entry.modulepath, entry.mtime, entry.size,
+                                   [outline.to_list() for outline in entry.outlines]]
+        try:
+            ensure_directory(self.path)
+            with open(self.path, 'w') as handle:
+                json.dump({'format': INDEX_FORMAT, 'version': INDEX_VERSION, 'files': files},
+                          handle, separators=(',', ':'))
+        except (IOError, OSError):
+            return False
+        self._changed = False
+        return True
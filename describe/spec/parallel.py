@@ -0,0 +1,544 @@
+"""parallel.py - Runs spec files across a pool of worker processes.
+
+Each worker imports and runs whole spec files, recording the results with a
+ResultRecorder. The results are sent back to the coordinator, which replays them
+into its formatter in the same order a serial run would have produced them.
+
+With a Zygote, the modules the spec files depend on are imported once by the
+coordinator before any worker is forked, so every worker inherits them instead of
+importing them again.
+
+Note that global hooks (describe.run) only apply to the spec files imported by the
+same worker.
+"""
+import os
+import sys
+import ast
+import errno
+import signal
+import select
+import traceback
+import multiprocessing
+from collections import deque
+
+try:
+    import resource
+except ImportError: # pragma: no cover
+    resource = None
+
+from describe.spec.coordinator import SpecCoordinator
+from describe.spec.ignore import unique_directories
+from describe.spec.results import ResultRecorder, ExampleResult, RemoteError, replay, tally
+from describe.spec.runners import USER_CODE
+from describe.spec.utils import format_stacks
+
+
+class ParallelExecutionError(RuntimeError):
+    "Raised when a worker process could not run a spec file."
+
+
+class ResourceLimitError(Exception):
+    "Raised in the example that was running when a worker exceeded its CPU time limit."
+
+
+def current_rss():
+    "Returns the resident set size of the current process in bytes, or None if unknown."
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, IndexError, ValueError):
+        pass
+    if resource is None:
+        return None
+    # not the current usage, but the peak is the closest we can get.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss
+    return maxrss * 1024
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class ResourceLimits(object):
+    """Limits the resources every worker process may use.
+
+    Parameters:
+        - memory is the number of bytes of address space a worker may use. Allocations
+          beyond that raise a MemoryError in the example that made them.
+        - cpu is the number of seconds of CPU time a worker may use for a spec file.
+          Once exceeded, the running example (or the next one, if the runner was busy
+          recording results) fails with a ResourceLimitError. The rest of the spec file
+          gets another cpu seconds, and the worker retires once it is done.
+    """
+    def __init__(self, memory=None, cpu=None):
+        self.memory, self.cpu = memory, cpu
+        self.exceeded = False
+
+    def __repr__(self):
+        return "ResourceLimits(memory=%r, cpu=%r)" % (self.memory, self.cpu)
+
+    def _set_soft_limit(self, kind, value):
+        soft, hard = resource.getrlimit(kind)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(kind, (value, hard))
+
+    def apply(self):
+        "Applies the memory limit to the current process and prepares the CPU limit."
+        if resource is None:
+            return
+        if self.memory:
+            self._set_soft_limit(resource.RLIMIT_AS, int(self.memory))
+        if self.cpu:
+            signal.signal(signal.SIGXCPU, self._cpu_exceeded)
+
+    def start_spec_file(self):
+        "Gives the current process another cpu seconds of CPU time."
+        if resource is not None and self.cpu:
+            self._set_soft_limit(resource.RLIMIT_CPU, int(cpu_time() + self.cpu) + 1)
+
+    def _cpu_exceeded(self, signum, frame):
+        self.exceeded = True
+        self.start_spec_file()
+        # like timeouts, only interrupt user code, never the worker sending its results.
+        return USER_CODE.interrupt(ResourceLimitError(
+            "Exceeded the CPU time limit of %ss\n\n%s" % (self.cpu, format_stacks(frame).rstrip())))
+
+
+class Zygote(object):
+    """Imports the modules shared by spec files once, so forked workers can inherit them.
+
+    Parameters:
+        - modules is a list of module names that should always be preloaded.
+        - discover will also preload the modules imported at the top-level of each
+          spec file (found by parsing them, not running them).
+    """
+    def __init__(self, modules=(), discover=True, import_fn=__import__):
+        self.modules = list(modules)
+        self.discover = discover
+        self._import = import_fn
+        self.preloaded = []
+
+    def __repr__(self):
+        return "Zygote(%r, discover=%r)" % (self.modules, self.discover)
+
+    def imports_of(self, filepath):
+        "Returns the names of the modules imported at the top level of the given file."
+        with open(filepath) as handle:
+            try:
+                tree = ast.parse(handle.read(), filepath)
+            except SyntaxError:
+                return []
+        names = []
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names.append(node.module)
+        return names
+
+    def dependencies(self, spec_files):
+        """Returns the module names to preload for the given (directory, filepath, modulepath)
+        tuples. Spec modules themselves are never included.
+        """
+        spec_modules = set(modulepath for _, _, modulepath in spec_files)
+        names = list(self.modules)
+        if self.discover:
+            for _, filepath, _ in spec_files:
+                names.extend(self.imports_of(filepath))
+        seen, dependencies = set(), []
+        for name in names:
+            if name not in seen and name not in spec_modules:
+                seen.add(name)
+                dependencies.append(name)
+        return dependencies
+
+    def preload(self, spec_files):
+        """Imports the dependencies of the given spec files into the current process.
+        Modules that fail to import are skipped; the worker running the spec file will
+        report the error instead. Returns the names of the imported modules.
+        """
+        old_paths = list(sys.path)
+        for directory in set(directory for directory, _, _ in spec_files):
+            sys.path.insert(0, directory)
+        try:
+            for name in self.dependencies(spec_files):
+                if name in sys.modules:
+                    continue
+                try:
+                    self._import(name)
+                except Exception:
+                    continue
+                self.preloaded.append(name)
+        finally:
+            sys.path = old_paths
+        return self.preloaded
+
+
+class Worker(object):
+    """Runs spec files given to it by the ParallelSpecCoordinator.
+
+    The worker retires itself after it has run max_files spec files, once its
+    memory usage exceeds max_rss bytes or once it exceeded its CPU time limit. Examples stop being run once the failure_limit
+    has been reached. A FailureCache given as failures prunes or reorders the examples
+    of every spec file. Timeouts are the default timeouts of examples and groups,
+    limits are the ResourceLimits of the worker process and retention is the
+    RetentionPolicy of its runners. A StackSampler given as sampler samples the worker
+    process, sending the stacks of every spec file along with its events. So does a
+    Tracer given as tracer with its spans, which it records on a track of the worker.
+
+    Every worker sends its messages to the coordinator through a pipe of its own, which
+    the coordinator reads from as results. Nothing is shared with other workers, so a
+    worker that dies in the middle of sending a message only breaks its own pipe.
+    """
+    def __init__(self, worker_id, file_finder, spec_finder, max_files=None, max_rss=None,
+            failure_limit=None, failures=None, timeouts=None, limits=None, retention=None, sampler=None,
+            tracer=None):
+        self.worker_id = worker_id
+        self.failure_limit = failure_limit
+        self.failures = failures
+        self.timeouts, self.limits = timeouts, limits
+        self.retention = retention
+        self.sampler = sampler
+        self.tracer = tracer
+        self.results = self._sender = None
+        self.file_finder, self.spec_finder = file_finder, spec_finder
+        self.max_files, self.max_rss = max_files, max_rss
+        self.tasks = multiprocessing.Queue()
+        self.num_files = 0
+        self.process = None
+
+    def __repr__(self):
+        return "Worker(%r, pid=%r)" % (self.worker_id, self.process and self.process.pid)
+
+    def start(self):
+        self.results, self._sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=self.work)
+        self.process.daemon = True
+        self.process.start()
+        # only the worker process writes to the pipe, so reading it fails once the worker exits.
+        self._sender.close()
+        return self
+
+    def send(self, task):
+        self.tasks.put(task)
+
+    def stop(self):
+        if self.process.is_alive():
+            self.tasks.put(None)
+        self.close()
+
+    def close(self):
+        "Closes the pipe of results, once the worker process has exited."
+        self.process.join()
+        self.results.close()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def should_retire(self):
+        if self.limits is not None and self.limits.exceeded:
+            return True
+        if self.max_files and self.num_files >= self.max_files:
+            return True
+        if self.max_rss:
+            rss = current_rss()
+            return rss is not None and rss > self.max_rss
+        return False
+
+    def run_spec_file(self, directory, filepath, modulepath):
+        "Imports and runs the given spec file. Returns the recorded events."
+        recorder = ResultRecorder()
+        if self.limits is not None:
+            self.limits.start_spec_file()
+        coordinator = SpecCoordinator(self.file_finder, self.spec_finder, recorder,
+            failure_limit=self.failure_limit, failures=self.failures, timeouts=self.timeouts,
+            retention=self.retention, profiler=self.sampler, tracer=self.tracer)
+        spec_file = coordinator.load_spec_file((directory, filepath, modulepath))
+        coordinator.execute(coordinator.extract_specs(spec_file))
+        return recorder.events
+
+    def work(self):
+        "The main loop of the worker process."
+        if self.limits is not None:
+            self.limits.apply()
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.tracer is not None:
+            # forget the spans inherited from the parent process.
+            self.tracer.drain()
+            self.tracer.track(self.worker_id + 1, 'worker %d (pid %d)' % (self.worker_id, os.getpid()))
+        self.results.close()
+        self._sender.send(('ready', self.worker_id))
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            index, directory, filepath, modulepath = task
+            try:
+                events = self.run_spec_file(directory, filepath, modulepath)
+            except Exception:
+                self._sender.send(('failed', self.worker_id, index, traceback.format_exc()))
+                return
+            self.num_files += 1
+            retiring = self.should_retire()
+            samples = self.sampler.drain() if self.sampler is not None else None
+            spans = self.tracer.drain() if self.tracer is not None else None
+            self._sender.send(('done', self.worker_id, index, events, retiring, samples, spans))
+            if retiring:
+                return
+
+
+class _TaskQueue(object):
+    """Hands out (index, directory, filepath, modulepath) tasks for the spec files of the
+    given iterable, only taking them from it as they are needed.
+    """
+    def __init__(self, spec_files):
+        self._spec_files = iter(spec_files)
+        self._buffer = deque()
+        self.spec_files = {}
+
+    def fill(self, count):
+        "Tries to have count tasks ready. Returns the number of tasks that are ready."
+        while self._spec_files is not None and len(self._buffer) < count:
+            try:
+                spec_file = tuple(next(self._spec_files))
+            except StopIteration:
+                self._spec_files = None
+                break
+            index = len(self.spec_files)
+            self.spec_files[index] = spec_file
+            self._buffer.append((index,) + spec_file)
+        return len(self._buffer)
+
+    def __nonzero__(self):
+        return self.fill(1) > 0
+
+    def popleft(self):
+        self.fill(1)
+        return self._buffer.popleft()
+
+    def clear(self):
+        "Drops the remaining tasks, without taking any more spec files."
+        self._buffer.clear()
+        self._spec_files = None
+
+
+class ParallelSpecCoordinator(SpecCoordinator):
+    """Performs the finding and execution of specs using a pool of worker processes.
+
+    Parameters:
+        - jobs is the number of worker processes to run at once.
+        - max_files_per_worker replaces a worker after it has run that many spec files.
+        - max_worker_rss replaces a worker once its resident memory exceeds that many bytes.
+        - zygote is a Zygote that preloads the spec files' dependencies before any
+          worker is started.
+        - history is a TimingHistory used to hand out the slowest spec files first.
+        - shard is a Shard that selects which spec files to run.
+        - failure_limit is a FailureLimit, which is shared with the workers. Once reached,
+          no more spec files are started and the workers stop running their current ones.
+        - failures is a FailureCache, to run the spec files and examples that failed
+          last time first (or only those).
+        - timeouts are the default Timeouts of examples and groups.
+        - limits are the ResourceLimits of each worker. If a worker dies while running
+          a spec file, the spec file is recorded as failed and a new worker takes over.
+        - retention is the RetentionPolicy of the workers' runners.
+        - stream hands spec files to workers as soon as they are found, instead of
+          finding all of them first. The history then doesn't reorder the spec files,
+          and the zygote only preloads the modules it was given.
+        - selection is the Selection of the spec_finder. With a static_finder, spec files
+          without selected examples aren't handed to workers.
+        - sampler is a StackSampler, which every worker starts a copy of. The stacks the
+          workers sampled are merged into it.
+        - tracer is a Tracer, which every worker records its spans in a copy of, on a
+          track of its own. The spans are merged into it.
+    """
+    poll_interval = 0.5
+
+    def __init__(self, file_finder=None, spec_finder=None, formatter=None, jobs=2,
+            max_files_per_worker=None, max_worker_rss=None, zygote=None, history=None, shard=None,
+            failure_limit=None, failures=None, timeouts=None, limits=None, retention=None, stream=False,
+            static_finder=None, selection=None, sampler=None, tracer=None):
+        super(ParallelSpecCoordinator, self).__init__(
+            file_finder, spec_finder, formatter, history, shard, failure_limit, failures, timeouts,
+            retention, stream, static_finder=static_finder, selection=selection, tracer=tracer
+        )
+        self.limits = limits
+        self.sampler = sampler
+        self.jobs = max(int(jobs), 1)
+        self.max_files_per_worker = max_files_per_worker
+        self.max_worker_rss = max_worker_rss
+        self.zygote = zygote
+        self.worker_class = Worker
+        self._next_worker_id = 0
+
+    def _start_worker(self):
+        worker = self.worker_class(
+            self._next_worker_id, self.file_finder, self.spec_finder,
+            self.max_files_per_worker, self.max_worker_rss, self.failure_limit, self.failures,
+            self.timeouts, self.limits, self.retention, self.sampler, self.tracer
+        )
+        self._next_worker_id += 1
+        return worker.start()
+
+    def execute_files(self, spec_files):
+        """Runs the spec files (any iterable of (directory, filepath, modulepath) tuples)
+        in worker processes. Returns a tuple indicating the number of (succeses, failures, skipped).
+        """
+        pending = _TaskQueue(spec_files)
+        spec_files = pending.spec_files
+        if self.failure_limit is not None and self.failure_limit.shared_count is None:
+            # forked workers count their failures in the same shared memory.
+            self.failure_limit.shared_count = multiprocessing.Value('i', self.failure_limit.num_failures)
+        workers = {}
+        for _ in range(pending.fill(self.jobs)):
+            worker = self._start_worker()
+            workers[worker.worker_id] = worker
+
+        running, finished, next_index = {}, {}, 0
+        totals = [0, 0, 0]
+        try:
+            while pending or running:
+                messages = self._receive(workers)
+                if not messages:
+                    # in case a process the worker started keeps its pipe open.
+                    messages = [('exited', worker_id) for worker_id, _ in self._crashed_workers(workers, running)]
+
+                for message in messages:
+                    kind, worker_id = message[:2]
+                    worker = workers.get(worker_id)
+                    if kind == 'failed':
+                        index, error = message[2:]
+                        raise ParallelExecutionError("Failed to run %s:\n%s" % (spec_files[index][1], error))
+                    if kind == 'exited':
+                        del workers[worker_id]
+                        if worker_id not in running:
+                            worker.close()
+                            raise ParallelExecutionError("Worker %d exited unexpectedly (code %r)" % (
+                                worker_id, worker.process.exitcode))
+                        index = running.pop(worker_id)
+                        finished[index] = self._crash_events(worker, spec_files[index])
+                        worker = None
+                        if pending:
+                            replacement = self._start_worker()
+                            workers[replacement.worker_id] = replacement
+                    if kind == 'done':
+                        index, events, retiring, samples, spans = message[2:]
+                        if samples and self.sampler is not None:
+                            self.sampler.merge(samples)
+                        if spans and self.tracer is not None:
+                            self.tracer.merge(spans)
+                        del running[worker_id]
+                        finished[index] = events
+                        if self.failure_limit is not None and self.failure_limit.reached:
+                            pending.clear()
+                        if retiring:
+                            worker.stop()
+                            del workers[worker_id]
+                            if pending:
+                                worker = self._start_worker()
+                                workers[worker.worker_id] = worker
+                            worker = None
+
+                    if worker is not None:
+                        if pending:
+                            task = pending.popleft()
+                            running[worker_id] = task[0]
+                            worker.send(task)
+                        else:
+                            worker.stop()
+                            del workers[worker_id]
+
+                # replay in the original order to look identical to a serial run.
+                while next_index in finished:
+                    self._replay(finished.pop(next_index), totals)
+                    next_index += 1
+        finally:
+            for worker in workers.values():
+                if worker.is_alive():
+                    worker.process.terminate()
+                worker.close()
+
+        # spec files that were never started, because of the failure limit, leave gaps.
+        for index in sorted(finished):
+            self._replay(finished[index], totals)
+        return tuple(totals)
+
+    def _replay(self, events, totals):
+        replay(events, self.formatter)
+        for i, count in enumerate(tally(events)):
+            totals[i] += count
+
+    def _receive(self, workers):
+        """Waits up to poll_interval seconds for messages from the workers. Returns the
+        messages, with an ('exited', worker_id) message instead for every worker whose
+        pipe was closed before (or in the middle of) a message.
+        """
+        senders = dict((worker.results.fileno(), worker_id) for worker_id, worker in workers.items())
+        try:
+            ready, _, _ = select.select([worker.results for worker in workers.values()], [], [],
+                                        self.poll_interval)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return []
+        messages = []
+        for connection in ready:
+            try:
+                messages.append(connection.recv())
+            except (EOFError, IOError, OSError):
+                messages.append(('exited', senders[connection.fileno()]))
+        return messages
+
+    def _crashed_workers(self, workers, running):
+        "Returns (worker_id, index) pairs of the workers that died while running a spec file."
+        return [(worker_id, index) for worker_id, index in sorted(running.items())
+                if not workers[worker_id].is_alive()]
+
+    def _crash_events(self, worker, spec_file):
+        worker.close()
+        modulepath = spec_file[2]
+        error = RemoteError('WorkerExited', "Worker exited unexpectedly (code %r) while running %s" % (
+            worker.process.exitcode, spec_file[1]
+        ))
+        result = ExampleResult(modulepath, error, '%s: %s\n' % (error.name, error),
+            user_time=0, real_time=0, key=modulepath + ':', module=modulepath)
+        return [('record_example', result)]
+
+    def run(self, directories=None):
+        """Finds and runs the specs. Returns a tuple indicating the
+        number of (succeses, failures, skipped).
+        """
+        if directories is None:
+            directories = [os.getcwd()]
+        directories = unique_directories(directories)
+
+        if self.stream:
+            if self.shard is not None:
+                self.assign_shards(directories)
+            if self.zygote:
+                self.zygote.preload([])
+            result = self.execute_files(self.stream_spec_files(directories))
+            self.formatter.finalize()
+            return result
+
+        spec_files = []
+        for directory in directories:
+            spec_files.extend(self.find_spec_files(directory))
+        if self.shard is not None:
+            spec_files = self.shard.select(spec_files)
+        if self.selection:
+            spec_files = [spec_file for spec_file in spec_files if self.may_select(spec_file)]
+        if self.zygote:
+            self.zygote.preload(spec_files)
+        if self.history is not None:
+            spec_files = self.history.longest_first(spec_files, 'file', key=lambda spec_file: spec_file[2])
+        if self.failures is not None:
+            spec_files = self.failures.select(spec_files)
+        result = self.execute_files(spec_files)
+
+        self.formatter.finalize()
+        return result
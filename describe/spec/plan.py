@@ -0,0 +1,174 @@
+"""plan.py - Compiles examples into flat execution plans.
+
+Running an example tree directly means asking every node whether it is a group and
+inspecting the signature of every hook and example function, for every example.
+An ExecutionPlan does that once: the tree is flattened into a list of steps, with
+explicit steps for entering and exiting groups, and every function call is resolved
+to either passing the context or injecting it into self.
+
+Example groups that haven't loaded their examples yet are compiled into just their
+enter and exit steps. The runner compiles their contents once it gets to them.
+"""
+from describe.spec.utils import accepts_arg
+from describe.spec.containers import ExampleGroup
+from describe import run
+
+
+ENTER, EXIT, RUN, SKIP = 'enter', 'exit', 'run', 'skip'
+
+
+def is_collection(example):
+    "Returns True if the given example is a collection of examples (aka, ExampleGroup)."
+    if isinstance(example, ExampleGroup):
+        return True
+    try:
+        iter(example)
+        return True
+    except TypeError:
+        return False
+
+
+def is_lazy(example):
+    "Returns True if the example is a group that hasn't loaded its examples yet."
+    return isinstance(example, ExampleGroup) and not example.is_loaded
+
+
+def should_skip(example):
+    if is_lazy(example):
+        # only known once it is loaded.
+        return False
+    return not callable(example.testfn) and not len(example)
+
+
+class Step(object):
+    """A single step of an ExecutionPlan.
+
+    Enter steps know the index of their matching exit step, so the runner can skip
+    the rest of a group. The enter steps of lazy groups have no steps for the examples
+    of the group following them.
+    """
+    __slots__ = ('kind', 'example', 'is_group', 'is_root', 'timeout', 'before', 'after',
+                 'takes_context', 'exit_index', 'lazy')
+
+    def __init__(self, kind, example, is_group, is_root=False, timeout=None, before=(), after=(),
+            takes_context=False):
+        self.kind, self.example = kind, example
+        self.is_group, self.is_root = is_group, is_root
+        self.timeout = timeout
+        self.before, self.after = before, after
+        self.takes_context = takes_context
+        self.exit_index = None
+        self.lazy = False
+
+    def __repr__(self):
+        return "Step(%r, %r)" % (self.kind, self.example.name)
+
+    def call(self, context):
+        "Calls the example's function."
+        testfn = self.example.testfn
+        if self.takes_context:
+            testfn(context)
+        else:
+            context.inject_into_self(testfn)
+            testfn()
+
+    def run_before(self, context, benchmark=None):
+        """Invokes all before functions with context passed to them. Laps the given
+        Benchmark after the global and the step's own before functions, if there are any.
+        """
+        if run.before_each.fns:
+            run.before_each.execute(context)
+            if benchmark is not None:
+                benchmark.lap('global_setup')
+        if self.before:
+            self._invoke(self.before, context)
+            if benchmark is not None:
+                benchmark.lap('setup')
+
+    def run_after(self, context, benchmark=None):
+        "Invokes all after functions with context passed to them. Laps like run_before."
+        if self.after:
+            self._invoke(self.after, context)
+            if benchmark is not None:
+                benchmark.lap('teardown')
+        if run.after_each.fns:
+            run.after_each.execute(context)
+            if benchmark is not None:
+                benchmark.lap('global_teardown')
+
+    def _invoke(self, calls, context):
+        for fn, takes_context in calls:
+            if takes_context:
+                fn(context)
+            else:
+                context.inject_into_self(fn)
+                fn()
+
+
+class ExecutionPlan(object):
+    "The steps to run an example, or an example group and everything in it, in order."
+    def __init__(self, steps):
+        self.steps = steps
+
+    def __repr__(self):
+        return "ExecutionPlan(<%d steps>)" % len(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    @classmethod
+    def compile(cls, example, timeouts):
+        """Flattens the given example (and its examples, if it is a group) into a plan,
+        using the given Timeouts for examples and groups without their own.
+        """
+        compiler = _Compiler(timeouts)
+        compiler.add(example, True)
+        return cls(compiler.steps)
+
+    @classmethod
+    def compile_contents(cls, group, timeouts):
+        "Flattens the examples of the given group into a plan, without the group itself."
+        compiler = _Compiler(timeouts)
+        for example in group:
+            compiler.add(example, False)
+        return cls(compiler.steps)
+
+
+class _Compiler(object):
+    def __init__(self, timeouts):
+        self.timeouts = timeouts
+        self.steps, self.signatures = [], {}
+
+    def resolve(self, fns):
+        calls, signatures = [], self.signatures
+        for fn in fns:
+            try:
+                if fn not in signatures:
+                    signatures[fn] = accepts_arg(fn)
+                calls.append((fn, signatures[fn]))
+            except TypeError: # unhashable
+                calls.append((fn, accepts_arg(fn)))
+        return tuple(calls)
+
+    def add(self, example, is_root):
+        steps = self.steps
+        is_group = is_collection(example)
+        if not is_root and should_skip(example):
+            steps.append(Step(SKIP, example, is_group))
+            return
+        step = Step(RUN, example, is_group, is_root,
+            timeout=self.timeouts.for_example(example, is_group),
+            before=self.resolve(example._before), after=self.resolve(example._after),
+        )
+        if not is_group:
+            step.takes_context = accepts_arg(example.testfn)
+            steps.append(step)
+            return
+        step.kind = ENTER
+        step.lazy = not is_root and is_lazy(example)
+        steps.append(step)
+        if not step.lazy:
+            for child in example:
+                self.add(child, False)
+        step.exit_index = len(steps)
+        steps.append(Step(EXIT, example, is_group, is_root))
@@ -0,0 +1,163 @@
+"""profiling.py - Finds out which functions make specs slow.
+
+ExampleProfiler runs cProfile while examples (and their before and after functions)
+run, keeping a separate profile for the examples of every example group. When a
+group ends, its profile is added to the profile of the whole run, and it is kept
+if it is one of the slowest groups. The report lists the functions that took the
+most cumulative time, for the whole run and for each of the slowest groups.
+
+The runner's own functions (and the global run.* collectors calling their functions)
+are left out of the report, since they are part of the cumulative time of everything.
+"""
+import os
+import sys
+import heapq
+import pstats
+import cProfile
+
+from describe.spec.utils import ensure_directory
+
+
+_spec_directory = os.path.dirname(os.path.abspath(__file__))
+RUNNER_FILES = (
+    os.path.join(_spec_directory, ''),
+    os.path.join(os.path.dirname(_spec_directory), 'run.py'),
+)
+PROFILER_FUNCTIONS = ("<method 'enable' of '_lsprof.Profiler' objects>",
+                      "<method 'disable' of '_lsprof.Profiler' objects>")
+
+
+def format_function(function):
+    "Formats a pstats function tuple like 'spec/cake_spec.py:12(it_is_sweet)'."
+    filename, line, name = function
+    if filename == '~':
+        # builtins, which pstats shows like {time.sleep}.
+        if name.startswith('<') and name.endswith('>'):
+            return '{%s}' % name[1:-1]
+        return name
+    relative = os.path.relpath(filename)
+    if not relative.startswith(os.pardir):
+        filename = relative
+    return '%s:%d(%s)' % (filename, line, name)
+
+
+class ExampleProfiler(object):
+    """Profiles examples, and a formatter that prints the report of the profiles when finalized.
+
+    Parameters:
+        - functions is the number of functions to list for the whole run.
+        - groups is the number of slowest example groups to list functions for.
+        - group_functions is the number of functions to list for each of those groups.
+        - path is where to write the profile of the whole run as a .pstats file, if given.
+    """
+    def __init__(self, stdout=sys.stdout, functions=20, groups=5, group_functions=5, path=None):
+        self.stdout = stdout
+        self.functions, self.groups, self.group_functions = functions, groups, group_functions
+        self.path = path
+        self.stats = None
+        self.slowest_groups = []
+        self.num_examples = 0
+        self._profiles = {}
+        self._active = None
+        self._count = 0
+
+    def __repr__(self):
+        return "ExampleProfiler(path=%r)" % (self.path,)
+
+    def enable(self, example):
+        "Starts profiling the given example, in the profile of the group it is in."
+        module, names, _ = example.identity
+        key = (module, names)
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = self._profiles[key] = cProfile.Profile()
+        self._active = profile
+        self.num_examples += 1
+        profile.enable()
+
+    def disable(self):
+        if self._active is not None:
+            self._active.disable()
+            self._active = None
+
+    def start_example_group(self, example):
+        pass
+
+    def end_example_group(self, example):
+        module, names, name = example.identity
+        profile = self._profiles.pop((module, names + (name,)), None)
+        if profile is not None:
+            self._add(module, names + (name,), profile)
+
+    def skip_example_group(self, example):
+        pass
+
+    def record_example(self, example):
+        return not example.error
+
+    def skip_example(self, example):
+        pass
+
+    def finalize(self):
+        # examples that weren't in a group.
+        for (module, names), profile in self._profiles.items():
+            self._add(module, names, profile)
+        self._profiles = {}
+        if self.stats is None:
+            return
+        self._write()
+        self._write("Profile of %d examples, by cumulative time:" % self.num_examples)
+        self._write_functions(self.stats, self.functions)
+        slowest = sorted(self.slowest_groups, reverse=True)
+        if slowest:
+            self._write()
+            self._write("Slowest %d example groups, by profiled time:" % len(slowest))
+        for total_time, _, key, stats in slowest:
+            self._write("  %.4fs  %s" % (total_time, key))
+            self._write_functions(stats, self.group_functions, indent='    ')
+        if self.path:
+            self.save(self.path)
+        self.stats, self.slowest_groups, self.num_examples = None, [], 0
+
+    def save(self, path):
+        "Writes the profile of the whole run as a .pstats file."
+        ensure_directory(path)
+        self.stats.dump_stats(path)
+        self._write("Wrote the profile to %s" % path)
+
+    #################### Internal Methods ####################
+    def _add(self, module, names, profile):
+        stats = pstats.Stats(profile)
+        if self.stats is None:
+            # a separate copy, since the stats of the whole run are added to.
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(stats)
+        if not self.groups:
+            return
+        self._count += 1
+        item = (stats.total_tt, self._count, '%s:%s' % (module, '.'.join(names)), stats)
+        if len(self.slowest_groups) < self.groups:
+            heapq.heappush(self.slowest_groups, item)
+        elif item[0] > self.slowest_groups[0][0]:
+            heapq.heapreplace(self.slowest_groups, item)
+
+    def _is_reported(self, function):
+        filename, _, name = function
+        if filename == '~':
+            return name not in PROFILER_FUNCTIONS
+        return not filename.startswith(RUNNER_FILES)
+
+    def _write(self, line=''):
+        self.stdout.write(line + '\n')
+
+    def _write_functions(self, stats, limit, indent='  '):
+        rows = [(cumtime, tottime, ncalls, primitive_calls, function)
+                for function, (primitive_calls, ncalls, tottime, cumtime, _) in stats.stats.items()
+                if self._is_reported(function)]
+        rows.sort(reverse=True)
+        self._write("%s%10s  %10s  %10s  %s" % (indent, 'ncalls', 'tottime', 'cumtime', 'function'))
+        for cumtime, tottime, ncalls, primitive_calls, function in rows[:limit]:
+            calls = str(ncalls) if ncalls == primitive_calls else '%d/%d' % (ncalls, primitive_calls)
+            self._write("%s%10s  %9.4fs  %9.4fs  %s" % (indent, calls, tottime, cumtime,
+                                                       format_function(function)))
@@ -0,0 +1,395 @@
+"""results.py - Picklable snapshots of spec results.
+
+Examples hold onto test functions, spec instances and live tracebacks, none of
+which can leave the process that ran them. ResultRecorder is a formatter that
+snapshots everything a formatter needs into plain objects, which can then be
+replayed into any other formatter.
+
+The recorded events are kept in a ResultStore, which stores them in columns instead
+of as one object per result, since big suites record hundreds of thousands of them.
+
+The recorded events can also be saved to a result file (see dump_results), so the
+results of several runs can be merged into one report without importing any specs.
+"""
+import json
+from array import array
+
+from describe.spec.utils import filter_traceback, FailureRecord, PHASES, native_string, ensure_directory
+
+
+class RemoteError(Exception):
+    "Stands in for an exception that was raised somewhere it can't be sent from."
+    def __init__(self, name, message=''):
+        super(RemoteError, self).__init__(message)
+        self.name = name
+
+    @classmethod
+    def from_exception(cls, error):
+        if isinstance(error, RemoteError):
+            return error
+        if isinstance(error, AssertionError):
+            message = getattr(error, 'message', '') or str(error)
+        else:
+            message = str(error)
+        return cls(error.__class__.__name__, message)
+
+    def __reduce__(self):
+        return (self.__class__, (self.name, str(self)))
+
+    def __repr__(self):
+        return "RemoteError(%r, %r)" % (self.name, str(self))
+
+
+def _stream_value(stream):
+    if stream is None:
+        return None
+    return getattr(stream, 'getvalue', lambda: stream)()
+
+
+class ExampleResult(object):
+    "The picklable result of running an Example."
+    def __init__(self, name, error=None, traceback=None, stdout=None, stderr=None,
+            user_time=-1, real_time=-1, key=None, module=None, phase_times=None):
+        self.name, self.key, self.module = name, key, module
+        self.error, self.traceback = error, traceback
+        self.stdout, self.stderr = stdout, stderr
+        self.user_time, self.real_time = user_time, real_time
+        self.phase_times = phase_times
+
+    @classmethod
+    def from_example(cls, example):
+        """Snapshots the example as a formatter currently sees it. Tracebacks that
+        aren't FailureRecords are rendered into a string, since traceback objects can't
+        be pickled.
+        """
+        error, traceback = example.error, example.traceback
+        if error is not None:
+            if traceback and not isinstance(traceback, FailureRecord):
+                traceback = filter_traceback(error, traceback)
+            error = RemoteError.from_exception(error)
+        return cls(
+            example.name, error, traceback,
+            _stream_value(example.stdout), _stream_value(example.stderr),
+            example.user_time, example.real_time, example.key, example.module,
+            getattr(example, 'phase_times', None),
+        )
+
+    def __repr__(self):
+        return "%s(%r, error=%r)" % (self.__class__.__name__, self.name, self.error)
+
+
+class GroupResult(ExampleResult):
+    "The picklable result of running an ExampleGroup."
+
+
+class StringArena(object):
+    """Stores strings back to back in a single buffer, referring to them by index.
+
+    Short strings, like names and keys, are only stored once.
+    """
+    dedupe_length = 256
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array('l', [0])
+        self._ids = {}
+
+    def __repr__(self):
+        return "StringArena(<%d strings, %d bytes>)" % (len(self), len(self.buffer))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getstate__(self):
+        return {'buffer': self.buffer, 'offsets': self.offsets}
+
+    def __setstate__(self, state):
+        self.buffer, self.offsets = state['buffer'], state['offsets']
+        self._ids = {}
+
+    def add(self, value):
+        "Stores the given string. Returns its index, or -1 for None."
+        if value is None:
+            return -1
+        if not isinstance(value, str):
+            value = native_string(value) if isinstance(value, unicode) else str(value)
+        is_short = len(value) <= self.dedupe_length
+        if is_short and value in self._ids:
+            return self._ids[value]
+        index = len(self.offsets) - 1
+        self.buffer.extend(value)
+        self.offsets.append(len(self.buffer))
+        if is_short:
+            self._ids[value] = index
+        return index
+
+    def get(self, index):
+        if index < 0:
+            return None
+        return str(self.buffer[self.offsets[index]:self.offsets[index + 1]])
+
+
+class ResultStore(object):
+    """A compact list of recorded (method, result) events.
+
+    Every event is a row of columns: the kind of event, its timings (including the
+    time spent in each of the PHASES) and the indexes of its strings in a StringArena.
+    Result objects are only created when the events are read. Iterate over the store
+    to get the same result object for the start and end of a group, like replay() needs.
+    """
+    STRING_FIELDS = 8 # name, key, module, error name, error message, traceback, stdout, stderr
+    TIME_FIELDS = 2 + len(PHASES) # user time, real time, phase times
+
+    def __init__(self, events=()):
+        self.codes = array('c')
+        self.times = array('d')
+        self.fields = array('l')
+        self.strings = StringArena()
+        for event in events:
+            self.append(event)
+
+    def __repr__(self):
+        return "ResultStore(<%d events>)" % len(self)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def append(self, event):
+        method, result = event
+        error = result.error
+        if error is not None:
+            error = RemoteError.from_exception(error)
+        traceback = result.traceback
+        if traceback and not isinstance(traceback, basestring):
+            traceback = filter_traceback(result.error, traceback)
+        add = self.strings.add
+        self.codes.append(EVENT_CODES[method])
+        self.times.extend((result.user_time, result.real_time))
+        self.times.extend(result.phase_times or _NO_PHASE_TIMES)
+        self.fields.extend((
+            add(result.name), add(result.key), add(result.module),
+            add(error and error.name), add(error and str(error)), add(traceback or None),
+            add(_stream_value(result.stdout)), add(_stream_value(result.stderr)),
+        ))
+
+    def _result(self, index):
+        method = EVENT_METHODS[self.codes[index]]
+        cls = ExampleResult if method in ('record_example', 'skip_example') else GroupResult
+        get, start = self.strings.get, index * self.STRING_FIELDS
+        name, key, module, error_name, message, traceback, stdout, stderr = [
+            get(i) for i in self.fields[start:start + self.STRING_FIELDS]
+        ]
+        error = None if error_name is None else RemoteError(error_name, message)
+        start = index * self.TIME_FIELDS
+        times = self.times[start:start + self.TIME_FIELDS]
+        user_time, real_time, phase_times = times[0], times[1], tuple(times[2:])
+        if not any(phase_times):
+            phase_times = None
+        return method, cls(name, error, traceback, stdout, stderr, user_time, real_time, key, module,
+                           phase_times)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._result(index)
+
+    def __iter__(self):
+        group_stack = []
+        for index in xrange(len(self)):
+            method, result = self._result(index)
+            if method == 'start_example_group':
+                group_stack.append(result)
+            elif method == 'end_example_group':
+                # timings and errors are only known once the group has finished.
+                group = group_stack.pop()
+                group.error, group.traceback = result.error, result.traceback
+                group.user_time, group.real_time = result.user_time, result.real_time
+                group.phase_times = result.phase_times
+                result = group
+            yield method, result
+
+    def tally(self):
+        "Returns a tuple of (successes, failures, skipped), without creating any results."
+        successes, failures, skipped = 0, 0, 0
+        error_names = self.fields[3::self.STRING_FIELDS]
+        for code, error_name in zip(self.codes, error_names):
+            if code == 'e':
+                if error_name < 0:
+                    successes += 1
+                else:
+                    failures += 1
+            elif code == 's':
+                skipped += 1
+        return successes, failures, skipped
+
+
+class ResultRecorder(object):
+    """A formatter that records the results it is given as a ResultStore of picklable events.
+
+    Use replay() to send the recorded events to another formatter.
+    """
+    def __init__(self):
+        self.events = ResultStore()
+
+    def __repr__(self):
+        return "ResultRecorder(<%d events>)" % len(self.events)
+
+    def start_example_group(self, example):
+        self.events.append(('start_example_group', GroupResult.from_example(example)))
+
+    def end_example_group(self, example):
+        self.events.append(('end_example_group', GroupResult.from_example(example)))
+
+    def skip_example_group(self, example):
+        self.events.append(('skip_example_group', GroupResult.from_example(example)))
+
+    def record_example(self, example):
+        self.events.append(('record_example', ExampleResult.from_example(example)))
+        return not example.error
+
+    def skip_example(self, example):
+        self.events.append(('skip_example', ExampleResult.from_example(example)))
+
+    def finalize(self):
+        pass
+
+
+def replay(events, formatter):
+    "Sends recorded events to the given formatter, in the order they were recorded."
+    for method, result in events:
+        getattr(formatter, method)(result)
+
+
+def tally(events):
+    "Returns a tuple of (successes, failures, skipped) for the recorded events."
+    if isinstance(events, ResultStore):
+        return events.tally()
+    successes, failures, skipped = 0, 0, 0
+    for method, result in events:
+        if method == 'record_example':
+            if result.error is None:
+                successes += 1
+            else:
+                failures += 1
+        elif method == 'skip_example':
+            skipped += 1
+    return successes, failures, skipped
+
+
+RESULTS_FORMAT = 'describe-results'
+RESULTS_VERSION = 2
+# version 1 files are the same, but without phase times.
+READABLE_RESULTS_VERSIONS = (1, 2)
+EVENT_CODES = {
+    'start_example_group': 'g',
+    'end_example_group': 'G',
+    'skip_example_group': 'x',
+    'record_example': 'e',
+    'skip_example': 's',
+}
+EVENT_METHODS = dict((code, method) for method, code in EVENT_CODES.items())
+_NO_PHASE_TIMES = (0.0,) * len(PHASES)
+
+
+class ResultFileError(ValueError):
+    "Raised when a result file can not be read."
+
+
+def _encode_result(result):
+    error = result.error
+    if error is not None:
+        error = RemoteError.from_exception(error)
+        error = [error.name, str(error)]
+    return [
+        result.name, result.key, result.module, error, filter_traceback(error, result.traceback) or None,
+        result.stdout, result.stderr, result.user_time, result.real_time,
+        list(result.phase_times) if result.phase_times else None,
+    ]
+
+
+def _decode_result(cls, values):
+    name, key, module, error, traceback, stdout, stderr, user_time, real_time = values[:9]
+    phase_times = tuple(values[9]) if len(values) > 9 and values[9] else None
+    # only text that can end up in the output needs to be converted, which keeps
+    # loading passing examples fast.
+    if error is not None or cls is GroupResult:
+        name, key, module, traceback, stdout, stderr = map(native_string, (
+            name, key, module, traceback, stdout, stderr
+        ))
+        if error is not None:
+            error = RemoteError(*map(native_string, error))
+    return cls(name, error, traceback, stdout, stderr, user_time, real_time, key, module, phase_times)
+
+
+def dump_results(events, stream):
+    "Writes the recorded events to the given file-like object."
+    encoded = []
+    for method, result in events:
+        # the end of a group is matched up with its start when loading.
+        encoded.append([EVENT_CODES[method]] + _encode_result(result))
+    json.dump({'format': RESULTS_FORMAT, 'version': RESULTS_VERSION, 'events': encoded},
+              stream, separators=(',', ':'))
+
+
+def load_results(stream):
+    "Reads the events written by dump_results from the given file-like object."
+    try:
+        document = json.load(stream)
+    except ValueError as e:
+        raise ResultFileError("Not a result file: %s" % e)
+    if not isinstance(document, dict) or document.get('format') != RESULTS_FORMAT:
+        raise ResultFileError("Not a result file.")
+    if document.get('version') not in READABLE_RESULTS_VERSIONS:
+        raise ResultFileError("Unsupported result file version: %r" % document.get('version'))
+
+    events, group_stack = [], []
+    for values in document['events']:
+        method = EVENT_METHODS[values[0]]
+        if method == 'end_example_group':
+            group = group_stack.pop()
+            finished = _decode_result(GroupResult, values[1:])
+            group.error, group.traceback = finished.error, finished.traceback
+            group.user_time, group.real_time = finished.user_time, finished.real_time
+            group.phase_times = finished.phase_times
+            events.append((method, group))
+            continue
+        cls = GroupResult if method in ('start_example_group', 'skip_example_group') else ExampleResult
+        result = _decode_result(cls, values[1:])
+        if method == 'start_example_group':
+            group_stack.append(result)
+        events.append((method, result))
+    return events
+
+
+def merge_results(paths, formatter):
+    """Replays the result files at the given paths into the formatter, in order.
+    Returns a tuple indicating the number of (succeses, failures, skipped).
+    """
+    total_successes, total_errors, total_skipped = 0, 0, 0
+    for path in paths:
+        with open(path) as handle:
+            events = load_results(handle)
+        replay(events, formatter)
+        successes, errors, skips = tally(events)
+        total_successes += successes
+        total_errors += errors
+        total_skipped += skips
+    formatter.finalize()
+    return total_successes, total_errors, total_skipped
+
+
+class ResultFileWriter(ResultRecorder):
+    "A formatter that writes the results it is given to a result file when finalized."
+    def __init__(self, path):
+        super(ResultFileWriter, self).__init__()
+        self.path = path
+
+    def __repr__(self):
+        return "ResultFileWriter(%r)" % (self.path,)
+
+    def finalize(self):
+        ensure_directory(self.path)
+        with open(self.path, 'w') as handle:
+            dump_results(self.events, handle)
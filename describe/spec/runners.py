@@ -5,27 +5,137 @@ from itertools import izip_longest
 from cStringIO import StringIO
 
 from describe.mock.registry import Registry
-from describe.spec.containers  import Context, ExampleGroup, Example
-from describe.utils import Replace
-from describe.spec.utils import Benchmark, CallOnce, \
-        accepts_arg, get_true_function, func_equal, tabulate, NOOP
+from describe.spec.containers  import Context
+from describe.spec.utils import Benchmark, Timeout, TimeoutError, UserCode, tabulate, FailureRecord, \
+        EXAMPLE_PHASE_NAMES, GROUP_PHASE_NAMES
+from describe.spec.plan import ExecutionPlan, ENTER, EXIT, RUN, is_collection, should_skip
 from describe import run
 
 
+# timeouts only interrupt examples and their before and after functions, so they can't
+# expire in the middle of the runner recording a result.
+USER_CODE = UserCode()
+
+
+class FailureLimit(object):
+    """Tells runners to stop running examples once max_failures examples have failed.
+
+    Give a multiprocessing.Value as shared_count to count the failures of several
+    processes together.
+    """
+    def __init__(self, max_failures, shared_count=None):
+        self.max_failures = max_failures
+        self.shared_count = shared_count
+        self._num_failures = 0
+
+    def __repr__(self):
+        return "FailureLimit(%r, failures=%r)" % (self.max_failures, self.num_failures)
+
+    @property
+    def num_failures(self):
+        if self.shared_count is not None:
+            return self.shared_count.value
+        return self._num_failures
+
+    def record_failure(self):
+        if self.shared_count is not None:
+            with self.shared_count.get_lock():
+                self.shared_count.value += 1
+        else:
+            self._num_failures += 1
+
+    @property
+    def reached(self):
+        return self.num_failures >= self.max_failures
+
+
+class Timeouts(object):
+    """The number of seconds examples and example groups may take to run, unless they
+    set their own timeout. None means no timeout.
+    """
+    def __init__(self, example=None, group=None):
+        self.example, self.group = example, group
+
+    def __repr__(self):
+        return "Timeouts(example=%r, group=%r)" % (self.example, self.group)
+
+    def for_example(self, example, is_group=False):
+        if example.timeout is not None:
+            return example.timeout
+        return self.group if is_group else self.example
+
+
+class RetentionPolicy(object):
+    """Decides what examples keep once the formatter has recorded them.
+
+    Passing examples release their captured stdout and stderr, unless keep_output is
+    True. With keep_locals, the FailureRecords of failed examples also keep the reprs of
+    the local variables of their frames.
+    """
+    def __init__(self, keep_output=False, keep_locals=False):
+        self.keep_output, self.keep_locals = keep_output, keep_locals
+
+    def __repr__(self):
+        return "RetentionPolicy(keep_output=%r, keep_locals=%r)" % (self.keep_output, self.keep_locals)
+
+    def release(self, example):
+        if example.error is None and not self.keep_output:
+            example.stdout = example.stderr = None
+
+
+class _GroupFrame(object):
+    "The state of an example group the runner is currently in."
+    __slots__ = ('step', 'context', 'benchmark', 'timeout', 'stdout', 'stderr', 'failed')
+
+    def __init__(self, step):
+        self.step = step
+        self.context = self.benchmark = self.timeout = None
+        self.stdout, self.stderr = sys.stdout, sys.stderr
+        self.failed = False
+
+
 class ExampleRunner(object):
-    def __init__(self, example, formatter):
+    """Runs an example, or an example group and all the examples in it.
+
+    The example is compiled into an ExecutionPlan once, which the runner then walks
+    instead of inspecting every example while running it. Groups that load their
+    examples lazily are loaded, compiled and walked once the runner gets to them, and
+    let go of once they have finished.
+
+    The tracebacks of failures are copied into FailureRecords as soon as they are
+    caught. Examples keep their output after running, unless a RetentionPolicy is
+    given to release it.
+
+    If an ExampleProfiler is given, examples and their before and after functions run
+    while it is enabled. If a Tracer is given, spans of the example groups, their before
+    and after functions and the examples are added to it.
+    """
+    def __init__(self, example, formatter, failure_limit=None, timeouts=None, retention=None,
+            profiler=None, tracer=None):
         self.example, self.formatter = example, formatter
+        self.failure_limit = failure_limit
+        self.timeouts = timeouts or Timeouts()
+        self.retention = retention
+        self.profiler = profiler
+        self.tracer = tracer
         self.has_ran = False
         self.is_root_runner = False
         self.num_successes = 0
         self.num_failures = 0
         self.num_skipped = 0
+        self._plan = None
 
     def __repr__(self):
         return "ExampleRunner(%r, %r)" % (self.example, self.formatter)
 
+    @property
+    def plan(self):
+        if self._plan is None:
+            self._plan = ExecutionPlan.compile(self.example, self.timeouts)
+        return self._plan
+
     def should_skip(self):
-        return (not callable(self.example.testfn) and not len(self.example))
+        return should_skip(self.example)
 
     def execute(self, context=None, stdout=None, stderr=None):
         """Does all the work of running an example.
@@ -38,29 +148,11 @@ class ExampleRunner(object):
         - execute after functions
         - record the results & timings to formatter and original example object
         """
-        total_benchmark = Benchmark()
         self.context = context or Context()
-        if self._is_collection():
-            self.stdout = sys.stdout
-            self.stderr = sys.stderr
-        else:
-            self.stdout = stdout or StringIO()
-            self.stderr = stderr or StringIO()
-        self._record_start_example(self.formatter)
         try:
-            with total_benchmark, Replace(sys, 'stdout', self.stdout), Replace(sys, 'stderr', self.stderr):
-                self._setup()
-                self._execute()
-                self._teardown()
-        except Exception as e:
-            self.example.error = e
-            self.example.traceback = sys.exc_info()[2] #traceback.format_exc()
+            self._walk(self.plan.steps, stdout, stderr)
         finally:
-            self.example.real_time = total_benchmark.total_time
-            self._record_end_example(self.formatter)
             self.context = None
-            self.example.stdout = self.stdout
-            self.example.stderr = self.stderr
         return self.example.error is None
 
     def run(self, context=None, stdout=None, stderr=None):
@@ -73,91 +165,282 @@ class ExampleRunner(object):
         return self.num_successes, self.num_failures, self.num_skipped
 
     #################### Internal Methods ####################
-    def _setup(self):
-        "Resets the state and prepares for running the example."
-        self.example.error = None
-        self.example.traceback = ''
-        # inject function contexts from parent functions
-        c = Context(parent=self.context)
-        #for parent in reversed(self.example.parents):
-        #    c._update_properties(locals_from_function(parent))
-        self.context = c
-        if self.is_root_runner:
-            run.before_all.execute(self.context)
-        self.example.before(self.context)
-
     def _is_collection(self):
         """Returns True if the given example is a collection of examples
         (aka, ExampleGroup), or just one example.
 
         """
+        return is_collection(self.example)
+
+    def _walk(self, steps, stdout=None, stderr=None, context=None, nested=False):
+        "Runs the steps of the plan, keeping a stack of the groups it is in."
+        stack, index, num_steps = [], 0, len(steps)
+        failure_limit = self.failure_limit
+        context = self.context if context is None else context
         try:
-            iter(self.example)
-            return True
-        except TypeError:
-            return False
-
-    def _execute(self):
-        "Executes the example."
-        # IDEA: this is some code smell....
-        # perhaps break into two classes and have another
-        # class as the interface.
-        if self._is_collection():
-            self._execute_example_group()
-        else:
-            self._execute_example()
-
-    def _execute_example_group(self):
-        "Handles the execution of Example Group"
-        for example in self.example:
-            runner = self.__class__(example, self.formatter)
-            runner.is_root_runner = False
-            successes, failures, skipped = runner.run(self.context)
-            self.num_successes += successes
-            self.num_failures += failures
-            self.num_skipped += skipped
-
-    def _execute_example(self):
-        "Handles the execution of the Example"
-        test_benchmark = Benchmark()
-        try:
-            with Registry(), test_benchmark:
-                if accepts_arg(self.example.testfn):
-                    self.example.testfn(self.context)
+            while index < num_steps:
+                step = steps[index]
+                kind = step.kind
+                if kind is EXIT:
+                    error = self._exit_group(stack[-1])
+                    if error is None:
+                        stack.pop()
+                    index += 1
+                elif failure_limit is not None and failure_limit.reached and (stack or nested):
+                    if not stack:
+                        break
+                    # still let the current group's after functions run.
+                    index = stack[-1].step.exit_index
+                    continue
+                elif kind is RUN:
+                    error = self._execute_example(step, stack[-1].context if stack else context, stdout, stderr)
+                    index += 1
+                elif kind is ENTER:
+                    if step.lazy and not self._load_group(step):
+                        index = step.exit_index + 1
+                        continue
+                    frame = _GroupFrame(step)
+                    stack.append(frame)
+                    error = self._enter_group(frame, stack[-2].context if len(stack) > 1 else context)
+                    if error is not None:
+                        # an outer group timed out, its examples are skipped while unwinding.
+                        if step.lazy:
+                            self._skip_steps(ExecutionPlan.compile_contents(step.example, self.timeouts).steps)
+                        index += 1
+                    elif frame.failed:
+                        index = step.exit_index
+                    elif step.lazy:
+                        error = self._walk_contents(frame, stdout, stderr)
+                        index = step.exit_index
+                    else:
+                        index += 1
                 else:
-                    self.context.inject_into_self(self.example.testfn)
-                    self.example.testfn()
-                self.num_successes += 1
-        except KeyboardInterrupt:
-            # bubble interrupt for canceling spec execution
-            raise
-        except:
+                    self._record_skipped_example(self.formatter, step)
+                    self.num_skipped += 1
+                    index += 1
+
+                if error is not None:
+                    index = self._unwind(stack, steps, index, *error)
+        except BaseException:
+            while stack:
+                self._close_group(stack.pop())
             raise
+
+    def _load_group(self, step):
+        "Loads the examples of a lazy group. Returns False (after recording a skip) if it has none."
+        group = step.example
+        if self.tracer is not None:
+            with self.tracer.span(group.name, 'extract'):
+                has_examples = bool(len(group))
+        else:
+            has_examples = bool(len(group))
+        if has_examples:
+            return True
+        self._record_skipped_example(self.formatter, step)
+        self.num_skipped += 1
+        group.release()
+        return False
+
+    def _walk_contents(self, frame, stdout, stderr):
+        """Compiles and runs the examples of a lazy group. Returns the (error, traceback) of
+        the timeout of a group it is in that expired, if any.
+        """
+        steps = ExecutionPlan.compile_contents(frame.step.example, self.timeouts).steps
+        try:
+            self._walk(steps, stdout, stderr, frame.context, nested=True)
+        except TimeoutError as e:
+            return e, sys.exc_info()[2]
+
+    def _enter_group(self, frame, context):
+        """Handles the start of an example group. Returns the (error, traceback) of the timeout
+        of an outer group that expired, if any.
+        """
+        step = frame.step
+        group = step.example
+        self.formatter.start_example_group(group)
+        frame.benchmark = Benchmark(keep_laps=self.tracer is not None)
+        frame.benchmark.start()
+        frame.timeout = Timeout(step.timeout, group.name, USER_CODE).__enter__()
+        try:
+            group.error = None
+            group.traceback = ''
+            frame.context = Context(parent=context)
+            with USER_CODE:
+                if step.is_root and self.is_root_runner:
+                    run.before_all.execute(frame.context)
+                    frame.benchmark.lap('global_setup')
+                step.run_before(frame.context, frame.benchmark)
+        except Exception as e:
+            return self._group_failed(frame, e)
+
+    def _exit_group(self, frame):
+        "Handles the end of an example group. Returns the same as _enter_group."
+        step = frame.step
+        # the time since the group's before functions was spent on its examples.
+        frame.benchmark.lap('body')
+        if not frame.failed:
+            try:
+                self._run_after_group(frame)
+            except Exception as e:
+                error = self._group_failed(frame, e)
+                if error is not None:
+                    return error
+        self._close_group(frame)
+
+    def _run_after_group(self, frame):
+        step = frame.step
+        with USER_CODE:
+            step.run_after(frame.context, frame.benchmark)
+            if step.is_root:
+                if self.is_root_runner:
+                    run.after_all.execute(frame.context)
+                    frame.benchmark.lap('global_teardown')
+                self.has_ran = True
+
+    def _capture(self, error, traceback):
+        with_locals = self.retention is not None and self.retention.keep_locals
+        return FailureRecord.capture(error, traceback, with_locals=with_locals)
+
+    def _group_failed(self, frame, error):
+        group = frame.step.example
+        traceback = sys.exc_info()[2]
+        group.error = error
+        group.traceback = self._capture(error, traceback)
+        frame.failed = True
+        if isinstance(error, TimeoutError) and error.timeout not in (None, frame.timeout):
+            return error, traceback
+
+    def _close_group(self, frame):
+        group = frame.step.example
+        frame.timeout.__exit__(None, None, None)
+        if group.error is not None:
             self.num_failures += 1
+            if self.failure_limit is not None:
+                self.failure_limit.record_failure()
+        frame.benchmark.stop()
+        group.real_time = frame.benchmark.total_time
+        group.phase_times = frame.benchmark.phase_times()
+        if self.tracer is not None:
+            self.tracer.add_benchmark(group.name, 'group', frame.benchmark, GROUP_PHASE_NAMES)
+        self.formatter.end_example_group(group)
+        group.stdout, group.stderr = frame.stdout, frame.stderr
+        if self.retention is not None:
+            self.retention.release(group)
+        if frame.step.lazy:
+            group.release()
+
+    def _unwind(self, stack, steps, index, error, traceback):
+        """Stops running the groups up to the one whose timeout expired, recording the
+        steps of them that haven't run yet as skipped. Their after functions still run.
+        Returns the index of the step after that group.
+        """
+        while stack:
+            frame = stack.pop()
+            step = frame.step
+            index = self._skip_steps(steps, index, step.exit_index)
+            frame.benchmark.lap('body')
+            if not frame.failed:
+                try:
+                    self._run_after_group(frame)
+                except TimeoutError as e:
+                    if e.timeout is not frame.timeout:
+                        # a group further out timed out too.
+                        error, traceback = e, sys.exc_info()[2]
+                except Exception:
+                    pass # the group already failed with the timeout.
+            group = step.example
+            if error.timeout is frame.timeout:
+                group.error, group.traceback = error, self._capture(error, traceback)
+                self._close_group(frame)
+                return step.exit_index + 1
+            # the groups inside the one that timed out only stopped early.
+            group.error, group.traceback = None, ''
+            self._close_group(frame)
+        # the timeout belongs to whoever is running us.
+        self._skip_steps(steps, index)
+        raise error, None, traceback
+
+    def _skip_steps(self, steps, index=0, end=None):
+        "Records the examples and groups of the steps from index up to end as skipped."
+        end = len(steps) if end is None else end
+        while index < end:
+            step = steps[index]
+            if step.kind is not EXIT:
+                self._record_skipped_example(self.formatter, step)
+                self.num_skipped += 1
+            index = step.exit_index + 1 if step.kind is ENTER else index + 1
+        return index
+
+    def _execute_example(self, step, context, stdout=None, stderr=None):
+        "Runs a single example. Returns the same as _enter_group."
+        example = step.example
+        total_benchmark = Benchmark(keep_laps=self.tracer is not None)
+        stdout = stdout or StringIO()
+        stderr = stderr or StringIO()
+        timeout = Timeout(step.timeout, example.name, USER_CODE) if step.timeout else None
+        profiler = self.profiler
+        original_streams = sys.stdout, sys.stderr
+        total_benchmark.start()
+        try:
+            sys.stdout, sys.stderr = stdout, stderr
+            if timeout is not None:
+                timeout.__enter__()
+            if profiler is not None:
+                profiler.enable(example)
+            try:
+                example.error = None
+                example.traceback = ''
+                context = Context(parent=context)
+                with USER_CODE:
+                    if step.is_root and self.is_root_runner:
+                        run.before_all.execute(context)
+                        total_benchmark.lap('global_setup')
+                    step.run_before(context, total_benchmark)
+                    try:
+                        with Registry():
+                            step.call(context)
+                        self.num_successes += 1
+                    finally:
+                        example.user_time = total_benchmark.lap('body')
+                    step.run_after(context, total_benchmark)
+                    if step.is_root:
+                        if self.is_root_runner:
+                            run.after_all.execute(context)
+                            total_benchmark.lap('global_teardown')
+                        self.has_ran = True
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                if timeout is not None:
+                    timeout.__exit__(None, None, None)
+        except Exception as e:
+            traceback = sys.exc_info()[2]
+            example.error = e
+            example.traceback = self._capture(e, traceback)
+            self.num_failures += 1
+            if self.failure_limit is not None:
+                self.failure_limit.record_failure()
         finally:
-            self.example.user_time = test_benchmark.total_time
-
-    def _teardown(self):
-        "Handles the restoration of any potential global state set."
-        self.example.after(self.context)
-        if self.is_root_runner:
-            run.after_all.execute(self.context)
-        #self.context = self.context._parent
-        self.has_ran = True
-
-    def _record_start_example(self, formatter):
-        if self._is_collection():
-            formatter.start_example_group(self.example)
-
-    def _record_end_example(self, formatter):
-        if self._is_collection():
-            formatter.end_example_group(self.example)
-        else:
-            formatter.record_example(self.example)
+            sys.stdout, sys.stderr = original_streams
+            total_benchmark.stop()
+            example.real_time = total_benchmark.total_time
+            example.phase_times = total_benchmark.phase_times()
+            if self.tracer is not None:
+                self.tracer.add_benchmark(example.name, 'example', total_benchmark, EXAMPLE_PHASE_NAMES)
+            self.formatter.record_example(example)
+            example.stdout = stdout
+            example.stderr = stderr
+        if self.retention is not None:
+            self.retention.release(example)
+        error = example.error
+        if isinstance(error, TimeoutError) and error.timeout is not timeout:
+            # the timeout of a group we're in expired, so stop running that group.
+            return error, traceback
 
-    def _record_skipped_example(self, formatter):
-        if self._is_collection():
-            formatter.skip_example_group(self.example)
+    def _record_skipped_example(self, formatter, step=None):
+        example = step.example if step else self.example
+        is_group = step.is_group if step else self._is_collection()
+        if is_group:
+            formatter.skip_example_group(example)
         else:
-            formatter.skip_example(self.example)
-
+            formatter.skip_example(example)
@@ -0,0 +1,178 @@
+"""sampling.py - Samples the stack of a run, for flame graphs.
+
+Unlike deterministic profiling, sampling barely slows specs down: StackSampler
+asks for a SIGPROF every interval seconds of CPU time (so sleeping and blocking on
+I/O aren't sampled) and counts the stack of the interrupted frame, along with the
+example that was running at that moment.
+
+The counts are written as folded stacks, one 'outer;inner;innermost count' line per
+distinct stack, which flame graph tools (like flamegraph.pl or speedscope) read:
+one file for the whole run and one for every example that was sampled.
+"""
+import os
+import re
+import sys
+import signal
+
+from describe.spec.utils import describe_path, ensure_directory
+
+
+def default_samples_path(directory=None):
+    return describe_path('samples', directory)
+
+
+def frame_label(code):
+    "Describes the function of a code object like 'it_is_sweet (spec/cake_spec.py:12)'."
+    filename = code.co_filename
+    relative = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    if not relative.startswith(os.pardir):
+        filename = relative
+    return '%s (%s:%d)' % (code.co_name, filename, code.co_firstlineno)
+
+
+def safe_filename(key):
+    "Turns an example key into a file name."
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', key).strip('_') or 'example'
+
+
+class StackSampler(object):
+    """Samples the stack of the main thread every interval seconds of CPU time, and a
+    formatter that writes the folded stacks into directory when finalized.
+
+    The runner enables the sampler while an example runs, which tags the samples taken
+    meanwhile with the example's key. Worker processes start their own sampler and
+    send the folded stacks they drained back to be merged.
+    """
+    def __init__(self, directory, interval=0.005, stdout=sys.stdout):
+        self.directory, self.interval = directory, interval
+        self.stdout = stdout
+        self.folded = {}
+        self.num_samples = 0
+        self._counts = {}
+        self._current = None
+        self._previous_handler = None
+        self.is_running = False
+
+    def __repr__(self):
+        return "StackSampler(%r, interval=%r)" % (self.directory, self.interval)
+
+    @classmethod
+    def is_supported(cls):
+        return hasattr(signal, 'setitimer') and hasattr(signal, 'SIGPROF')
+
+    def start(self):
+        """Starts sampling the current process, forgetting the samples that weren't
+        drained (like those a forked worker process inherited).
+        """
+        self._counts = {}
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        # restart system calls the signal interrupts, instead of failing them.
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.is_running = True
+        return self
+
+    def stop(self):
+        if not self.is_running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self.is_running = False
+
+    def enable(self, example):
+        "Tags the samples taken from now on with the key of the given example."
+        self._current = example.key
+
+    def disable(self):
+        self._current = None
+
+    def drain(self):
+        """Returns the folded stacks sampled since the last drain, as a dictionary of
+        example key (None outside of examples) => {folded stack: count}.
+        """
+        counts, self._counts = self._counts, {}
+        labels = {}
+        drained = {}
+        for key, stacks in counts.items():
+            folded = drained[key] = {}
+            for codes, count in stacks.items():
+                names = []
+                for code in codes:
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = frame_label(code).replace(';', ':')
+                    names.append(label)
+                stack = ';'.join(names)
+                folded[stack] = folded.get(stack, 0) + count
+        return drained
+
+    def merge(self, drained):
+        "Adds the folded stacks drained from a sampler (like that of a worker process)."
+        for key, stacks in drained.items():
+            folded = self.folded.setdefault(key, {})
+            for stack, count in stacks.items():
+                folded[stack] = folded.get(stack, 0) + count
+                self.num_samples += count
+
+    def start_example_group(self, example):
+        pass
+
+    def end_example_group(self, example):
+        pass
+
+    def skip_example_group(self, example):
+        pass
+
+    def record_example(self, example):
+        return not example.error
+
+    def skip_example(self, example):
+        pass
+
+    def finalize(self):
+        self.stop()
+        self.merge(self.drain())
+        if not self.folded:
+            return
+        whole_run = {}
+        for stacks in self.folded.values():
+            for stack, count in stacks.items():
+                whole_run[stack] = whole_run.get(stack, 0) + count
+        self._write_folded(os.path.join(self.directory, 'run.folded'), whole_run)
+        examples_directory = os.path.join(self.directory, 'examples')
+        self._remove_folded(examples_directory)
+        for key, stacks in self.folded.items():
+            if key is not None:
+                self._write_folded(os.path.join(examples_directory, safe_filename(key) + '.folded'), stacks)
+        self.stdout.write("\nWrote %d stack samples of %d examples to %s\n" % (
+            self.num_samples, len([key for key in self.folded if key is not None]), self.directory))
+        self.folded, self.num_samples = {}, 0
+
+    #################### Internal Methods ####################
+    def _sample(self, signum, frame):
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        stack = tuple(codes)
+        stacks = self._counts.get(self._current)
+        if stacks is None:
+            stacks = self._counts[self._current] = {}
+        stacks[stack] = stacks.get(stack, 0) + 1
+
+    def _remove_folded(self, directory):
+        "Removes the folded stacks of examples of a previous run."
+        try:
+            filenames = os.listdir(directory)
+        except OSError:
+            return
+        for filename in filenames:
+            if filename.endswith('.folded'):
+                os.remove(os.path.join(directory, filename))
+
+    def _write_folded(self, path, stacks):
+        ensure_directory(path)
+        with open(path, 'w') as handle:
+            for stack, count in sorted(stacks.items()):
+                handle.write('%s %d\n' % (stack, count))
@@ -0,0 +1,131 @@
+"""selection.py - Chooses which examples to run by name and tag.
+
+Spec classes and example methods can declare tags with a `tags` attribute:
+
+    class DescribeDatabase:
+        tags = ('slow', 'db')
+
+        def it_connects(self):
+            pass
+        it_connects.tags = 'network'
+
+Examples have their own tags and the tags of every group they are in.
+"""
+import re
+
+from describe.spec.formatters import prettyprint
+
+
+def as_tags(value):
+    "Converts the value of a `tags` attribute (a string or an iterable of strings) to a frozenset."
+    tags = value or ()
+    if isinstance(tags, basestring):
+        tags = (tags,)
+    try:
+        return frozenset(tags)
+    except TypeError:
+        return frozenset()
+
+
+def get_tags(obj):
+    "Returns the frozenset of tags declared by the `tags` attribute of a spec class or example."
+    return as_tags(getattr(obj, 'tags', None))
+
+
+class Selection(object):
+    """Selects the examples whose path matches any of the expressions, that have any of
+    the tags and that have none of the excluded_tags. Empty arguments select everything.
+
+    Expressions are matched case-insensitively, as a substring or as a regular expression,
+    against both the prettyprinted path of an example (like 'describe cake when frosted it
+    is sweet') and its key (like 'cake_spec:DescribeCake.WhenFrosted.it_is_sweet').
+    """
+    def __init__(self, expressions=(), tags=(), excluded_tags=()):
+        self.expressions = tuple(expressions)
+        self.tags, self.excluded_tags = frozenset(tags), frozenset(excluded_tags)
+        self._patterns = []
+        self._pretty_names = {}
+        for expression in self.expressions:
+            try:
+                regex = re.compile(expression, re.IGNORECASE)
+            except re.error:
+                regex = None
+            self._patterns.append((expression.lower(), regex))
+
+    def __repr__(self):
+        return "Selection(%r, tags=%r, excluded_tags=%r)" % (
+            self.expressions, sorted(self.tags), sorted(self.excluded_tags))
+
+    def __nonzero__(self):
+        return bool(self.expressions or self.tags or self.excluded_tags)
+
+    def matches(self, module, names, tags=frozenset()):
+        """Returns True if the example with the given module, names (of its groups and
+        itself) and tags (including those of its groups) is selected.
+        """
+        path = ' '.join(self._prettyprint(name) for name in names)
+        return self._matches(path, '%s:%s' % (module, '.'.join(names)), tags)
+
+    def selected_names(self, module, outline):
+        """Returns the set of names (tuples of the names of the groups an example is in and
+        its own) of the outlined examples that are selected and of the groups they are in.
+        """
+        selected = set()
+        self._collect(outline, '', '%s:' % (module,), (), frozenset(), selected)
+        return selected
+
+    def selects(self, entry):
+        "Returns True if any example of the given IndexEntry is selected."
+        key = entry.modulepath + ':'
+        return any(self._selects(outline, '', key, frozenset()) for outline in entry.outlines)
+
+    def _selects(self, outline, path, key, tags):
+        # the path and key of the groups are built once, instead of for every example.
+        pretty = self._prettyprint(outline.name)
+        path = path + ' ' + pretty if path else pretty
+        key = key + outline.name if key.endswith(':') else key + '.' + outline.name
+        if outline.tags:
+            tags = tags | outline.tags
+        if not outline.is_group:
+            return self._matches(path, key, tags)
+        return any(self._selects(child, path, key, tags) for child in outline.children)
+
+    def _collect(self, outline, path, key, names, tags, selected):
+        # like _selects, but goes through every child to find all the selected examples.
+        pretty = self._prettyprint(outline.name)
+        path = path + ' ' + pretty if path else pretty
+        key = key + outline.name if key.endswith(':') else key + '.' + outline.name
+        names = names + (outline.name,)
+        if outline.tags:
+            tags = tags | outline.tags
+        if not outline.is_group:
+            is_selected = self._matches(path, key, tags)
+        else:
+            is_selected = False
+            for child in outline.children:
+                if self._collect(child, path, key, names, tags, selected):
+                    is_selected = True
+        if is_selected:
+            selected.add(names)
+        return is_selected
+
+    def _matches(self, path, key, tags):
+        if tags & self.excluded_tags:
+            return False
+        if self.tags and not tags & self.tags:
+            return False
+        if not self._patterns:
+            return True
+        for text in (path, key):
+            lowered = text.lower()
+            for substring, regex in self._patterns:
+                if substring in lowered or (regex is not None and regex.search(text)):
+                    return True
+        return False
+
+    def _prettyprint(self, name):
+        # the names of groups are shared by all of their examples.
+        pretty = self._pretty_names.get(name)
+        if pretty is None:
+            pretty = self._pretty_names[name] = ' '.join(prettyprint(name).split())
+        return pretty
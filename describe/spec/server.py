@@ -0,0 +1,178 @@
+"""server.py - Keeps an interpreter warm for running specs repeatedly.
+
+SpecServer listens on a unix domain socket. For every request, it forks a child
+that changes into the client's working directory and runs the given command line
+arguments, so each run starts with the imports the server has already made but
+none of the modules (or state) of previous runs. The output of the child is
+streamed back to the SpecClient along with its exit code.
+
+The wire format is a JSON encoded request line from the client, followed by frames
+from the server. Each frame is a "<kind> <length>\\n" header and length bytes of data.
+"""
+import os
+import sys
+import json
+import errno
+import signal
+import socket
+import traceback
+
+from describe.spec.utils import describe_path, ensure_directory
+
+
+def default_socket_path(directory=None):
+    return describe_path('server.sock', directory)
+
+
+def write_frame(stream, kind, data):
+    stream.write('%s %d\n' % (kind, len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def read_frame(stream):
+    "Returns a (kind, data) tuple, or (None, None) if the stream was closed."
+    header = stream.readline()
+    if not header:
+        return None, None
+    kind, length = header.split()
+    return kind, stream.read(int(length))
+
+
+class SpecServer(object):
+    """Runs spec commands received over a unix domain socket in forked children.
+
+    Parameters:
+        - path is the filepath of the unix domain socket to listen on.
+        - run_fn is called in the child with the list of command line arguments of
+          the request. It should return the exit code.
+    """
+    def __init__(self, path, run_fn):
+        self.path, self.run_fn = path, run_fn
+        self.socket = None
+
+    def __repr__(self):
+        return "SpecServer(%r, %r)" % (self.path, self.run_fn)
+
+    def listen(self):
+        ensure_directory(self.path)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.bind(self.path)
+        self.socket.listen(5)
+        return self
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def serve_forever(self):
+        if self.socket is None:
+            self.listen()
+        # make sure the socket file is removed when we are terminated.
+        previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            while True:
+                self.serve_one()
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            self.close()
+
+    def serve_one(self):
+        "Accepts and handles a single client connection."
+        try:
+            connection, _ = self.socket.accept()
+        except socket.error as e:
+            if e.errno == errno.EINTR:
+                return
+            raise
+        stream = connection.makefile('rwb')
+        try:
+            self.handle(stream)
+        except socket.error:
+            # the client went away, nothing left to report to.
+            pass
+        finally:
+            stream.close()
+            connection.close()
+
+    def handle(self, stream):
+        request = json.loads(stream.readline())
+        read_fd, write_fd = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_child(request, write_fd)
+
+        os.close(write_fd)
+        while True:
+            data = os.read(read_fd, 65536)
+            if not data:
+                break
+            write_frame(stream, 'out', data)
+        os.close(read_fd)
+        _, status = os.waitpid(pid, 0)
+        code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1
+        write_frame(stream, 'exit', str(code))
+        return code
+
+    def _run_child(self, request, write_fd):
+        code = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            self.socket.close()
+            os.dup2(write_fd, sys.__stdout__.fileno())
+            os.dup2(write_fd, sys.__stderr__.fileno())
+            os.close(write_fd)
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+            os.chdir(request['cwd'])
+            code = self.run_fn(request['args'])
+        except SystemExit as e:
+            code = e.code
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if not isinstance(code, int):
+                code = 1 if code else 0
+            os._exit(min(code, 255))
+
+
+class SpecClient(object):
+    "Sends command line arguments to a SpecServer and streams back its output."
+    def __init__(self, path, stdout=None):
+        self.path = path
+        self.stdout = stdout or sys.stdout
+
+    def __repr__(self):
+        return "SpecClient(%r)" % (self.path,)
+
+    def run(self, args, cwd=None):
+        """Runs the arguments on the server. Returns the exit code.
+
+        Raises socket.error if the server is not running.
+        """
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.path)
+        stream = connection.makefile('rwb')
+        try:
+            stream.write(json.dumps({'cwd': cwd or os.getcwd(), 'args': list(args)}) + '\n')
+            stream.flush()
+            while True:
+                kind, data = read_frame(stream)
+                if kind is None:
+                    return 1
+                if kind == 'exit':
+                    return int(data)
+                self.stdout.write(data)
+                self.stdout.flush()
+        finally:
+            stream.close()
+            connection.close()
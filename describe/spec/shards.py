@@ -0,0 +1,78 @@
+"""shards.py - Splits spec files between independent runs.
+
+Every run given the same shard count and spec files computes the same assignment,
+without having to talk to each other. If a TimingHistory with durations of the spec
+files is given, files are assigned to balance the expected duration of every shard.
+Otherwise they are assigned by a stable hash of their module path.
+
+Balanced assignments are only the same if every run is given the same history, so
+the history of a run itself (which only knows about the spec files of its own shard)
+must not be used.
+"""
+import hashlib
+
+
+def stable_hash(key):
+    "A hash of the given string that is the same on every machine and python version."
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16)
+
+
+class Shard(object):
+    """Selects the spec files that belong to shard number `index` (starting from 1) out of
+    `count` shards.
+    """
+    def __init__(self, index, count, history=None):
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError("Shard must be between 1/%d and %d/%d, got %d/%d" % (
+                max(count, 1), max(count, 1), max(count, 1), index, count))
+        self.index, self.count = index, count
+        self.history = history
+        self.assignments = None
+
+    @classmethod
+    def parse(cls, value, history=None):
+        "Creates a shard from a string like '2/8'."
+        try:
+            index, count = [int(part) for part in value.split('/')]
+        except ValueError:
+            raise ValueError("Shard must look like INDEX/COUNT, got %r" % (value,))
+        return cls(index, count, history)
+
+    def __repr__(self):
+        return "Shard(%d, %d)" % (self.index, self.count)
+
+    def _has_history(self, keys):
+        return self.history is not None and any(
+            self.history.duration('file', key) is not None for key in keys
+        )
+
+    def assign(self, keys):
+        """Assigns every key to a shard number. Returns a dictionary of key => shard number.
+
+        With a history, the longest files are assigned first, each to the shard with the
+        least expected duration so far.
+        """
+        keys = sorted(set(keys))
+        if not self._has_history(keys):
+            self.assignments = dict((key, stable_hash(key) % self.count + 1) for key in keys)
+            return self.assignments
+
+        estimates = dict(zip(keys, self.history.estimates(keys, 'file')))
+        loads = [0] * self.count
+        self.assignments = {}
+        for key in sorted(keys, key=lambda key: (-estimates[key], key)):
+            shard = loads.index(min(loads))
+            loads[shard] += estimates[key]
+            self.assignments[key] = shard + 1
+        return self.assignments
+
+    def includes(self, key):
+        if self.assignments is None or key not in self.assignments:
+            return stable_hash(key) % self.count + 1 == self.index
+        return self.assignments[key] == self.index
+
+    def select(self, spec_files):
+        "Filters the given (directory, filepath, modulepath) tuples down to this shard."
+        if self.assignments is None:
+            self.assign(modulepath for _, _, modulepath in spec_files)
+        return [spec_file for spec_file in spec_files if self.includes(spec_file[2])]
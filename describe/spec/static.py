@@ -0,0 +1,213 @@
+"""static.py - Finds specs by parsing spec files instead of importing them.
+
+Importing a spec file runs all of its module level code, and the code of every module
+it imports. StaticSpecFinder instead reads the class and function definitions of the
+spec file's syntax tree and applies the naming rules of StandardSpecFinder to them,
+which gives the same outline of groups and examples in a fraction of the time. Tags
+are read from literal `tags` attributes assigned in class bodies.
+
+Only spec files that define their specs with plain class and function statements can
+be outlined this way. Spec files that get specs from elsewhere (star imports, importing
+spec classes, inheriting from classes of other modules), define them conditionally or
+modify their namespace at runtime are left to be imported.
+"""
+import ast
+import __builtin__
+
+from describe.spec.finders import StandardSpecFinder
+from describe.spec.index import Outline
+from describe.spec.selection import as_tags
+
+
+# names that change a namespace in ways a syntax tree can't tell.
+DYNAMIC_NAMES = frozenset(['globals', 'locals', 'vars', 'setattr', 'delattr', 'execfile', '__import__'])
+
+
+class _Dynamic(Exception):
+    "Raised when a spec file can't be outlined without running it."
+
+
+class _Class(object):
+    "A class statement, with the names it defines or inherits. members is None if unknown."
+    def __init__(self, name, members):
+        self.name, self.members = name, members
+
+    @property
+    def tags(self):
+        tags = self.members.get('tags')
+        return tags.tags if isinstance(tags, _Tags) else frozenset()
+
+
+class _Function(object):
+    "A function statement, with the tags assigned to it."
+    def __init__(self, name):
+        self.name = name
+        self.tags = frozenset()
+
+
+class _Tags(object):
+    "A literal assigned to `tags`."
+    def __init__(self, node):
+        try:
+            self.tags = as_tags(ast.literal_eval(node))
+        except ValueError:
+            raise _Dynamic('tags')
+
+
+_VALUE = 'value'
+
+
+class StaticSpecFinder(object):
+    """Outlines the specs of spec files from their syntax trees, using the naming rules
+    of the given StandardSpecFinder, without running any of their code.
+    """
+    def __init__(self, spec_finder=None):
+        self.spec_finder = spec_finder or StandardSpecFinder()
+
+    def __repr__(self):
+        return "StaticSpecFinder(%r)" % (self.spec_finder,)
+
+    def outline_file(self, filepath):
+        """Returns the Outlines StandardSpecFinder.outline would return for the spec file,
+        or None if the spec file has to be imported to find out.
+        """
+        try:
+            with open(filepath) as handle:
+                source = handle.read()
+        except (IOError, OSError):
+            return None
+        return self.outline_source(source, filepath)
+
+    def outline_source(self, source, filename='<spec>'):
+        "Like outline_file, but for the source of a spec file."
+        try:
+            tree = ast.parse(source, filename)
+        except (SyntaxError, TypeError, ValueError):
+            return None
+        try:
+            namespace = {}
+            self._define(tree.body, namespace, namespace)
+            return self._outlines(namespace)
+        except _Dynamic:
+            return None
+
+    #################### Internal Methods ####################
+    def _matters(self, name):
+        "Returns True if the value of the given name decides what specs there are."
+        finder = self.spec_finder
+        return (finder.is_context_name(name) or finder.is_example_name(name) or
+                name in finder.hooks or name == 'tags')
+
+    def _bind(self, namespace, name, value):
+        if value is _VALUE and self._matters(name):
+            raise _Dynamic(name)
+        namespace[name] = value
+
+    def _define(self, statements, namespace, module_namespace):
+        "Adds the names the statements of a module or class body define to the namespace."
+        for statement in statements:
+            if isinstance(statement, ast.ClassDef):
+                self._bind(namespace, statement.name, self._class(statement, namespace, module_namespace))
+            elif isinstance(statement, ast.FunctionDef):
+                self._bind(namespace, statement.name, self._function(statement))
+            elif self._is_tags_assignment(statement):
+                self._check(statement)
+                target, tags = statement.targets[0], _Tags(statement.value)
+                if isinstance(target, ast.Name):
+                    namespace['tags'] = tags
+                elif isinstance(namespace.get(target.value.id), _Function):
+                    namespace[target.value.id].tags = tags.tags
+            else:
+                self._check(statement)
+                for name in self._assigned_names(statement):
+                    self._bind(namespace, name, _VALUE)
+
+    def _is_tags_assignment(self, statement):
+        "Returns True for `tags = ...` and `name.tags = ...` statements."
+        if not isinstance(statement, ast.Assign) or len(statement.targets) != 1:
+            return False
+        target = statement.targets[0]
+        if isinstance(target, ast.Name):
+            return target.id == 'tags'
+        return (isinstance(target, ast.Attribute) and target.attr == 'tags' and
+                isinstance(target.value, ast.Name))
+
+    def _check(self, statement):
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Exec):
+                raise _Dynamic('exec')
+            if isinstance(node, ast.Name) and node.id in DYNAMIC_NAMES:
+                raise _Dynamic(node.id)
+
+    def _assigned_names(self, statement):
+        "Yields the names a statement that isn't a class or function definition assigns to."
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                yield node.id
+            elif isinstance(node, (ast.ClassDef, ast.FunctionDef)):
+                # defined conditionally (or in a loop), so only known at runtime.
+                yield node.name
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name == '*':
+                        raise _Dynamic('*')
+                    yield alias.asname or alias.name.partition('.')[0]
+
+    def _function(self, node):
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Name) and decorator.id == 'property':
+                return _VALUE
+        return _Function(node.name)
+
+    def _class(self, node, namespace, module_namespace):
+        if node.decorator_list:
+            return _VALUE
+        members = {}
+        for base in reversed(node.bases):
+            inherited = self._base_members(base, namespace, module_namespace)
+            if inherited is None:
+                return _Class(node.name, None)
+            members.update(inherited)
+        own = {}
+        self._define(node.body, own, module_namespace)
+        if '__metaclass__' in own:
+            return _Class(node.name, None)
+        members.update(own)
+        return _Class(node.name, members)
+
+    def _base_members(self, base, namespace, module_namespace):
+        "Returns the members of the class a base class expression refers to, or None if unknown."
+        if not isinstance(base, ast.Name):
+            return None
+        for scope in (namespace, module_namespace):
+            if base.id in scope:
+                value = scope[base.id]
+                return value.members if isinstance(value, _Class) else None
+        if isinstance(getattr(__builtin__, base.id, None), type):
+            return {}
+        return None
+
+    def _is_valid(self, name, value):
+        finder = self.spec_finder
+        if finder.is_context_name(name) and isinstance(value, _Class):
+            return True
+        return finder.is_example_name(name) and isinstance(value, (_Function, _Class))
+
+    def _outline(self, name, value):
+        finder = self.spec_finder
+        if isinstance(value, _Class) and finder.is_context_name(name):
+            if value.members is None:
+                raise _Dynamic(name)
+            hooks = any(
+                isinstance(value.members.get(hook), (_Function, _Class))
+                for hook in finder.hooks
+            )
+            return Outline(value.name, True, hooks, self._outlines(value.members), value.tags)
+        if isinstance(value, _Class) and value.members is None:
+            raise _Dynamic(name)
+        return Outline(value.name, tags=value.tags)
+
+    def _outlines(self, namespace):
+        # dir() sorts names, which decides the order specs are found in.
+        return [self._outline(name, namespace[name]) for name in sorted(namespace)
+                if self._is_valid(name, namespace[name])]
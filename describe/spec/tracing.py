@@ -0,0 +1,141 @@
+"""tracing.py - Records a timeline of a run, for trace viewers.
+
+Tracer keeps spans (a name, a category and a start and end time) of what a run did:
+walking directories for spec files, importing them, extracting example groups from
+the modules, running example groups and their before and after functions, running
+examples and writing to formatters.
+
+The spans are written in the trace event format that chrome://tracing, Perfetto and
+speedscope read, with a track for the main process and one for every worker process.
+Spans on the same track nest by time, so hooks show up inside their example groups.
+"""
+import os
+import sys
+import json
+from contextlib import contextmanager
+
+from describe.spec.utils import clock, ensure_directory, PHASES
+
+
+_PHASE_INDEXES = dict((phase, i) for i, phase in enumerate(PHASES))
+
+
+class Tracer(object):
+    """Records spans of a run on the track of the current process, and writes them all to
+    path as a trace event file when saved.
+
+    Worker processes switch to their own track and send the spans they drained back to
+    be merged. The monotonic clock is shared by forked processes, so their spans line up.
+    """
+    def __init__(self, path=None, stdout=sys.stdout):
+        self.path = path
+        self.stdout = stdout
+        self.pid = os.getpid()
+        self.tid = 0
+        self.tracks = {0: 'main'}
+        self.spans = []
+        self.origin = clock()
+
+    def __repr__(self):
+        return "Tracer(%r)" % (self.path,)
+
+    def track(self, tid, name):
+        "Records the spans from now on onto a new track, like that of a worker process."
+        self.tid = tid
+        self.tracks[tid] = name
+
+    def add(self, name, category, start, end, args=None):
+        "Adds a span of the given clock times."
+        self.spans.append((name, category, start, end, self.tid, args))
+
+    @contextmanager
+    def span(self, name, category, **args):
+        "Adds a span for the time the with block takes."
+        start = clock()
+        try:
+            yield
+        finally:
+            self.spans.append((name, category, start, clock(), self.tid, args or None))
+
+    def add_benchmark(self, name, category, benchmark, phase_names, args=None):
+        """Adds a span for a stopped Benchmark that kept its laps, with a span inside it
+        for every lap, named after its phase by phase_names (like EXAMPLE_PHASE_NAMES).
+        """
+        if benchmark.span is None:
+            return
+        start, end = benchmark.span
+        self.add(name, category, start, end, args)
+        for phase, lap_start, lap_end in benchmark.laps or ():
+            self.add(phase_names[_PHASE_INDEXES[phase]], category, lap_start, lap_end)
+
+    def drain(self):
+        "Returns the tracks and spans recorded since the last drain."
+        spans, self.spans = self.spans, []
+        return dict(self.tracks), spans
+
+    def merge(self, drained):
+        "Adds the tracks and spans drained from a tracer (like that of a worker process)."
+        tracks, spans = drained
+        self.tracks.update(tracks)
+        self.spans.extend(spans)
+
+    def events(self):
+        "Returns the spans as a list of trace events."
+        pid, origin = self.pid, self.origin
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'describe'}}]
+        for tid, name in sorted(self.tracks.items()):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+            events.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'sort_index': tid}})
+        for name, category, start, end, tid, args in self.spans:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round((start - origin) * 1e6, 3), 'dur': round(max(end - start, 0) * 1e6, 3)}
+            if args:
+                event['args'] = args
+            events.append(event)
+        return events
+
+    def save(self, path=None):
+        "Writes the trace event file."
+        path = path or self.path
+        ensure_directory(path)
+        events = self.events()
+        with open(path, 'w') as handle:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, handle)
+        self.stdout.write("\nWrote %d spans to %s\n" % (len(self.spans), path))
+
+
+class TracingFormatter(object):
+    "Wraps a formatter, adding a span to the tracer for every call to it."
+    def __init__(self, formatter, tracer):
+        self.formatter, self.tracer = formatter, tracer
+
+    def __repr__(self):
+        return "TracingFormatter(%r, %r)" % (self.formatter, self.tracer)
+
+    def start_example_group(self, example):
+        with self.tracer.span('start_example_group', 'formatter'):
+            self.formatter.start_example_group(example)
+
+    def end_example_group(self, example):
+        with self.tracer.span('end_example_group', 'formatter'):
+            self.formatter.end_example_group(example)
+
+    def skip_example_group(self, example):
+        with self.tracer.span('skip_example_group', 'formatter'):
+            self.formatter.skip_example_group(example)
+
+    def record_example(self, example):
+        with self.tracer.span('record_example', 'formatter'):
+            return self.formatter.record_example(example)
+
+    def skip_example(self, example):
+        with self.tracer.span('skip_example', 'formatter'):
+            self.formatter.skip_example(example)
+
+    def finalize(self):
+        "Finalizes the formatter, then writes the trace event file of the tracer."
+        with self.tracer.span('finalize', 'formatter'):
+            self.formatter.finalize()
+        if self.tracer.path:
+            self.tracer.save()
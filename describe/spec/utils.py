@@ -1,7 +1,13 @@
+import os
+import sys
 import types
+import signal
 import traceback
 import inspect
+import threading
 import time
+import linecache
+from repr import Repr
 
 
 CURRENT_PACKAGE = __package__.split('.', 1)[0]
@@ -9,6 +15,8 @@ CURRENT_PACKAGE = __package__.split('.', 1)[0]
 def str_traceback(error, tb):
     """Returns a string representation of the traceback.
     """
+    if isinstance(tb, FailureRecord):
+        return tb.format(filtered=False)
     if not isinstance(tb, types.TracebackType):
         return tb
 
@@ -18,22 +26,137 @@ def filter_traceback(error, tb, ignore_pkg=CURRENT_PACKAGE):
     """Filtered out all parent stacktraces starting with the given stacktrace that has
     a given variable name in its globals.
     """
+    if isinstance(tb, FailureRecord):
+        return tb.format()
     if not isinstance(tb, types.TracebackType):
         return tb
 
     def in_namespace(n):
-        return n and (n.startswith(ignore_pkg + '.') or n == ignore_pkg)
+        return _in_namespace(n, ignore_pkg)
     # Skip test runner traceback levels
-    while tb and in_namespace(tb.tb_frame.f_globals['__package__']):
+    while tb and in_namespace(tb.tb_frame.f_globals.get('__package__')):
         tb = tb.tb_next
     starting_tb = tb
     limit = 0
-    while tb and not in_namespace(tb.tb_frame.f_globals['__package__']):
+    while tb and not in_namespace(tb.tb_frame.f_globals.get('__package__')):
         tb = tb.tb_next
         limit += 1
 
     return ''.join(traceback.format_exception(error.__class__, error, starting_tb, limit))
 
+def _in_namespace(name, package):
+    return name and (name.startswith(package + '.') or name == package)
+
+
+class FrameRecord(object):
+    "A picklable copy of where a traceback frame was, with the reprs of its locals if captured."
+    __slots__ = ('filename', 'lineno', 'function', 'line', 'locals')
+
+    def __init__(self, filename, lineno, function, line=None, locals=()):
+        self.filename, self.lineno, self.function = filename, lineno, function
+        self.line = line
+        self.locals = locals
+
+    def __repr__(self):
+        return "FrameRecord(%r, %r, %r)" % (self.filename, self.lineno, self.function)
+
+    def __reduce__(self):
+        return (self.__class__, (self.filename, self.lineno, self.function, self.line, self.locals))
+
+    def __eq__(self, other):
+        return isinstance(other, FrameRecord) and self.__reduce__() == other.__reduce__()
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class FailureRecord(object):
+    """A picklable copy of an exception and its traceback.
+
+    Traceback objects keep every frame and all of its locals alive, and can't be sent to
+    other processes. A FailureRecord copies what is needed to print the traceback as soon
+    as the exception is caught, so the traceback can be let go of.
+
+    Parameters:
+        - frames is a list of FrameRecords, outermost first.
+        - exception_lines are the lines describing the exception itself.
+        - start and stop are the range of frames outside of describe, which are
+          the only frames shown when filtered.
+    """
+    locals_repr = Repr()
+    locals_repr.maxstring = locals_repr.maxother = 80
+
+    def __init__(self, frames, exception_lines, start=0, stop=None):
+        self.frames = frames
+        self.exception_lines = exception_lines
+        self.start, self.stop = start, stop
+
+    @classmethod
+    def capture(cls, error, tb, ignore_pkg=CURRENT_PACKAGE, with_locals=False):
+        """Copies the given exception and traceback. With with_locals, the (size limited)
+        reprs of the local variables of every frame outside of describe are copied too.
+        """
+        frames, start, stop = [], None, None
+        while tb is not None:
+            frame = tb.tb_frame
+            if _in_namespace(frame.f_globals.get('__package__'), ignore_pkg):
+                if start is not None and stop is None:
+                    stop = len(frames)
+                local_reprs = ()
+            else:
+                if start is None:
+                    start = len(frames)
+                local_reprs = cls._locals(frame) if with_locals and stop is None else ()
+            code = frame.f_code
+            linecache.checkcache(code.co_filename)
+            line = linecache.getline(code.co_filename, tb.tb_lineno, frame.f_globals).strip()
+            frames.append(FrameRecord(code.co_filename, tb.tb_lineno, code.co_name, line or None, local_reprs))
+            tb = tb.tb_next
+        if start is None:
+            start = stop = len(frames)
+        return cls(frames, traceback.format_exception_only(error.__class__, error), start, stop)
+
+    @classmethod
+    def _locals(cls, frame):
+        reprs = []
+        for name, value in sorted(frame.f_locals.items()):
+            try:
+                reprs.append((name, cls.locals_repr.repr(value)))
+            except Exception as e:
+                reprs.append((name, '<repr failed: %s>' % e.__class__.__name__))
+        return tuple(reprs)
+
+    def __repr__(self):
+        return "FailureRecord(<%d frames>, %r)" % (len(self.frames), ''.join(self.exception_lines).strip())
+
+    def __str__(self):
+        return self.format()
+
+    def __eq__(self, other):
+        return isinstance(other, FailureRecord) and (
+            self.frames == other.frames and self.exception_lines == other.exception_lines and
+            (self.start, self.stop) == (other.start, other.stop))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def format(self, filtered=True):
+        """Returns the traceback as text, like the traceback module does. Filtered
+        tracebacks leave out the frames of describe itself.
+        """
+        frames = self.frames[self.start:self.stop] if filtered else self.frames
+        lines = []
+        if frames:
+            lines.append('Traceback (most recent call last):\n')
+        for frame in frames:
+            lines.append('  File "%s", line %d, in %s\n' % (frame.filename, frame.lineno, frame.function))
+            if frame.line:
+                lines.append('    %s\n' % frame.line)
+            for name, value in frame.locals:
+                lines.append('        %s = %s\n' % (name, value))
+        lines.extend(self.exception_lines)
+        return ''.join(lines)
+
 
 # def returns_locals(func):
 #     """Modify the function to do:
@@ -217,6 +340,11 @@ def getargspec(obj):
 
 
 def accepts_arg(obj):
+    # fast paths for plain functions and methods, which are what getargspec would inspect.
+    if type(obj) is types.FunctionType:
+        return obj.func_code.co_argcount > 0
+    if type(obj) is types.MethodType and type(obj.im_func) is types.FunctionType:
+        return obj.im_func.func_code.co_argcount > 1
     try:
         return len(getargspec(obj)[0]) > 0
     except TypeError:
@@ -261,23 +389,117 @@ def tabulate(string, times=1, indent=4, char=' ', ignore_first=False):
     return '\n'.join(sb)
 
 
+def native_string(value):
+    "Encodes unicode (like the strings json gives back) into the byte strings used everywhere else."
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def describe_path(filename, directory=None):
+    "Returns the path of filename in the .describe directory of directory (or of the current one)."
+    return os.path.join(directory or os.getcwd(), '.describe', filename)
+
+def ensure_directory(path):
+    "Creates the directory the file at path goes in, if it doesn't exist yet."
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+def _monotonic_clock():
+    """Returns a function that reads a monotonic clock in seconds. Falls back to
+    time.time, which jumps when the system clock is set, if there is none.
+    """
+    clock = getattr(time, 'monotonic', None)
+    if clock is not None:
+        return clock
+    try:
+        from monotonic import monotonic
+        return monotonic
+    except ImportError:
+        pass
+    if sys.platform.startswith('linux'):
+        try:
+            import ctypes
+            import ctypes.util
+
+            class timespec(ctypes.Structure):
+                _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+            CLOCK_MONOTONIC = 1
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            clock_gettime = libc.clock_gettime
+            value = timespec()
+            pointer = ctypes.pointer(value)
+
+            def monotonic():
+                if clock_gettime(CLOCK_MONOTONIC, pointer) != 0:
+                    return time.time()
+                return value.tv_sec + value.tv_nsec * 1e-9
+            monotonic()
+            return monotonic
+        except (ImportError, OSError, AttributeError):
+            pass
+    return time.time
+
+clock = _monotonic_clock()
+
+
+# the parts Benchmark.lap() splits the running of an example or example group into:
+# the global run.before_* functions, the before functions (before_each for examples,
+# before_all for groups), the example itself (or the examples of a group), the after
+# functions and the global run.after_* functions.
+PHASES = ('global_setup', 'setup', 'body', 'teardown', 'global_teardown')
+# how reports name the PHASES of examples and of example groups.
+EXAMPLE_PHASE_NAMES = ('run.before', 'before_each', 'body', 'after_each', 'run.after')
+GROUP_PHASE_NAMES = ('run.before', 'before_all', 'examples', 'after_all', 'run.after')
+
+
 class Benchmark(object):
-    def __init__(self):
+    """Measures how long something takes, using a monotonic clock.
+
+    While running, lap() adds the time since the start (or the previous lap) to the
+    given phase, so the total time can be split up into phases. With keep_laps, the
+    (phase, start, end) clock times of every lap are also kept in laps.
+    """
+    def __init__(self, keep_laps=False):
         self.history = []
+        self.phases = {}
+        self.laps = [] if keep_laps else None
+        # the (start, end) clock times of the last start() and stop().
+        self.span = None
         self._last_time = None
+        self._lap_time = None
 
     def start(self):
-        self._last_time = time.time()
+        self._last_time = self._lap_time = clock()
         return self
 
     def stop(self):
-        diff = time.time() - self._last_time
         if self._last_time is None:
             return self.total_time
-        self.history.append(diff)
-        self._last_time = None
+        now = clock()
+        self.history.append(now - self._last_time)
+        self.span = (self._last_time, now)
+        self._last_time = self._lap_time = None
         return self.total_time
 
+    def lap(self, phase):
+        "Adds the time since the last lap to the given phase. Returns that time."
+        last = self._lap_time
+        if last is None:
+            return 0
+        self._lap_time = now = clock()
+        phases = self.phases
+        phases[phase] = phases.get(phase, 0) + (now - last)
+        if self.laps is not None:
+            self.laps.append((phase, last, now))
+        return now - last
+
+    def phase_times(self, phases=PHASES):
+        "Returns a tuple of the time spent in each of the given phases."
+        get = self.phases.get
+        return tuple([get(phase, 0.0) for phase in phases])
+
     def __enter__(self):
         return self.start()
 
@@ -289,6 +511,133 @@ class Benchmark(object):
         return sum(self.history)
 
 
+def format_stacks(current_frame=None):
+    """Returns the current stack of every running thread as a string. The stack of the
+    calling thread starts at current_frame if given (like the frame a signal interrupted).
+    """
+    names = dict((thread.ident, thread.name) for thread in threading.enumerate())
+    frames = sys._current_frames()
+    if current_frame is not None:
+        frames[threading.current_thread().ident] = current_frame
+    lines = []
+    for ident, frame in sorted(frames.items()):
+        lines.append('Thread %s (%s):\n' % (names.get(ident, '<unknown>'), ident))
+        lines.extend(traceback.format_stack(frame))
+    return ''.join(lines)
+
+
+class TimeoutError(Exception):
+    "Raised when an example or example group runs longer than its timeout."
+    def __init__(self, message, stacks=''):
+        super(TimeoutError, self).__init__(message)
+        self.stacks = stacks
+        self.timeout = None
+
+    def __str__(self):
+        message = super(TimeoutError, self).__str__()
+        if self.stacks:
+            return '%s\n\n%s' % (message, self.stacks.rstrip())
+        return message
+
+
+class UserCode(object):
+    """Marks the blocks of user code (like examples and their before and after functions)
+    that Timeouts given this UserCode may interrupt.
+
+    A TimeoutError that expires outside of these blocks (like while the runner records a
+    result) is kept pending, and raised when the next block starts instead. If the block
+    of its Timeout finishes first, it is dropped. Other errors given to interrupt() (like
+    those of resource limits) stay pending until the next block.
+    """
+    def __init__(self):
+        self.depth = 0
+        self.pending = None
+
+    def __repr__(self):
+        return "UserCode(depth=%r, pending=%r)" % (self.depth, self.pending)
+
+    def __enter__(self):
+        error = self.pending
+        if error is not None:
+            self.pending = None
+            raise error
+        self.depth += 1
+        return self
+
+    def __exit__(self, type, info, exception):
+        self.depth -= 1
+
+    def interrupt(self, error):
+        "Raises the error if user code is running, otherwise keeps it pending."
+        if not self.depth:
+            self.pending = error
+            return
+        raise error
+
+    def discard(self, timeout):
+        "Drops the pending TimeoutError of the given Timeout, if any."
+        if getattr(self.pending, 'timeout', None) is timeout:
+            self.pending = None
+
+
+class Timeout(object):
+    """Raises TimeoutError in the main thread once the block has run for the given number
+    of seconds, interrupting blocking calls (like socket reads) with SIGALRM.
+
+    Timeouts can be nested, the outer ones keep running while an inner one is active.
+    Does nothing if seconds is None, or when not used from the main thread. If a UserCode
+    is given, only its blocks are interrupted.
+    """
+    def __init__(self, seconds, description='block', user_code=None):
+        self.seconds, self.description = seconds, description
+        self.user_code = user_code
+        self.active = False
+
+    def __repr__(self):
+        return "Timeout(%r, %r)" % (self.seconds, self.description)
+
+    def _is_supported(self):
+        return bool(self.seconds) and hasattr(signal, 'setitimer') and \
+            isinstance(threading.current_thread(), threading._MainThread)
+
+    def __enter__(self):
+        if not self._is_supported():
+            return self
+        self.active = True
+        self.started = time.time()
+        self.previous_delay, _ = signal.getitimer(signal.ITIMER_REAL)
+        self.previous_handler = signal.signal(signal.SIGALRM, self._expired)
+        delay = self.seconds
+        if self.previous_delay:
+            delay = min(delay, self.previous_delay)
+        signal.setitimer(signal.ITIMER_REAL, delay)
+        return self
+
+    def __exit__(self, type, info, exception):
+        if not self.active:
+            return
+        self.active = False
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.previous_handler)
+        if self.user_code is not None:
+            self.user_code.discard(self)
+        if self.previous_delay:
+            remaining = self.previous_delay - (time.time() - self.started)
+            # let the outer timeout expire right away if it already should have.
+            signal.setitimer(signal.ITIMER_REAL, max(remaining, 0.001))
+
+    def _expired(self, signum, frame):
+        if self.previous_delay and self.previous_delay < self.seconds and callable(self.previous_handler):
+            # an outer timeout expired first, it doesn't need to be restarted on exit.
+            self.previous_delay = 0
+            return self.previous_handler(signum, frame)
+        error = TimeoutError('%s timed out after %ss' % (self.description, self.seconds), format_stacks(frame))
+        error.timeout = self
+        if self.user_code is not None:
+            return self.user_code.interrupt(error)
+        raise error
+
+
 def NOOP():
     pass
 
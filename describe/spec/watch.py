@@ -0,0 +1,269 @@
+"""watch.py - Re-runs specs whenever the files they depend on change.
+
+The watcher polls file modification times instead of relying on any file system
+notification API. It keeps a graph of which watched modules import each other, so
+that a change only reloads the changed modules and the modules that (indirectly)
+import them, before re-running the affected spec files.
+"""
+import os
+import sys
+import ast
+import time
+import traceback
+
+from describe import run
+from describe.spec.finders import SpecFileFinder
+from describe.spec.ignore import unique_directories
+
+
+def source_path(module):
+    "Returns the .py file the given module was loaded from, or None."
+    filepath = getattr(module, '__file__', None)
+    if not filepath:
+        return None
+    base, ext = os.path.splitext(os.path.abspath(filepath))
+    if ext not in ('.py', '.pyc', '.pyo'):
+        return None
+    return base + '.py'
+
+
+def is_package(module):
+    return os.path.splitext(os.path.basename(getattr(module, '__file__', '') or ''))[0] == '__init__'
+
+
+class ImportGraph(object):
+    """Tracks which modules import each other.
+
+    Dependencies are found by parsing the module's source for import statements
+    (anywhere in the file), so modules don't have to be re-imported to update it.
+    """
+    def __init__(self):
+        self.imports = {}
+        self.filepaths = {}
+
+    def __repr__(self):
+        return "ImportGraph(<%d modules>)" % len(self.imports)
+
+    def __contains__(self, module_name):
+        return module_name in self.imports
+
+    def modules_for(self, filepath):
+        return [name for name, path in self.filepaths.items() if path == filepath]
+
+    def add(self, module):
+        "Adds or updates the given module in the graph."
+        filepath = source_path(module)
+        self.filepaths[module.__name__] = filepath
+        self.imports[module.__name__] = self.imports_of(module, filepath)
+
+    def remove(self, module_name):
+        self.imports.pop(module_name, None)
+        self.filepaths.pop(module_name, None)
+
+    def imports_of(self, module, filepath):
+        "Returns the set of module names the given module could import."
+        try:
+            with open(filepath) as handle:
+                tree = ast.parse(handle.read(), filepath)
+        except (IOError, TypeError, SyntaxError):
+            return set()
+        package = module.__name__ if is_package(module) else module.__name__.rpartition('.')[0]
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ''
+                if node.level:
+                    parts = package.split('.') if package else []
+                    parts = parts[:len(parts) - (node.level - 1)]
+                    base = '.'.join(filter(None, parts + [base]))
+                if base:
+                    names.add(base)
+                names.update('.'.join(filter(None, (base, alias.name))) for alias in node.names)
+        return names
+
+    def dependencies(self, module_name):
+        "Returns the modules in the graph that the given module imports."
+        return set(name for name in self.imports.get(module_name, ()) if name in self.imports)
+
+    def dependents(self, module_names):
+        "Returns the given modules and every module in the graph that imports them, indirectly or not."
+        affected = set(module_names)
+        changed = True
+        while changed:
+            changed = False
+            for name in self.imports:
+                if name not in affected and self.dependencies(name) & affected:
+                    affected.add(name)
+                    changed = True
+        return affected
+
+    def reload_order(self, module_names):
+        "Sorts the given modules so that every module comes after the modules it imports."
+        module_names, order, visited = set(module_names), [], set()
+
+        def visit(name):
+            if name in visited:
+                return
+            visited.add(name)
+            for dependency in sorted(self.dependencies(name) & module_names):
+                visit(dependency)
+            order.append(name)
+
+        for name in sorted(module_names):
+            visit(name)
+        return order
+
+
+class SpecWatcher(object):
+    """Runs specs, then keeps re-running the spec files affected by changes to the
+    watched directories.
+
+    Parameters:
+        - coordinator is the SpecCoordinator used to run the specs.
+        - formatter_factory creates a new formatter for every run.
+        - interval is the number of seconds to wait between polls.
+        - watch_paths are additional source directories to watch, besides the spec
+          directories.
+    """
+    def __init__(self, coordinator, formatter_factory, interval=1.0, watch_paths=(),
+            file_finder=None, sleep=time.sleep):
+        self.coordinator = coordinator
+        self.formatter_factory = formatter_factory
+        self.interval = interval
+        self.watch_paths = [os.path.abspath(path) for path in watch_paths]
+        self.file_finder = file_finder or SpecFileFinder()
+        self.sleep = sleep
+        self.graph = ImportGraph()
+        self.spec_files = {}
+        self.mtimes = {}
+        self.directories = []
+
+    def __repr__(self):
+        return "SpecWatcher(%r, interval=%r)" % (self.coordinator, self.interval)
+
+    def watched_directories(self):
+        return self.directories + [path for path in self.watch_paths if path not in self.directories]
+
+    def scan(self):
+        "Returns a dictionary of the modification times of all python files being watched."
+        mtimes = {}
+        for directory in self.watched_directories():
+            for filepath in self.file_finder.iter_files(directory):
+                if filepath.endswith('.py'):
+                    try:
+                        mtimes[filepath] = os.stat(filepath).st_mtime
+                    except OSError:
+                        pass
+        return mtimes
+
+    def is_watched(self, filepath):
+        return filepath is not None and any(
+            filepath.startswith(os.path.join(directory, ''))
+            for directory in self.watched_directories()
+        )
+
+    def update_graph(self):
+        "Adds any newly imported modules from the watched directories to the import graph."
+        for name, module in sys.modules.items():
+            if module is not None and name not in self.graph and self.is_watched(source_path(module)):
+                self.graph.add(module)
+
+    def start(self, directories):
+        "Finds and runs all the specs in the given directories."
+        self.directories = [os.path.abspath(directory) for directory in unique_directories(directories)]
+        for directory in self.directories:
+            for spec_file in self.file_finder.find(directory):
+                self.spec_files[spec_file.filepath] = (directory, spec_file)
+        self.mtimes = self.scan()
+        self.update_graph()
+        return self.execute([spec_file for _, spec_file in self.spec_files.values()])
+
+    def poll(self):
+        """Reloads the modules affected by changes since the last poll and re-runs their
+        spec files. Returns the spec files that were run.
+        """
+        mtimes = self.scan()
+        changed = set(path for path, mtime in mtimes.items() if self.mtimes.get(path) != mtime)
+        removed = set(self.mtimes) - set(mtimes)
+        self.mtimes = mtimes
+        if not changed and not removed:
+            return []
+
+        for filepath in removed:
+            self.spec_files.pop(filepath, None)
+            for name in self.graph.modules_for(filepath):
+                self.graph.remove(name)
+
+        changed_modules = set()
+        for filepath in changed:
+            changed_modules.update(self.graph.modules_for(filepath))
+        affected = self.graph.dependents(changed_modules)
+        self.reload(affected)
+
+        spec_files = [spec_file for _, spec_file in self.spec_files.values()
+                      if spec_file.module.__name__ in affected]
+        spec_files.extend(self.load_new_spec_files())
+        self.update_graph()
+        if spec_files:
+            self.execute(spec_files)
+        return spec_files
+
+    def reload(self, module_names):
+        "Reloads the given modules, dependencies first."
+        old_paths = list(sys.path)
+        sys.path[:0] = self.directories
+        try:
+            for name in self.graph.reload_order(module_names):
+                module = sys.modules.get(name)
+                if module is None:
+                    continue
+                self._remove_stale_bytecode(module)
+                run.forget_module(name)
+                reload(module)
+                self.graph.add(module)
+        finally:
+            sys.path = old_paths
+
+    def _remove_stale_bytecode(self, module):
+        # bytecode only records the source mtime to the second, so quick edits can be missed.
+        filepath = source_path(module)
+        for compiled in (filepath + 'c', filepath + 'o'):
+            if os.path.exists(compiled):
+                os.unlink(compiled)
+
+    def load_new_spec_files(self):
+        spec_files = []
+        for directory in self.directories:
+            for filepath, modulepath in self.file_finder.walk(directory):
+                if filepath not in self.spec_files:
+                    spec_file = self.file_finder.load(directory, filepath, modulepath)
+                    self.spec_files[filepath] = (directory, spec_file)
+                    spec_files.append(spec_file)
+        return spec_files
+
+    def execute(self, spec_files):
+        "Runs the given spec files with a new formatter."
+        formatter = self.coordinator.formatter = self.formatter_factory()
+        spec_finder = self.coordinator.spec_finder
+        groups = []
+        for spec_file in sorted(spec_files, key=lambda spec_file: spec_file.filepath):
+            groups.extend(spec_finder.find(spec_file.module))
+        result = self.coordinator.execute(groups)
+        formatter.finalize()
+        return result
+
+    def run(self, directories):
+        "Runs the specs and re-runs them as files change, until interrupted."
+        self.start(directories)
+        try:
+            while True:
+                self.sleep(self.interval)
+                try:
+                    self.poll()
+                except Exception:
+                    # keep watching, the next change will probably fix it.
+                    traceback.print_exc()
+        except KeyboardInterrupt:
+            return 0
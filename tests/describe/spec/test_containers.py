@@ -52,6 +52,91 @@ class DescribeContext(TestCase):
         c = Context(parent=Context(properties={'foo': 'bar'}))
         self.assertEqual(c.foo, 'bar')
 
+    def test_it_shadows_the_properties_and_keys_of_parents(self):
+        parent = Context({'foo': 1}, {'bar': 1})
+        c = Context({'foo': 2}, {'bar': 2}, parent=parent)
+        self.assertEqual((c['foo'], c.bar), (2, 2))
+        self.assertEqual(c._combined_properties(), {'bar': 2})
+        self.assertEqual(sorted(c), ['foo'])
+
+    def test_it_sees_writes_to_parents(self):
+        parent = Context()
+        c = Context(parent=parent)
+        self.assertRaises(AttributeError, getattr, c, 'bar')
+        parent.bar = 'baz'
+        parent['bar'] = 'qux'
+        self.assertEqual((c.bar, c['bar']), ('baz', 'qux'))
+        del parent.bar
+        self.assertFalse(hasattr(c, 'bar'))
+
+    def test_it_injects_properties_into_instances(self):
+        class Cake(object):
+            def it_is_a_lie(self):
+                pass
+        cake = Cake()
+        c = Context(properties={'flavor': 'lemon'}, parent=Context(properties={'size': 2}))
+        c.inject_into_self(cake.it_is_a_lie)
+        self.assertEqual((cake.flavor, cake.size), ('lemon', 2))
+
+        cake.flavor = 'chocolate'
+        c.inject_into_self(cake.it_is_a_lie)
+        self.assertEqual(cake.flavor, 'lemon')
+
+
+class DescribeExampleKey(TestCase):
+    class DescribeCake:
+        def it_is_a_lie(self):
+            pass
+
+    def test_it_is_made_of_module_parents_and_name(self):
+        parent = self.DescribeCake()
+        example = Example(parent.it_is_a_lie, parents=[parent])
+        self.assertEqual(example.key, '%s:DescribeCake.it_is_a_lie' % __name__)
+
+    def test_it_uses_the_given_module_for_groups(self):
+        group = ExampleGroup('DescribeCake', module='cake_spec')
+        self.assertEqual(group.key, 'cake_spec:DescribeCake')
+
+    def test_it_has_a_hashable_identity(self):
+        parent = self.DescribeCake()
+        example = Example(parent.it_is_a_lie, parents=[parent])
+        self.assertEqual(example.identity, (__name__, ('DescribeCake',), 'it_is_a_lie'))
+
+
+class DescribeExampleGroupIndex(TestCase):
+    def it_is_a_lie(self):
+        pass
+
+    def it_is_tasty(self):
+        pass
+
+    def setUp(self):
+        self.lie, self.tasty = Example(self.it_is_a_lie), Example(self.it_is_tasty)
+        self.subject = ExampleGroup('DescribeCake', examples=[self.lie])
+
+    def test_it_contains_examples_with_the_same_identity(self):
+        self.assertIn(Example(self.it_is_a_lie), self.subject)
+        self.assertNotIn(self.tasty, self.subject)
+
+    def test_it_ignores_appending_examples_it_contains(self):
+        self.subject.append(Example(self.it_is_a_lie)).append(self.tasty)
+        self.assertEqual(list(self.subject), [self.lie, self.tasty])
+
+    def test_it_looks_up_examples_by_name(self):
+        self.subject.append(self.tasty)
+        self.assertIs(self.subject.get('it_is_tasty'), self.tasty)
+        self.assertIsNone(self.subject.get('it_is_sweet'))
+
+    def test_it_reindexes_when_examples_are_replaced(self):
+        self.subject.examples = [self.tasty]
+        self.assertIn(self.tasty, self.subject)
+        self.assertNotIn(self.lie, self.subject)
+
+    def test_it_reindexes_after_removing_examples(self):
+        self.subject.remove(self.lie)
+        self.assertNotIn(self.lie, self.subject)
+        self.assertIsNone(self.subject.get('it_is_a_lie'))
+
 
 class DescribeExampleGroupTestSuite(TestCase):
     def test_it_can_run_before_all_and_after_all(self):
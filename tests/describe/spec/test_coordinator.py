@@ -1,9 +1,17 @@
+import os
+import sys
+import shutil
+import tempfile
 from unittest import TestCase
 from mock import Mock, patch
 
 from describe.spec.coordinator import SpecCoordinator
 from describe.spec.containers import ExampleGroup, Example
 from describe.spec.finders import SpecFile
+from describe.spec.index import DiscoveryIndex
+from describe.spec.static import StaticSpecFinder
+from describe.spec.selection import Selection
+from describe.spec.tracing import Tracer
 
 
 class DescribeSpecCoordinator(TestCase):
@@ -44,6 +52,64 @@ class DescribeSpecCoordinator(TestCase):
         subject.execute([example_group])
         instance.run.assert_called_once_with()
 
+    @patch('describe.spec.coordinator.ExampleRunner')
+    def test_executes_slowest_groups_first_with_history(self, runner):
+        history = Mock()
+        history.longest_first.side_effect = lambda groups, kind, key: list(reversed(groups))
+        runner.return_value.run.return_value = (1, 0, 0)
+        groups = [Mock(key='spec:DescribeFast'), Mock(key='spec:DescribeSlow')]
+
+        subject = SpecCoordinator(Mock(), Mock(), Mock(), history=history)
+        subject.execute(groups)
+
+        self.assertEqual([args[0] for args, kwargs in runner.call_args_list], list(reversed(groups)))
+
+    def test_finds_only_specs_of_the_shard(self):
+        file_finder, spec_finder, shard = Mock(), Mock(), Mock()
+        file_finder.walk.return_value = [('/foo/a_spec.py', 'a_spec'), ('/foo/b_spec.py', 'b_spec')]
+        shard.select.side_effect = lambda spec_files: spec_files[1:]
+        spec_finder.find.return_value = []
+
+        subject = SpecCoordinator(file_finder, spec_finder, Mock(), shard=shard)
+        subject.find_specs('/foo')
+
+        file_finder.load.assert_called_once_with('/foo', '/foo/b_spec.py', 'b_spec')
+        self.assertFalse(file_finder.find.called)
+
+    def test_finds_only_spec_files_selected_by_the_failures(self):
+        file_finder, spec_finder, failures = Mock(), Mock(), Mock()
+        file_finder.walk.return_value = [('/foo/a_spec.py', 'a_spec'), ('/foo/b_spec.py', 'b_spec')]
+        failures.select.side_effect = lambda spec_files: spec_files[:1]
+        spec_finder.find.return_value = []
+
+        subject = SpecCoordinator(file_finder, spec_finder, Mock(), failures=failures)
+        subject.find_specs('/foo')
+
+        file_finder.load.assert_called_once_with('/foo', '/foo/a_spec.py', 'a_spec')
+
+    @patch('describe.spec.coordinator.ExampleRunner')
+    def test_executes_groups_in_the_order_of_the_failures(self, runner):
+        failures = Mock()
+        failures.order.side_effect = lambda groups: groups[1:]
+        runner.return_value.run.return_value = (1, 0, 0)
+        groups = [Mock(), Mock()]
+
+        subject = SpecCoordinator(Mock(), Mock(), Mock(), failures=failures)
+        self.assertEqual(subject.execute(groups), (1, 0, 0))
+        self.assertEqual(runner.call_args[0][0], groups[1])
+
+    @patch('describe.spec.coordinator.ExampleRunner')
+    def test_stops_executing_groups_once_the_failure_limit_is_reached(self, runner):
+        limit = Mock(reached=False)
+        def run():
+            limit.reached = True
+            return (0, 1, 0)
+        runner.return_value.run.side_effect = run
+
+        subject = SpecCoordinator(Mock(), Mock(), Mock(), failure_limit=limit)
+        self.assertEqual(subject.execute([Mock(), Mock()]), (0, 1, 0))
+        self.assertEqual(runner.call_count, 1)
+
     @patch('os.getcwd')
     def test_run_getcwd_as_default(self, getcwd):
         subject = SpecCoordinator(Mock(), Mock(), Mock())
@@ -77,3 +143,106 @@ class DescribeSpecCoordinator(TestCase):
             ((results,), {}),
         ])
 
+    def test_run_streams_executes_each_spec_file_once_loaded(self):
+        file_finder, spec_finder = Mock(), Mock()
+        file_finder.walk.side_effect = lambda directory: iter([
+            (directory + 'a_spec.py', 'a_spec'), (directory + 'b_spec.py', 'b_spec'),
+        ])
+        calls = []
+        file_finder.load.side_effect = lambda directory, filepath, modulepath: (
+            calls.append(('load', modulepath)) or SpecFile(filepath, modulepath, modulepath))
+        spec_finder.find.side_effect = lambda module: [module]
+        subject = SpecCoordinator(file_finder, spec_finder, Mock(), stream=True)
+        subject.execute = Mock(side_effect=lambda specs: calls.append(('execute', specs)) or (1, 0, 0))
+
+        self.assertEqual(subject.run(['/foo/']), (2, 0, 0))
+
+        self.assertEqual(calls, [
+            ('load', 'a_spec'), ('execute', ['a_spec']),
+            ('load', 'b_spec'), ('execute', ['b_spec']),
+        ])
+
+    def test_run_streams_only_spec_files_of_the_shard(self):
+        file_finder, shard = Mock(), Mock()
+        file_finder.walk.side_effect = lambda directory: iter([('a_spec.py', 'a_spec'), ('b_spec.py', 'b_spec')])
+        shard.includes.side_effect = lambda modulepath: modulepath == 'b_spec'
+        subject = SpecCoordinator(file_finder, Mock(), Mock(), shard=shard, stream=True)
+
+        self.assertEqual([spec_file[2] for spec_file in subject.stream_spec_files(['/foo/'])], ['b_spec'])
+
+
+class DescribeSpecCoordinatorOutlines(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'indexed_cake_spec.py'), 'w') as handle:
+            handle.write('class DescribeCake:\n    def it_is_tasty(self): pass\n')
+        self.index = DiscoveryIndex(os.path.join(self.directory, 'index.json'))
+
+    def tearDown(self):
+        for name in ('indexed_cake_spec', 'sub', 'sub.indexed_pie_spec', 'indexed_pie_spec'):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.directory)
+
+    def keys(self, entries):
+        return [key for entry in entries for key in entry.keys()]
+
+    def test_it_outlines_spec_files(self):
+        subject = SpecCoordinator(index=self.index)
+        self.assertEqual(self.keys(subject.outline([self.directory])), ['indexed_cake_spec:DescribeCake.it_is_tasty'])
+        self.assertTrue(os.path.exists(self.index.path))
+
+    def test_it_outlines_indexed_spec_files_without_importing_them(self):
+        SpecCoordinator(index=self.index).outline([self.directory])
+        file_finder = Mock(wraps=SpecCoordinator().file_finder)
+
+        subject = SpecCoordinator(file_finder, index=DiscoveryIndex(self.index.path))
+
+        self.assertEqual(self.keys(subject.outline([self.directory])), ['indexed_cake_spec:DescribeCake.it_is_tasty'])
+        self.assertFalse(file_finder.load.called)
+
+    def test_it_outlines_indexed_spec_files_with_the_module_path_of_their_spec_directory(self):
+        sub = os.path.join(self.directory, 'sub')
+        os.mkdir(sub)
+        open(os.path.join(sub, '__init__.py'), 'w').close()
+        with open(os.path.join(sub, 'indexed_pie_spec.py'), 'w') as handle:
+            handle.write('class DescribePie:\n    def it_is_flaky(self): pass\n')
+        SpecCoordinator(index=self.index).outline([self.directory])
+
+        subject = SpecCoordinator(index=DiscoveryIndex(self.index.path), selection=Selection(['^indexed_pie_spec:']))
+
+        self.assertEqual(self.keys(subject.outline([sub])), ['indexed_pie_spec:DescribePie.it_is_flaky'])
+
+    def test_it_parses_spec_files_with_a_static_finder_instead_of_importing_them(self):
+        file_finder = Mock(wraps=SpecCoordinator().file_finder)
+        subject = SpecCoordinator(file_finder, static_finder=StaticSpecFinder())
+
+        self.assertEqual(self.keys(subject.outline([self.directory])), ['indexed_cake_spec:DescribeCake.it_is_tasty'])
+        self.assertFalse(file_finder.load.called)
+
+    def test_it_skips_spec_files_without_selected_examples(self):
+        file_finder = Mock(wraps=SpecCoordinator().file_finder)
+        subject = SpecCoordinator(file_finder, static_finder=StaticSpecFinder(), selection=Selection(['pie']))
+
+        self.assertEqual(subject.outline([self.directory]), [])
+        self.assertEqual(subject.find_specs(self.directory), [])
+        self.assertFalse(file_finder.load.called)
+
+    def test_run_traces_finding_importing_and_running_spec_files(self):
+        tracer = Tracer()
+        SpecCoordinator(formatter=Mock(), tracer=tracer).run([self.directory])
+
+        self.assertEqual([span[:2] for span in tracer.spans][:7], [
+            ('walk', 'discovery'),
+            ('walk', 'discovery'),
+            ('indexed_cake_spec', 'import'),
+            ('indexed_cake_spec', 'extract'),
+            ('it_is_tasty', 'example'),
+            ('body', 'example'),
+            ('DescribeCake', 'group'),
+        ])
+
+    def test_run_indexes_the_spec_files_it_imports(self):
+        SpecCoordinator(formatter=Mock(), index=self.index).run([self.directory])
+
+        entries = DiscoveryIndex(self.index.path).entries.values()
+        self.assertEqual(self.keys(entries), ['indexed_cake_spec:DescribeCake.it_is_tasty'])
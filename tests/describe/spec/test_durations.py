@@ -0,0 +1,52 @@
+from unittest import TestCase
+from cStringIO import StringIO
+
+from describe.spec.durations import DurationsReport
+from describe.spec.results import ExampleResult, GroupResult
+
+
+def report_on(report):
+    group, inner = GroupResult('DescribeCake'), GroupResult('ContextFrosted')
+    report.start_example_group(group)
+    report.record_example(ExampleResult('it_is_fast', real_time=0.5, phase_times=(0, 0.25, 0.25, 0, 0)))
+    report.start_example_group(inner)
+    report.record_example(ExampleResult('it_is_slow', real_time=2.0, phase_times=(0.5, 0, 1.5, 0, 0)))
+    report.record_example(ExampleResult('it_is_unknown', real_time=1.0))
+    inner.real_time, inner.phase_times = 3.5, (0, 0.25, 3.0, 0.25, 0)
+    report.end_example_group(inner)
+    group.real_time, group.phase_times = 5.0, (0, 1.0, 4.0, 0, 0)
+    report.end_example_group(group)
+    report.finalize()
+    return report.stdout.getvalue()
+
+
+class DescribeDurationsReport(TestCase):
+    def test_it_prints_the_slowest_examples_with_their_phases(self):
+        output = report_on(DurationsReport(StringIO(), slowest=2))
+        self.assertMultiLineEqual(output, """
+Slowest 2 examples:
+     2.0000s  describe cake context frosted it is slow
+              run.before 0.5000s, body 1.5000s
+     1.0000s  describe cake context frosted it is unknown
+""")
+
+    def test_it_prints_all_examples_for_zero(self):
+        output = report_on(DurationsReport(StringIO(), slowest=0))
+        self.assertTrue('Slowest 3 examples:' in output)
+        self.assertTrue('it is fast' in output)
+
+    def test_it_prints_the_total_and_self_time_of_groups(self):
+        output = report_on(DurationsReport(StringIO(), slowest=None, tree=True))
+        self.assertMultiLineEqual(output, """
+Example group times:
+       total        self  group
+     5.0000s     1.0000s  describe cake
+                            before_all 1.0000s, before_each 0.2500s
+     3.5000s     0.5000s    context frosted
+                              before_all 0.2500s, after_all 0.2500s, run.before 0.5000s
+""")
+
+    def test_it_prints_nothing_without_examples(self):
+        report = DurationsReport(StringIO(), slowest=5, tree=True)
+        report.finalize()
+        self.assertEqual(report.stdout.getvalue(), '')
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock
+
+from describe.spec.containers import Example, ExampleGroup
+from describe.spec.failures import FailureCache, FailureRecorder, default_failures_path
+
+
+class DescribeCake(object):
+    def it_is_tasty(self):
+        pass
+
+    def it_is_sweet(self):
+        pass
+
+    class ContextWithFrosting(object):
+        def it_is_sweeter(self):
+            pass
+
+
+def build_group():
+    cake = DescribeCake()
+    frosting = DescribeCake.ContextWithFrosting()
+    return ExampleGroup(DescribeCake, module=__name__, examples=[
+        Example(cake.it_is_tasty, parents=[cake]),
+        Example(cake.it_is_sweet, parents=[cake]),
+        ExampleGroup(DescribeCake.ContextWithFrosting, parents=[cake], module=__name__, examples=[
+            Example(frosting.it_is_sweeter, parents=[cake, frosting]),
+        ]),
+    ])
+
+
+def names(group):
+    return [example.name for example in group]
+
+
+class DescribeFailureCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, '.describe', 'failures.json')
+        self.subject = FailureCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def key(self, name):
+        return '%s:%s' % (__name__, name)
+
+    def test_it_defaults_to_the_describe_directory(self):
+        self.assertEqual(default_failures_path('/foo'), '/foo/.describe/failures.json')
+
+    def test_it_is_empty_without_a_file(self):
+        self.assertEqual(len(self.subject), 0)
+        self.assertFalse(self.subject.failed('spec:DescribeCake.it_is_tasty'))
+
+    def test_it_persists_failures_until_they_pass(self):
+        self.assertTrue(self.subject.update(['spec:DescribeCake.it_is_tasty', 'spec:DescribePie'], []))
+        cache = FailureCache(self.path)
+        self.assertEqual(cache.keys, set(['spec:DescribeCake.it_is_tasty', 'spec:DescribePie']))
+        self.assertEqual(cache.modules, set(['spec']))
+
+        cache.update(['spec:DescribeCake.it_is_sweet'], ['spec:DescribeCake.it_is_tasty'])
+        self.assertEqual(FailureCache(self.path).keys, set(['spec:DescribeCake.it_is_sweet', 'spec:DescribePie']))
+
+    def test_it_considers_examples_of_failed_groups_as_failed(self):
+        self.subject.update(['spec:DescribeCake'], [])
+        self.assertTrue(self.subject.failed('spec:DescribeCake.ContextFoo.it_is_tasty'))
+        self.assertFalse(self.subject.failed('spec:DescribeCakes.it_is_tasty'))
+        self.assertTrue(self.subject.contains_failure('spec:DescribeCake'))
+
+    def test_it_selects_only_failed_spec_files(self):
+        self.subject.update(['b_spec:DescribeCake.it_is_tasty'], [])
+        spec_files = [('/foo', '/foo/a_spec.py', 'a_spec'), ('/foo', '/foo/b_spec.py', 'b_spec')]
+        self.subject.only_failed = True
+        self.assertEqual(self.subject.select(spec_files), spec_files[1:])
+        self.subject.only_failed = False
+        self.assertEqual(self.subject.select(spec_files), list(reversed(spec_files)))
+
+    def test_it_selects_everything_without_failures(self):
+        spec_files = [('/foo', '/foo/a_spec.py', 'a_spec')]
+        self.subject.only_failed = True
+        self.assertEqual(self.subject.select(spec_files), spec_files)
+
+    def test_it_prunes_groups_to_only_failed_examples(self):
+        self.subject.update([self.key('DescribeCake.ContextWithFrosting.it_is_sweeter')], [])
+        self.subject.only_failed = True
+        other = ExampleGroup(DescribeCake.ContextWithFrosting, module='other_spec', examples=[Mock(key='x')])
+        groups = self.subject.order([build_group(), other])
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(names(groups[0]), ['ContextWithFrosting'])
+        self.assertEqual(names(groups[0][0]), ['it_is_sweeter'])
+
+    def test_it_orders_failed_examples_first(self):
+        self.subject.update([self.key('DescribeCake.it_is_sweet'), self.key('DescribeCake.ContextWithFrosting')], [])
+        groups = self.subject.order([build_group()])
+        self.assertEqual(names(groups[0]), ['it_is_sweet', 'ContextWithFrosting', 'it_is_tasty'])
+
+    def test_it_prunes_and_orders_lazy_groups_once_they_are_loaded(self):
+        self.subject.update([self.key('DescribeCake.it_is_sweet')], [])
+        lazy = ExampleGroup(DescribeCake, module=__name__, loader=lambda: list(build_group()))
+
+        self.assertEqual(self.subject.order([lazy]), [lazy])
+        self.assertFalse(lazy.is_loaded)
+        self.assertEqual(names(lazy), ['it_is_sweet', 'it_is_tasty', 'ContextWithFrosting'])
+
+        lazy.release()
+        self.subject.only_failed = True
+        self.assertEqual(self.subject.order([lazy]), [lazy])
+        self.assertFalse(lazy.is_loaded)
+        self.assertEqual(names(lazy), ['it_is_sweet'])
+
+
+class DescribeFailureRecorder(TestCase):
+    def test_it_updates_the_cache_when_finalized(self):
+        cache = Mock()
+        subject = FailureRecorder(cache)
+        self.assertFalse(subject.record_example(Mock(key='spec:DescribeCake.it_fails', error=Exception())))
+        self.assertTrue(subject.record_example(Mock(key='spec:DescribeCake.it_passes', error=None)))
+        subject.end_example_group(Mock(key='spec:DescribeCake', error=None))
+        subject.finalize()
+
+        cache.update.assert_called_once_with(
+            ['spec:DescribeCake.it_fails'], ['spec:DescribeCake.it_passes', 'spec:DescribeCake'])
@@ -1,4 +1,7 @@
+import os
 import sys
+import shutil
+import tempfile
 from unittest import TestCase, TestSuite
 from cStringIO import StringIO
 from itertools import izip_longest
@@ -7,6 +10,8 @@ from collections import defaultdict
 from mock import Mock, MagicMock, patch
 
 from describe.spec.finders import SpecFileFinder, StandardSpecFinder
+from describe.spec.selection import Selection
+from describe.spec.runners import ExampleRunner, FailureLimit
 from describe.spec.containers import ExampleGroup, Example
 
 
@@ -116,6 +121,162 @@ class DescribeStandardSpecFinderResults(TestCase):
         self.assertEqual(examples, expected)
 
 
+class DescribeStandardSpecFinderTimeouts(TestCase):
+    def test_it_uses_the_timeouts_of_the_nearest_spec_class(self):
+        class DescribeSlow:
+            timeout = 2
+            group_timeout = 10
+            def it_waits(self):
+                pass
+            def it_waits_longer(self):
+                pass
+            it_waits_longer.timeout = 5
+            class ContextNested:
+                def it_waits_too(self):
+                    pass
+
+        group = StandardSpecFinder().find(ModuleStub(DescribeSlow))[0]
+        nested, waits, waits_longer = group.examples
+        self.assertEqual(group.timeout, 10)
+        self.assertEqual((waits.timeout, waits_longer.timeout), (2, 5))
+        self.assertEqual(nested.timeout, None)
+        self.assertEqual(nested[0].timeout, 2)
+
+
+class DescribeStandardSpecFinderLaziness(TestCase):
+    def test_it_only_looks_for_the_contents_of_groups_once_needed(self):
+        created = []
+        class DescribeLazy:
+            class ContextNested:
+                def __init__(self):
+                    created.append(self)
+                def it_works(self):
+                    pass
+
+        group = StandardSpecFinder().find(ModuleStub(DescribeLazy))[0]
+        self.assertFalse(group.is_loaded)
+        self.assertEqual(created, [])
+
+        nested = group.examples[0]
+        self.assertEqual(len(created), 1)
+        self.assertFalse(nested.is_loaded)
+        self.assertEqual([example.name for example in nested], ['it_works'])
+
+
+class DescribeStandardSpecFinderHooks(TestCase):
+    def test_it_runs_before_all_and_after_all_of_spec_classes_when_stopping_early(self):
+        ran = []
+        class DescribeCake:
+            def before_all(self):
+                ran.append('before_all')
+            def after_all(self):
+                ran.append('after_all')
+            def it_is_a_lie(self):
+                ran.append('it_is_a_lie')
+                raise TypeError('idk')
+            def it_is_sweet(self):
+                ran.append('it_is_sweet')
+
+        group = StandardSpecFinder().find(ModuleStub(DescribeCake))
+        limit = FailureLimit(1)
+        successes, failures, skipped = ExampleRunner(group, Mock(), limit).run()
+
+        self.assertTrue(limit.reached)
+        self.assertEqual((successes, failures), (0, 1))
+        self.assertEqual(ran, ['before_all', 'it_is_a_lie', 'after_all'])
+
+
+class DescribeStandardSpecFinderOutlines(TestCase):
+    def setUp(self):
+        self.subject = StandardSpecFinder()
+
+    def test_it_outlines_the_same_specs_as_find(self):
+        module = ModuleStub(DescribeBaby)
+        outline = self.subject.outline(module)[0]
+        group = self.subject.find(module).examples[0]
+
+        self.assertEqual(outline.name, group.name)
+        self.assertTrue(outline.hooks)
+        self.assertEqual([child.name for child in outline.children], [example.name for example in group])
+
+    def test_it_outlines_without_instantiating_spec_classes(self):
+        created = []
+        class DescribeCounted(object):
+            def __init__(self):
+                created.append(self)
+
+            def it_works(self):
+                pass
+
+        outline = self.subject.outline(ModuleStub(DescribeCounted))
+
+        self.assertEqual(created, [])
+        self.assertEqual([child.name for child in outline[0].children], ['it_works'])
+
+
+class DescribeStandardSpecFinderSelection(TestCase):
+    def setUp(self):
+        self.created = created = []
+        class DescribeCake(object):
+            tags = 'dessert'
+            def __init__(self):
+                created.append('cake')
+            def it_is_tasty(self):
+                pass
+            def it_is_sweet(self):
+                pass
+            it_is_sweet.tags = 'sugar'
+            class WhenFrosted(object):
+                def __init__(self):
+                    created.append('frosted')
+                def before_all(self):
+                    created.append('before_all')
+                def it_is_sweeter(self):
+                    pass
+        class DescribePie(object):
+            def __init__(self):
+                created.append('pie')
+            def it_is_round(self):
+                pass
+        self.module = ModuleStub(DescribeCake, DescribePie)
+
+    def find(self, selection):
+        return StandardSpecFinder(selection).find(self.module)
+
+    def names(self, group):
+        return [example.name for example in group]
+
+    def test_it_leaves_out_specs_without_selected_examples_before_instantiating_them(self):
+        specs = self.find(Selection(['cake it is tasty']))
+        self.assertEqual(self.names(specs), ['DescribeCake'])
+        self.assertEqual(self.names(specs[0]), ['it_is_tasty'])
+        self.assertEqual(self.created, ['cake'])
+
+    def test_it_selects_by_tags_of_examples_and_their_groups(self):
+        self.assertEqual(self.names(self.find(Selection(tags=['sugar']))[0]), ['it_is_sweet'])
+        self.assertEqual(self.names(self.find(Selection(tags=['dessert']))), ['DescribeCake'])
+        self.assertEqual(self.names(self.find(Selection(excluded_tags=['dessert']))), ['DescribePie'])
+
+    def test_it_keeps_groups_with_selected_examples(self):
+        specs = self.find(Selection(['frosted']))
+        self.assertEqual(self.names(specs[0]), ['WhenFrosted'])
+        self.assertEqual(self.names(specs[0][0]), ['it_is_sweeter'])
+
+    def test_it_outlines_each_spec_only_once(self):
+        selection = Selection(['frosted'])
+        selection.selected_names = Mock(wraps=selection.selected_names)
+        specs = self.find(selection)
+        list(specs[0][0])
+
+        self.assertEqual(selection.selected_names.call_count, 2)
+
+    def test_it_outlines_tags(self):
+        outline = StandardSpecFinder().outline(self.module)[0]
+        self.assertEqual(outline.tags, frozenset(['dessert']))
+        tags = dict((child.name, child.tags) for child in outline.children)
+        self.assertEqual((tags['it_is_tasty'], tags['it_is_sweet']), (frozenset(), frozenset(['sugar'])))
+
+
 class DescribeSpecFileFinderFeatures(TestCase):
     def setUp(self):
         self._import, self._dir = Mock(), Mock()
@@ -149,3 +310,55 @@ class DescribeSpecFileFinderFeatures(TestCase):
 
         self.assertEqual(self.subject.find_in_module(m), [dfood, dcake])
 
+
+
+class DescribeSpecFileFinderWalking(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for path in ('a_spec.py', 'pkg/b_spec.py', 'pkg/generated/c_spec.py', '.git/d_spec.py',
+                'node_modules/lib/e_spec.py', 'other/f_spec.py', 'other/keep.log'):
+            self.write(path, '')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, path, contents):
+        filepath = os.path.join(self.directory, path)
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'w') as handle:
+            handle.write(contents)
+
+    def files(self, finder):
+        return sorted(os.path.relpath(path, self.directory) for path in finder.iter_files(self.directory))
+
+    def test_it_skips_default_ignored_directories(self):
+        self.assertEqual(self.files(SpecFileFinder()), [
+            'a_spec.py', 'other/f_spec.py', 'other/keep.log', 'pkg/b_spec.py', 'pkg/generated/c_spec.py',
+        ])
+
+    def test_it_skips_paths_in_gitignore_files(self):
+        self.write('.gitignore', '*.log\n')
+        self.write('pkg/.gitignore', 'generated/\n')
+        self.assertEqual(self.files(SpecFileFinder()), [
+            '.gitignore', 'a_spec.py', 'other/f_spec.py', 'pkg/.gitignore', 'pkg/b_spec.py',
+        ])
+
+    def test_it_can_ignore_gitignore_files(self):
+        self.write('.gitignore', 'pkg/\n')
+        self.assertIn('pkg/b_spec.py', self.files(SpecFileFinder(use_gitignore=False)))
+
+    def test_it_skips_given_patterns(self):
+        self.assertEqual(self.files(SpecFileFinder(ignore=['other/', 'c_*.py'])), ['a_spec.py', 'pkg/b_spec.py'])
+
+    def test_it_walks_in_the_same_order_as_os_walk(self):
+        expected = []
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [name for name in dirs if name not in ('.git', 'node_modules')]
+            expected.extend(os.path.join(root, name) for name in files)
+        self.assertEqual(list(SpecFileFinder().iter_files(self.directory)), expected)
+
+    def test_it_returns_spec_modules_of_the_walked_files(self):
+        self.assertEqual(sorted(module for _, module in SpecFileFinder().walk(self.directory)), [
+            'a_spec', 'other.f_spec', 'pkg.b_spec', 'pkg.generated.c_spec',
+        ])
@@ -3,7 +3,8 @@ from unittest import TestCase
 from cStringIO import StringIO
 from mock import Mock, MagicMock, patch
 
-from describe.spec.formatters import StandardResultsFormatter, ErrorFormat, MinimalResultsFormatter
+from describe.spec.formatters import StandardResultsFormatter, ErrorFormat, MinimalResultsFormatter, \
+        FormatterGroup
 from describe.spec.containers import Example, ExampleGroup
 from tests.describe.spec.shared_utils import SampleError
 
@@ -155,11 +156,22 @@ class DescribeStandardResultsFormatter(TestCase):
         self.assertIn('F', stdout)
 
     def test_it_should_record_example_group(self):
-        real_time, user_time = 2, 1
-        self.r.start_example_group('describe_cake')
-        self.r.end_example_group('describe_cake')
+        group = ExampleGroup('describe_cake')
+        self.r.start_example_group(group)
+        self.r.end_example_group(group)
 
         self.assertEqual(self.r.num_groups, 1)
+        self.assertEqual(self.r.num_failed, 0)
+
+    def test_it_should_record_failed_example_group(self):
+        group = ExampleGroup('describe_cake', error=TypeError('foobar'), traceback=Mock())
+        self.r.start_example_group(group)
+        self.r.end_example_group(group)
+
+        self.assertEqual(self.r.num_examples, 0)
+        self.assertEqual(self.r.num_failed, 1)
+        self.assertEqual(self.r.errors[0].name, 'describe_cake')
+        self.assertIn('F', self.stdout.getvalue())
 
     def test_finalize_uses_write_errors_and_write_summary(self):
         self.r.write_errors = Mock(return_value='')
@@ -312,3 +324,20 @@ OK (skipped=3)
 """
         self.assertMultiLineEqual(self.stdout.getvalue(), output)
 
+
+
+class DescribeFormatterGroup(TestCase):
+    def test_it_sends_results_to_every_formatter(self):
+        formatters = [Mock(), Mock()]
+        formatters[0].record_example.return_value = True
+        example = Mock()
+        subject = FormatterGroup(*formatters)
+
+        self.assertTrue(subject.record_example(example))
+        subject.start_example_group(example)
+        subject.finalize()
+
+        for formatter in formatters:
+            formatter.record_example.assert_called_once_with(example)
+            formatter.start_example_group.assert_called_once_with(example)
+            formatter.finalize.assert_called_once_with()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock
+
+from describe.spec.history import TimingHistory, TimingRecorder, default_history_path
+
+
+class DescribeTimingHistory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, '.describe', 'timings.sqlite3')
+        self.subject = TimingHistory(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_it_defaults_to_the_describe_directory(self):
+        self.assertEqual(default_history_path('/foo'), '/foo/.describe/timings.sqlite3')
+
+    def test_it_is_empty_without_a_database(self):
+        self.assertEqual(len(self.subject), 0)
+        self.assertEqual(self.subject.duration('example', 'foo'), None)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_it_persists_recorded_durations(self):
+        self.subject.record('example', 'spec:DescribeCake.it_is_tasty', 1.5, 1.0)
+        self.subject.record('group', 'spec:DescribeCake', 2.0)
+        self.assertTrue(self.subject.save())
+
+        history = TimingHistory(self.path)
+        self.assertEqual(history.duration('example', 'spec:DescribeCake.it_is_tasty'), 1.5)
+        self.assertEqual(history.duration('group', 'spec:DescribeCake'), 2.0)
+        self.assertEqual(history.duration('file', 'spec'), None)
+
+    def test_it_averages_durations_over_runs(self):
+        self.subject.record('example', 'key', 1.0)
+        self.subject.record('example', 'key', 3.0)
+        self.assertEqual(self.subject.duration('example', 'key'), 2.0)
+
+    def test_it_ignores_unrun_examples(self):
+        self.subject.record('example', 'key', -1)
+        self.assertEqual(self.subject.duration('example', 'key'), None)
+
+    def test_it_sorts_longest_first_with_unknowns_as_average(self):
+        self.subject.record('group', 'fast', 1.0)
+        self.subject.record('group', 'slow', 5.0)
+        self.subject.record('group', 'medium', 2.0)
+
+        self.assertEqual(self.subject.estimates(['fast', 'new', 'slow'], 'group'), [1.0, 3.0, 5.0])
+        self.assertEqual(self.subject.longest_first(['fast', 'new', 'medium', 'slow'], 'group'), [
+            'slow', 'new', 'medium', 'fast',
+        ])
+
+    def test_it_keeps_the_order_without_history(self):
+        self.assertEqual(self.subject.longest_first(['b', 'c', 'a'], 'group'), ['b', 'c', 'a'])
+
+
+class DescribeTimingRecorder(TestCase):
+    def example(self, key, module, real_time, user_time=-1):
+        return Mock(key=key, module=module, real_time=real_time, user_time=user_time, error=None)
+
+    def test_it_records_examples_groups_and_files(self):
+        history = Mock()
+        subject = TimingRecorder(history)
+        group = self.example('spec:DescribeCake', 'spec', 3)
+        inner = self.example('spec:DescribeCake.ContextLie', 'spec', 1)
+        example = self.example('spec:DescribeCake.ContextLie.it_is', 'spec', 0.5, 0.25)
+
+        subject.start_example_group(group)
+        subject.start_example_group(inner)
+        subject.record_example(example)
+        subject.end_example_group(inner)
+        subject.end_example_group(group)
+        subject.finalize()
+
+        self.assertEqual(history.record.call_args_list, [
+            (('example', 'spec:DescribeCake.ContextLie.it_is', 0.5, 0.25), {}),
+            (('group', 'spec:DescribeCake.ContextLie', 1, -1), {}),
+            (('group', 'spec:DescribeCake', 3, -1), {}),
+            (('file', 'spec', 3), {}),
+        ])
+        history.save.assert_called_once_with()
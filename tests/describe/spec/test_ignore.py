@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from describe.spec.ignore import IgnoreRules, unique_directories
+
+
+class DescribeIgnoreRules(TestCase):
+    def test_it_ignores_version_control_directories_by_default(self):
+        rules = IgnoreRules()
+        self.assertTrue(rules.ignores('.git', True))
+        self.assertTrue(rules.ignores('pkg/node_modules', True))
+        self.assertFalse(rules.ignores('.git', False))
+
+    def test_it_can_be_created_without_defaults(self):
+        self.assertFalse(IgnoreRules(defaults=()).ignores('.git', True))
+
+    def test_it_matches_names_at_any_depth(self):
+        rules = IgnoreRules(['*.pyc', 'tmp'], defaults=())
+        self.assertTrue(rules.ignores('foo.pyc'))
+        self.assertTrue(rules.ignores('a/b/foo.pyc'))
+        self.assertTrue(rules.ignores('a/tmp', True))
+        self.assertFalse(rules.ignores('a/tmpfile'))
+
+    def test_it_anchors_patterns_containing_a_slash(self):
+        rules = IgnoreRules(['/build', 'docs/*.py'], defaults=())
+        self.assertTrue(rules.ignores('build', True))
+        self.assertFalse(rules.ignores('src/build', True))
+        self.assertTrue(rules.ignores('docs/conf.py'))
+        self.assertFalse(rules.ignores('src/docs/conf.py'))
+
+    def test_it_only_matches_directories_for_patterns_ending_in_a_slash(self):
+        rules = IgnoreRules(['logs/'], defaults=())
+        self.assertTrue(rules.ignores('logs', True))
+        self.assertFalse(rules.ignores('logs', False))
+
+    def test_it_matches_double_stars(self):
+        rules = IgnoreRules(['a/**/b', 'c/**'], defaults=())
+        self.assertTrue(rules.ignores('a/b'))
+        self.assertTrue(rules.ignores('a/x/y/b'))
+        self.assertTrue(rules.ignores('c/d/e'))
+        self.assertFalse(rules.ignores('x/a/b'))
+
+    def test_the_last_matching_pattern_wins(self):
+        rules = IgnoreRules(['*_spec.py', '!keep_spec.py'])
+        self.assertTrue(rules.ignores('drop_spec.py'))
+        self.assertFalse(rules.ignores('keep_spec.py'))
+        rules.add('keep_spec.py')
+        self.assertTrue(rules.ignores('keep_spec.py'))
+
+    def test_it_can_negate_defaults(self):
+        self.assertFalse(IgnoreRules(['!build/']).ignores('build', True))
+
+    def test_it_reads_gitignore_lines_relative_to_a_base(self):
+        rules = IgnoreRules(defaults=())
+        rules.add_lines(['# comment\n', '\n', 'out/\n', '/top.py\n', '\\#hash\n'], base='pkg')
+        self.assertEqual(len(rules), 3)
+        self.assertTrue(rules.ignores('pkg/sub/out', True))
+        self.assertTrue(rules.ignores('pkg/top.py'))
+        self.assertTrue(rules.ignores('pkg/#hash'))
+        self.assertFalse(rules.ignores('out', True))
+        self.assertFalse(rules.ignores('pkg/sub/top.py'))
+
+
+class DescribeUniqueDirectories(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'a', 'b'))
+        os.makedirs(os.path.join(self.directory, 'ab'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def test_it_removes_duplicates(self):
+        self.assertEqual(unique_directories([self.path('a'), self.path('a', '')]), [self.path('a')])
+
+    def test_it_removes_directories_inside_others(self):
+        self.assertEqual(unique_directories([self.path('a', 'b'), self.path('a')]), [self.path('a')])
+
+    def test_it_keeps_siblings_sharing_a_prefix(self):
+        paths = [self.path('a'), self.path('ab')]
+        self.assertEqual(unique_directories(paths), paths)
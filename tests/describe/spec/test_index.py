@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from describe.spec.index import DiscoveryIndex, IndexEntry, Outline, default_index_path
+
+
+def build_outlines():
+    return [Outline('DescribeCake', True, True, [
+        Outline('it_is_tasty', tags=['slow']),
+        Outline('ContextWithFrosting', True, False, [Outline('it_is_sweeter')], tags=['frosting']),
+    ])]
+
+
+class DescribeIndexEntry(TestCase):
+    def setUp(self):
+        self.subject = IndexEntry('cake_spec.py', 'cake_spec', 1.0, 10, build_outlines())
+
+    def test_it_counts_examples(self):
+        self.assertEqual(len(self.subject), 2)
+
+    def test_it_returns_keys_of_examples(self):
+        self.assertEqual(list(self.subject.keys()), [
+            'cake_spec:DescribeCake.it_is_tasty',
+            'cake_spec:DescribeCake.ContextWithFrosting.it_is_sweeter',
+        ])
+
+    def test_it_returns_names_and_tags_of_examples(self):
+        self.assertEqual(list(self.subject.examples()), [
+            (('DescribeCake', 'it_is_tasty'), frozenset(['slow'])),
+            (('DescribeCake', 'ContextWithFrosting', 'it_is_sweeter'), frozenset(['frosting'])),
+        ])
+
+    def test_it_returns_keys_of_groups(self):
+        self.assertEqual(list(self.subject.keys(groups=True)), [
+            'cake_spec:DescribeCake',
+            'cake_spec:DescribeCake.it_is_tasty',
+            'cake_spec:DescribeCake.ContextWithFrosting',
+            'cake_spec:DescribeCake.ContextWithFrosting.it_is_sweeter',
+        ])
+
+
+class DescribeDiscoveryIndex(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, '.describe', 'index.json')
+        self.spec_path = os.path.join(self.directory, 'cake_spec.py')
+        self.write('class DescribeCake: pass\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, source):
+        with open(self.spec_path, 'w') as handle:
+            handle.write(source)
+
+    def test_default_path_is_in_the_describe_directory(self):
+        self.assertEqual(default_index_path('/foo'), '/foo/.describe/index.json')
+
+    def test_it_is_empty_without_a_file(self):
+        self.assertEqual(len(DiscoveryIndex(self.path)), 0)
+
+    def test_it_is_empty_with_an_invalid_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as handle:
+            handle.write('[1, 2')
+        self.assertEqual(len(DiscoveryIndex(self.path)), 0)
+
+    def test_it_saves_and_loads_outlines(self):
+        index = DiscoveryIndex(self.path)
+        index.update(self.spec_path, 'cake_spec', build_outlines())
+        self.assertTrue(index.save())
+
+        entry = DiscoveryIndex(self.path).lookup(self.spec_path)
+        self.assertEqual(entry.modulepath, 'cake_spec')
+        self.assertEqual(entry.outlines, build_outlines())
+        self.assertTrue(isinstance(entry.modulepath, str))
+
+    def test_it_forgets_changed_files(self):
+        index = DiscoveryIndex(self.path)
+        index.update(self.spec_path, 'cake_spec', build_outlines())
+        index.save()
+        self.write('class DescribeCake:\n    def it_is_new(self): pass\n')
+
+        self.assertEqual(DiscoveryIndex(self.path).lookup(self.spec_path), None)
+
+    def test_it_looks_up_files_under_the_given_module_path(self):
+        index = DiscoveryIndex(self.path)
+        index.update(self.spec_path, 'specs.cake_spec', build_outlines())
+
+        entry = index.lookup(self.spec_path, 'cake_spec')
+        self.assertEqual(entry.modulepath, 'cake_spec')
+        self.assertEqual(entry.outlines, build_outlines())
+        self.assertEqual(index.lookup(self.spec_path).modulepath, 'specs.cake_spec')
+
+    def test_it_drops_deleted_files_when_saving(self):
+        index = DiscoveryIndex(self.path)
+        index.update(self.spec_path, 'cake_spec', build_outlines())
+        os.remove(self.spec_path)
+        index.save()
+
+        self.assertEqual(len(DiscoveryIndex(self.path)), 0)
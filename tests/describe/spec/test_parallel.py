@@ -0,0 +1,205 @@
+import os
+import sys
+import struct
+import shutil
+import tempfile
+import multiprocessing
+from unittest import TestCase
+from cStringIO import StringIO
+
+from mock import Mock, patch
+
+from describe.spec.coordinator import SpecCoordinator
+from describe.spec.formatters import StandardResultsFormatter
+from describe.spec.containers import Example
+from describe.spec.runners import ExampleRunner, FailureLimit, USER_CODE
+from describe.spec.parallel import ParallelSpecCoordinator, ParallelExecutionError, Worker, \
+        Zygote, ResourceLimits, ResourceLimitError
+from describe.spec.sampling import StackSampler
+from describe.spec.tracing import Tracer
+
+
+SPEC = """
+class Describe%(name)s:
+    def it_passes(self):
+        pass
+
+    def it_fails(self):
+        raise ValueError('%(name)s failed')
+"""
+
+
+class ParallelSpecsTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ('Cake', 'Pie', 'Tart'):
+            self.write_spec(name.lower() + '_spec.py', SPEC % {'name': name})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_spec(self, filename, source):
+        with open(os.path.join(self.directory, filename), 'w') as handle:
+            handle.write(source)
+
+    def run_with(self, coordinator_class, **kwargs):
+        formatter = StandardResultsFormatter(StringIO())
+        result = coordinator_class(formatter=formatter, **kwargs).run([self.directory])
+        output = formatter.stdout.getvalue()
+        return result, output.rsplit('Ran ', 1)[0]
+
+
+class DescribeParallelSpecCoordinator(ParallelSpecsTestCase):
+    def test_it_outputs_the_same_results_as_a_serial_run(self):
+        _, serial = self.run_with(SpecCoordinator)
+        result, parallel = self.run_with(ParallelSpecCoordinator, jobs=2)
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(result, (3, 3, 0))
+
+    def test_it_outputs_the_same_results_when_streaming(self):
+        _, serial = self.run_with(SpecCoordinator, stream=True)
+        result, parallel = self.run_with(ParallelSpecCoordinator, jobs=2, stream=True)
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(result, (3, 3, 0))
+
+    def test_it_replaces_workers_after_max_files(self):
+        result, _ = self.run_with(ParallelSpecCoordinator, jobs=2, max_files_per_worker=1)
+        self.assertEqual(result, (3, 3, 0))
+
+    def test_it_stops_all_workers_at_the_failure_limit(self):
+        result, _ = self.run_with(ParallelSpecCoordinator, jobs=2, failure_limit=FailureLimit(1))
+        # each worker may have been in the middle of a failing example.
+        self.assertTrue(1 <= result[1] <= 2)
+
+    def test_it_records_a_failure_when_a_worker_dies(self):
+        self.write_spec('crash_spec.py', 'import os\nclass DescribeCrash:\n'
+                                         '    def it_dies(self):\n        os._exit(3)\n')
+        result, output = self.run_with(ParallelSpecCoordinator, jobs=2)
+        self.assertEqual(result, (3, 4, 0))
+        self.assertIn('WorkerExited: Worker exited unexpectedly (code 3)', output)
+
+    def test_it_merges_the_stacks_workers_sampled(self):
+        self.write_spec('busy_spec.py', 'import time\nclass DescribeBusy:\n'
+                        '    def it_is_busy(self):\n'
+                        '        start = time.clock()\n'
+                        '        while time.clock() - start < 0.1: pass\n')
+        sampler = StackSampler(self.directory, interval=0.001)
+        result, _ = self.run_with(ParallelSpecCoordinator, jobs=2, sampler=sampler)
+
+        self.assertEqual(result, (4, 3, 0))
+        self.assertTrue(sampler.folded['busy_spec:DescribeBusy.it_is_busy'])
+
+    def test_it_merges_the_spans_of_every_worker_on_their_own_track(self):
+        tracer = Tracer()
+        result, _ = self.run_with(ParallelSpecCoordinator, jobs=2, tracer=tracer)
+
+        self.assertEqual(result, (3, 3, 0))
+        self.assertEqual(sorted(tracer.tracks), [0, 1, 2])
+        examples = [(span[0], span[4]) for span in tracer.spans if span[0].startswith('it_')]
+        self.assertEqual(sorted(name for name, _ in examples), ['it_fails', 'it_fails', 'it_fails',
+                                                                 'it_passes', 'it_passes', 'it_passes'])
+        self.assertNotIn(0, [tid for _, tid in examples])
+        self.assertIn(('walk', 0), [(span[0], span[4]) for span in tracer.spans])
+
+    def test_it_treats_a_truncated_message_as_a_crashed_worker(self):
+        reader, writer = multiprocessing.Pipe(duplex=False)
+        other_reader, other_writer = multiprocessing.Pipe(duplex=False)
+        # the length of a message, and only part of it.
+        os.write(writer.fileno(), struct.pack('!i', 1000) + 'abc')
+        writer.close()
+        other_writer.send(('ready', 1))
+        workers = {0: Mock(results=reader), 1: Mock(results=other_reader)}
+
+        messages = ParallelSpecCoordinator()._receive(workers)
+
+        self.assertEqual(sorted(messages), [('exited', 0), ('ready', 1)])
+
+    def test_it_raises_when_a_spec_file_can_not_be_imported(self):
+        self.write_spec('broken_spec.py', 'raise ImportError("nope")\n')
+        with self.assertRaises(ParallelExecutionError):
+            self.run_with(ParallelSpecCoordinator, jobs=2)
+
+
+class DescribeWorker(TestCase):
+    def test_it_retires_after_max_files(self):
+        worker = Worker(0, None, None, max_files=2)
+        worker.num_files = 1
+        self.assertFalse(worker.should_retire())
+        worker.num_files = 2
+        self.assertTrue(worker.should_retire())
+
+    @patch('describe.spec.parallel.current_rss')
+    def test_it_retires_after_max_rss(self, current_rss):
+        worker = Worker(0, None, None, max_rss=1024)
+        current_rss.return_value = 1000
+        self.assertFalse(worker.should_retire())
+        current_rss.return_value = 2048
+        self.assertTrue(worker.should_retire())
+
+    def test_it_retires_once_it_exceeded_its_cpu_time_limit(self):
+        worker = Worker(0, None, None, limits=ResourceLimits(cpu=1))
+        self.assertFalse(worker.should_retire())
+        worker.limits.exceeded = True
+        self.assertTrue(worker.should_retire())
+
+
+class DescribeResourceLimits(TestCase):
+    def tearDown(self):
+        USER_CODE.pending = None
+
+    def test_it_fails_the_next_example_when_the_cpu_limit_is_exceeded_outside_of_one(self):
+        limits = ResourceLimits(cpu=1)
+        limits.start_spec_file = Mock()
+        limits._cpu_exceeded(None, sys._getframe())
+
+        self.assertTrue(limits.exceeded)
+        limits.start_spec_file.assert_called_once_with()
+        example = Example(lambda: None)
+        self.assertEqual(ExampleRunner(example, Mock()).run(), (0, 1, 0))
+        self.assertTrue(isinstance(example.error, ResourceLimitError))
+
+    def test_it_interrupts_running_examples_when_the_cpu_limit_is_exceeded(self):
+        limits = ResourceLimits(cpu=1)
+        limits.start_spec_file = Mock()
+        example = Example(lambda: limits._cpu_exceeded(None, sys._getframe()))
+
+        self.assertEqual(ExampleRunner(example, Mock()).run(), (0, 1, 0))
+        self.assertTrue(isinstance(example.error, ResourceLimitError))
+        self.assertEqual(USER_CODE.pending, None)
+
+
+class DescribeZygote(ParallelSpecsTestCase):
+    def spec_files(self):
+        return ParallelSpecCoordinator().find_spec_files(self.directory)
+
+    def test_it_finds_top_level_imports_of_spec_files(self):
+        self.write_spec('deps_spec.py', 'import os, json\nfrom xml.dom import minidom\nfrom . import rel\n')
+        self.assertEqual(Zygote().imports_of(os.path.join(self.directory, 'deps_spec.py')), [
+            'os', 'json', 'xml.dom',
+        ])
+
+    def test_it_excludes_spec_modules_from_dependencies(self):
+        self.write_spec('deps_spec.py', 'import cake_spec\nimport os\n')
+        self.assertEqual(Zygote(['json']).dependencies(self.spec_files()), ['json', 'os'])
+
+    def test_it_only_uses_given_modules_without_discovery(self):
+        self.write_spec('deps_spec.py', 'import os\n')
+        self.assertEqual(Zygote(['json'], discover=False).dependencies(self.spec_files()), ['json'])
+
+    def test_it_preloads_dependencies_relative_to_the_spec_directory(self):
+        self.write_spec('zygote_dependency.py', 'VALUE = 1\n')
+        self.write_spec('deps_spec.py', 'import zygote_dependency\nimport module_that_does_not_exist\n')
+        try:
+            zygote = Zygote()
+            self.assertEqual(zygote.preload(self.spec_files()), ['zygote_dependency'])
+            self.assertTrue('zygote_dependency' in sys.modules)
+            self.assertFalse(self.directory in sys.path)
+        finally:
+            sys.modules.pop('zygote_dependency', None)
+
+    def test_it_runs_specs_after_preloading(self):
+        _, serial = self.run_with(SpecCoordinator)
+        result, parallel = self.run_with(ParallelSpecCoordinator, jobs=2, zygote=Zygote())
+        self.assertEqual(parallel, serial)
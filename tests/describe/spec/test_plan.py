@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from describe.spec.containers import Example, ExampleGroup
+from describe.spec.plan import ExecutionPlan, ENTER, EXIT, RUN, SKIP
+from describe.spec.runners import ExampleRunner, Timeouts
+
+
+def with_context(context):
+    pass
+
+def without_context():
+    pass
+
+
+class DescribeExecutionPlan(TestCase):
+    def compile(self, example, timeouts=None):
+        return ExecutionPlan.compile(example, timeouts or Timeouts())
+
+    def test_it_flattens_groups_into_enter_and_exit_steps(self):
+        inner = ExampleGroup('ContextInner', examples=[Example(with_context)])
+        group = ExampleGroup('DescribeCake', examples=[inner, Example(without_context), Example(None)])
+        steps = self.compile(group).steps
+
+        self.assertEqual([(step.kind, step.example) for step in steps], [
+            (ENTER, group), (ENTER, inner), (RUN, inner[0]), (EXIT, inner),
+            (RUN, group[1]), (SKIP, group[2]), (EXIT, group),
+        ])
+        self.assertEqual(steps[0].exit_index, 6)
+        self.assertEqual(steps[1].exit_index, 3)
+
+    def test_it_does_not_load_lazy_groups(self):
+        loader = Mock(return_value=[Example(with_context)])
+        inner = ExampleGroup('ContextInner', loader=loader)
+        group = ExampleGroup('DescribeCake', examples=[inner])
+        steps = self.compile(group).steps
+
+        self.assertEqual([(step.kind, step.example) for step in steps], [
+            (ENTER, group), (ENTER, inner), (EXIT, inner), (EXIT, group),
+        ])
+        self.assertTrue(steps[1].lazy)
+        self.assertFalse(loader.called)
+
+    def test_it_compiles_the_contents_of_groups(self):
+        group = ExampleGroup('DescribeCake', examples=[Example(with_context)])
+        steps = ExecutionPlan.compile_contents(group, Timeouts()).steps
+        self.assertEqual([(step.kind, step.example) for step in steps], [(RUN, group[0])])
+
+    def test_it_resolves_how_functions_are_called(self):
+        group = ExampleGroup('DescribeCake', examples=[
+            Example(with_context, before=[without_context], after=[with_context]),
+            Example(without_context),
+        ])
+        steps = self.compile(group).steps
+
+        self.assertTrue(steps[1].takes_context)
+        self.assertEqual(steps[1].before, ((without_context, False),))
+        self.assertEqual(steps[1].after, ((with_context, True),))
+        self.assertFalse(steps[2].takes_context)
+
+    def test_it_resolves_timeouts(self):
+        group = ExampleGroup('DescribeCake', examples=[Example(with_context), Example(with_context, timeout=3)])
+        steps = self.compile(group, Timeouts(example=1, group=2)).steps
+        self.assertEqual([step.timeout for step in steps[:3]], [2, 1, 3])
+
+    def test_it_does_not_skip_the_root(self):
+        self.assertEqual([step.kind for step in self.compile(ExampleGroup('DescribeEmpty')).steps], [ENTER, EXIT])
+
+
+class DescribeExampleRunnerWalkingAPlan(TestCase):
+    def test_it_skips_the_examples_of_groups_whose_before_functions_fail(self):
+        formatter, ran = Mock(), []
+        def failing_before():
+            raise TypeError('idk')
+        inner = ExampleGroup('ContextInner', before=failing_before, examples=[Example(lambda: ran.append('inner'))])
+        group = ExampleGroup('DescribeCake', examples=[inner, Example(lambda: ran.append('outer'))])
+
+        self.assertEqual(ExampleRunner(group, formatter).run(), (1, 1, 0))
+        self.assertEqual(ran, ['outer'])
+        self.assertTrue(isinstance(inner.error, TypeError))
+        self.assertEqual(group.error, None)
+        self.assertEqual([args[0][0] for args in formatter.end_example_group.call_args_list], [inner, group])
+
+    def test_it_passes_group_contexts_to_their_examples(self):
+        seen = []
+        def before(context):
+            context.cake = 'lie'
+        def example(context):
+            seen.append(context.cake)
+        group = ExampleGroup('DescribeCake', before=before, examples=[
+            ExampleGroup('ContextInner', examples=[Example(example)]),
+        ])
+        ExampleRunner(group, Mock()).run()
+        self.assertEqual(seen, ['lie'])
@@ -0,0 +1,76 @@
+import os
+import pstats
+import shutil
+import tempfile
+from unittest import TestCase
+from cStringIO import StringIO
+
+from describe.spec.containers import Example, ExampleGroup
+from describe.spec.runners import ExampleRunner
+from describe.spec.formatters import FormatterGroup
+from describe.spec.profiling import ExampleProfiler, format_function
+
+
+def make_fixture():
+    return sorted(range(100))
+
+
+class Cake(object):
+    def it_uses_a_fixture(self):
+        make_fixture()
+
+
+class Pie(object):
+    def it_does_nothing(self):
+        pass
+
+
+def run_specs(profiler):
+    cake, pie = Cake(), Pie()
+    groups = [
+        ExampleGroup(Cake, examples=[Example(cake.it_uses_a_fixture, parents=[cake])]),
+        ExampleGroup(Pie, examples=[Example(pie.it_does_nothing, parents=[pie])]),
+    ]
+    formatter = FormatterGroup(profiler)
+    for group in groups:
+        ExampleRunner(group, formatter, profiler=profiler).run()
+    formatter.finalize()
+    return profiler.stdout.getvalue()
+
+
+class DescribeExampleProfiler(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_it_reports_the_functions_examples_call(self):
+        output = run_specs(ExampleProfiler(StringIO()))
+        self.assertTrue('Profile of 2 examples, by cumulative time:' in output)
+        self.assertTrue('(make_fixture)' in output)
+        self.assertTrue('{sorted}' in output)
+        self.assertFalse('plan.py' in output)
+
+    def test_it_reports_the_slowest_groups(self):
+        output = run_specs(ExampleProfiler(StringIO(), groups=1))
+        self.assertTrue('Slowest 1 example groups, by profiled time:' in output)
+        groups = output.split('Slowest 1 example groups')[1]
+        self.assertTrue(__name__ + ':Cake' in groups)
+        self.assertFalse(__name__ + ':Pie' in groups)
+
+    def test_it_writes_a_pstats_file(self):
+        path = os.path.join(self.directory, 'profiles', 'run.pstats')
+        run_specs(ExampleProfiler(StringIO(), path=path))
+        functions = [name for filename, line, name in pstats.Stats(path).stats]
+        self.assertTrue('make_fixture' in functions)
+
+    def test_it_reports_nothing_without_examples(self):
+        profiler = ExampleProfiler(StringIO())
+        profiler.finalize()
+        self.assertEqual(profiler.stdout.getvalue(), '')
+
+    def test_it_formats_functions_like_pstats(self):
+        self.assertEqual(format_function(('~', 0, '<time.sleep>')), '{time.sleep}')
+        self.assertEqual(format_function((os.path.join(os.getcwd(), 'cake_spec.py'), 3, 'it_is_sweet')),
+                         'cake_spec.py:3(it_is_sweet)')
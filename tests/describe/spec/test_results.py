@@ -0,0 +1,190 @@
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+from cStringIO import StringIO
+
+from mock import Mock
+
+from describe.spec.containers import Example, ExampleGroup
+from describe.spec.runners import ExampleRunner
+from describe.spec.formatters import StandardResultsFormatter
+from describe.spec.results import ResultRecorder, ExampleResult, GroupResult, RemoteError, replay, tally, \
+        dump_results, load_results, merge_results, ResultFileWriter, ResultFileError, ResultStore, StringArena
+
+
+def run_group(formatter):
+    def it_passes():
+        pass
+
+    def it_fails():
+        raise TypeError('boom')
+
+    group = ExampleGroup('DescribeCake', examples=[
+        Example(it_passes), Example(it_fails), Example(None),
+    ])
+    ExampleRunner(group, formatter).run()
+    return formatter
+
+
+class DescribeResultRecorder(TestCase):
+    def test_it_records_picklable_events(self):
+        recorder = run_group(ResultRecorder())
+        events = pickle.loads(pickle.dumps(recorder.events))
+
+        self.assertEqual([method for method, result in events], [
+            'start_example_group', 'record_example', 'record_example',
+            'skip_example', 'end_example_group',
+        ])
+        self.assertTrue(isinstance(events[2][1].error, RemoteError))
+        self.assertTrue('TypeError: boom' in events[2][1].traceback)
+
+    def test_it_tallies_events(self):
+        recorder = run_group(ResultRecorder())
+        self.assertEqual(tally(recorder.events), (1, 1, 1))
+
+    def test_it_replays_into_a_formatter_like_a_direct_run(self):
+        direct = run_group(StandardResultsFormatter(StringIO()))
+        replayed = StandardResultsFormatter(StringIO())
+        replay(run_group(ResultRecorder()).events, replayed)
+
+        direct.finalize()
+        replayed.finalize()
+        self.assertEqual(direct.stdout.getvalue(), replayed.stdout.getvalue())
+
+
+class DescribeStringArena(TestCase):
+    def test_it_returns_stored_strings_by_index(self):
+        arena = StringArena()
+        indexes = [arena.add('foo'), arena.add(None), arena.add(u'caf\xe9'), arena.add('')]
+        self.assertEqual([arena.get(i) for i in indexes], ['foo', None, 'caf\xc3\xa9', ''])
+
+    def test_it_stores_short_strings_once(self):
+        arena = StringArena()
+        self.assertEqual(arena.add('foo'), arena.add('foo'))
+        self.assertEqual(len(arena), 1)
+
+    def test_it_stores_long_strings_every_time(self):
+        arena = StringArena()
+        long_string = 'x' * (arena.dedupe_length + 1)
+        self.assertNotEqual(arena.add(long_string), arena.add(long_string))
+
+    def test_it_pickles_without_its_index_of_short_strings(self):
+        arena = StringArena()
+        arena.add('foo')
+        copy = pickle.loads(pickle.dumps(arena))
+        self.assertEqual(copy.get(0), 'foo')
+        self.assertEqual(copy.add('bar'), 1)
+
+
+class DescribeResultStore(TestCase):
+    def test_it_stores_results_as_columns(self):
+        store = ResultStore([
+            ('record_example', ExampleResult('it_works', None, '', 'out', None, 1.0, 2.0, 'mod:it_works', 'mod')),
+        ])
+        self.assertEqual(len(store), 1)
+        method, result = store[0]
+        self.assertEqual(method, 'record_example')
+        self.assertEqual(
+            (result.name, result.error, result.traceback, result.stdout, result.stderr),
+            ('it_works', None, None, 'out', None))
+        self.assertEqual((result.user_time, result.real_time, result.key, result.module),
+                         (1.0, 2.0, 'mod:it_works', 'mod'))
+
+    def test_it_stores_errors_as_remote_errors(self):
+        store = ResultStore([('record_example', ExampleResult('it_fails', TypeError('boom'), 'trace'))])
+        error = store[-1][1].error
+        self.assertEqual((error.name, str(error)), ('TypeError', 'boom'))
+        self.assertEqual(store[-1][1].traceback, 'trace')
+
+    def test_it_gives_the_end_of_a_group_the_result_of_its_start(self):
+        store = ResultStore([
+            ('start_example_group', GroupResult('DescribeCake')),
+            ('end_example_group', GroupResult('DescribeCake', RemoteError('TimeoutError'), 'trace', real_time=3)),
+        ])
+        (_, start), (_, end) = list(store)
+        self.assertTrue(start is end)
+        self.assertEqual((end.error.name, end.traceback, end.real_time), ('TimeoutError', 'trace', 3))
+
+    def test_it_raises_index_error_past_its_end(self):
+        self.assertRaises(IndexError, lambda: ResultStore()[0])
+
+    def test_it_stores_phase_times(self):
+        phase_times = (0.5, 1.0, 2.0, 0.25, 0.125)
+        store = ResultStore([
+            ('record_example', ExampleResult('it_works', real_time=4.0, phase_times=phase_times)),
+            ('record_example', ExampleResult('it_was_recorded_before')),
+        ])
+        self.assertEqual(store[0][1].phase_times, phase_times)
+        self.assertEqual(store[0][1].real_time, 4.0)
+        self.assertEqual(store[1][1].phase_times, None)
+
+
+class DescribeResultFiles(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_it_loads_dumped_results(self):
+        recorder = run_group(ResultRecorder())
+        stream = StringIO()
+        dump_results(recorder.events, stream)
+        events = load_results(StringIO(stream.getvalue()))
+
+        self.assertEqual([method for method, result in events], [method for method, result in recorder.events])
+        self.assertTrue(events[0][1] is events[-1][1])
+        self.assertEqual(events[2][1].error.name, 'TypeError')
+        self.assertEqual(events[2][1].traceback, recorder.events[2][1].traceback)
+        self.assertEqual(tally(events), (1, 1, 1))
+
+    def test_it_loads_dumped_phase_times(self):
+        phase_times = (0.5, 1.0, 2.0, 0.25, 0.125)
+        stream = StringIO()
+        dump_results([('record_example', ExampleResult('it_works', phase_times=phase_times))], stream)
+        events = load_results(StringIO(stream.getvalue()))
+        self.assertEqual(events[0][1].phase_times, phase_times)
+
+    def test_it_loads_results_from_before_phase_times(self):
+        document = ('{"format": "describe-results", "version": 1, "events": '
+                    '[["e", "it_works", "m:it_works", "m", null, null, null, null, 1.0, 2.0]]}')
+        method, result = load_results(StringIO(document))[0]
+        self.assertEqual((method, result.name, result.real_time, result.phase_times),
+                         ('record_example', 'it_works', 2.0, None))
+
+    def test_it_rejects_other_files(self):
+        self.assertRaises(ResultFileError, load_results, StringIO('{"foo": 1}'))
+        self.assertRaises(ResultFileError, load_results, StringIO('not json'))
+
+    def test_it_merges_result_files_into_one_report(self):
+        paths = [os.path.join(self.directory, name) for name in ('a.json', 'b.json')]
+        for path in paths:
+            writer = run_group(ResultFileWriter(path))
+            writer.finalize()
+
+        direct = StandardResultsFormatter(StringIO(), '', '', '')
+        run_group(direct)
+        run_group(direct)
+        direct.finalize()
+        merged = StandardResultsFormatter(StringIO(), '', '', '')
+
+        self.assertEqual(merge_results(paths, merged), (2, 2, 2))
+        self.assertEqual(merged.stdout.getvalue().rsplit('Ran', 1)[0], direct.stdout.getvalue().rsplit('Ran', 1)[0])
+        self.assertEqual(merged.num_examples, 4)
+
+
+class DescribeExampleResult(TestCase):
+    def test_it_keeps_assertion_messages(self):
+        example = Mock(name='example', error=AssertionError('expected 1 to be 2'), traceback='')
+        example.name = 'it_works'
+        example.stdout = StringIO('out')
+        example.stderr = None
+        result = ExampleResult.from_example(example)
+
+        self.assertEqual(result.name, 'it_works')
+        self.assertEqual(result.error.name, 'AssertionError')
+        self.assertEqual(str(result.error), 'expected 1 to be 2')
+        self.assertEqual(result.stdout, 'out')
+        self.assertEqual(result.stderr, None)
@@ -4,7 +4,8 @@ from unittest import TestCase
 from mock import Mock, MagicMock, patch
 
 from describe.spec.containers import ExampleGroup, Example
-from describe.spec.runners import ExampleRunner
+from describe.spec.runners import ExampleRunner, FailureLimit, Timeouts, RetentionPolicy
+from describe.spec.utils import TimeoutError, FailureRecord
 
 
 class DescribeExampleRunner(TestCase):
@@ -27,10 +28,9 @@ class DescribeExampleRunner(TestCase):
 class DescribeExampleRunner(TestCase):
     @patch('describe.spec.runners.Benchmark')
     def test_it_records_timings(self, Benchmark):
-        results = [MagicMock(), MagicMock()]
-        results[0].total_time = results[0].stop.return_value = 1
-        results[1].total_time = results[1].stop.return_value = 2
-        Benchmark.side_effect = lambda: results.pop(0)
+        benchmark = Benchmark.return_value = MagicMock()
+        benchmark.total_time = benchmark.stop.return_value = 1
+        benchmark.lap.side_effect = lambda phase: 2 if phase == 'body' else 0
 
         example = Example(Mock(), [], [])
         subject = ExampleRunner(example, Mock())
@@ -102,6 +102,65 @@ class DescribeExampleRunner(TestCase):
         subject = ExampleRunner(example, Mock())
         self.assertFalse(subject.should_skip())
 
+
+class DescribeExampleRunnerWithRetentionPolicy(TestCase):
+    def test_it_releases_the_output_of_passing_examples(self):
+        def testfn():
+            print 'hello world'
+
+        example = Example(testfn, [], [])
+        formatter = Mock()
+        ExampleRunner(example, formatter, retention=RetentionPolicy()).execute()
+
+        formatter.record_example.assert_called_once_with(example)
+        self.assertEqual((example.stdout, example.stderr), (None, None))
+
+    def test_it_keeps_the_output_of_failed_examples(self):
+        def testfn():
+            print 'hello world'
+            raise TypeError('boom')
+
+        example = Example(testfn, [], [])
+        ExampleRunner(example, Mock(), retention=RetentionPolicy()).execute()
+
+        self.assertEqual(example.stdout.getvalue(), 'hello world\n')
+
+    def test_it_keeps_what_it_is_told_to(self):
+        def testfn():
+            cake = 'chocolate'
+            print 'hello world'
+            raise TypeError('boom')
+
+        example = Example(testfn, [], [])
+        ExampleRunner(example, Mock(), retention=RetentionPolicy(keep_output=True, keep_locals=True)).execute()
+
+        self.assertTrue("cake = 'chocolate'" in str(example.traceback))
+        self.assertEqual(example.stdout.getvalue(), 'hello world\n')
+
+
+class DescribeExampleRunnerFailureRecords(TestCase):
+    def test_it_copies_the_traceback_of_failed_examples(self):
+        def testfn():
+            raise TypeError('boom')
+
+        example = Example(testfn, [], [])
+        ExampleRunner(example, Mock()).execute()
+
+        self.assertTrue(isinstance(example.traceback, FailureRecord))
+        self.assertEqual(example.traceback.frames[-1].function, 'testfn')
+        self.assertTrue('TypeError: boom' in str(example.traceback))
+
+    def test_it_copies_the_traceback_of_failed_groups(self):
+        def before(s):
+            raise TypeError('boom')
+
+        group = ExampleGroup(Mock(), before=before, examples=[Example(Mock(), [], [])])
+        ExampleRunner(group, Mock()).execute()
+
+        self.assertTrue(isinstance(group.traceback, FailureRecord))
+        self.assertEqual(group.traceback.frames[-1].function, 'before')
+
+
 class DescribeExampleRunnerInteractingWithFormatterAndExample(TestCase):
     @patch('describe.spec.runners.Benchmark')
     def test_it_records_success_run_to_formatter(self, Benchmark):
@@ -176,3 +235,226 @@ class DescribeExampleRunnerInteractingWithFormatterAndExampleGroup(TestCase):
 
         formatter.skip_example_group.assert_called_once_with(example)
 
+
+
+class DescribeExampleRunnerWithFailureLimit(TestCase):
+    def test_it_counts_failures(self):
+        def testfn():
+            raise TypeError('idk')
+
+        successes, failures, skipped = ExampleRunner(Example(testfn), Mock()).run()
+        self.assertEqual((successes, failures, skipped), (0, 1, 0))
+
+    def test_it_stops_running_examples_once_reached_but_runs_after_all(self):
+        ran, after_all = [], Mock()
+        def failing():
+            ran.append('failing')
+            raise TypeError('idk')
+        def passing():
+            ran.append('passing')
+
+        limit = FailureLimit(1)
+        group = ExampleGroup('DescribeCake', after=after_all, examples=[
+            Example(failing), Example(passing),
+        ])
+        successes, failures, skipped = ExampleRunner(group, Mock(), limit).run()
+
+        self.assertEqual(ran, ['failing'])
+        self.assertEqual((successes, failures, skipped), (0, 1, 0))
+        self.assertTrue(limit.reached)
+        after_all.assert_called_once_with()
+
+
+class DescribeExampleRunnerWithTimeouts(TestCase):
+    def test_it_fails_examples_that_time_out_and_continues(self):
+        import time
+        ran = []
+        def sleeping():
+            time.sleep(5)
+        def passing():
+            ran.append('passing')
+        formatter = Mock()
+        group = ExampleGroup('DescribeCake', examples=[Example(sleeping), Example(passing)])
+
+        result = ExampleRunner(group, formatter, timeouts=Timeouts(example=0.05)).run()
+
+        self.assertEqual(result, (1, 1, 0))
+        self.assertEqual(ran, ['passing'])
+        example = formatter.record_example.call_args_list[0][0][0]
+        self.assertTrue(isinstance(example.error, TimeoutError))
+
+    def test_it_stops_groups_that_time_out(self):
+        import time
+        ran = []
+        def slow():
+            ran.append('slow')
+            time.sleep(5)
+        formatter = Mock()
+        skipped = Example(slow)
+        group = ExampleGroup('DescribeCake', examples=[
+            ExampleGroup('ContextSlow', timeout=0.05, after=lambda: ran.append('after_all'),
+                         examples=[Example(slow), skipped]),
+            Example(lambda: ran.append('after')),
+        ])
+
+        result = ExampleRunner(group, formatter, timeouts=Timeouts(example=5)).run()
+
+        # the example that timed out and its group both fail, the rest of the group is skipped.
+        self.assertEqual(result, (1, 2, 1))
+        self.assertEqual(ran, ['slow', 'after_all', 'after'])
+        self.assertTrue(isinstance(group.examples[0].error, TimeoutError))
+        formatter.skip_example.assert_called_once_with(skipped)
+
+    def test_it_skips_the_nested_groups_of_groups_that_time_out(self):
+        import time
+        ran = []
+        def slow():
+            time.sleep(5)
+        formatter = Mock()
+        inner = ExampleGroup('ContextInner', after=lambda: ran.append('inner'), examples=[Example(slow)])
+        nested = ExampleGroup('ContextNested', examples=[Example(lambda: ran.append('nested'))])
+        slow_group = ExampleGroup('ContextSlow', timeout=0.05, after=lambda: ran.append('slow'),
+                                  examples=[inner, nested])
+
+        result = ExampleRunner(ExampleGroup('DescribeCake', examples=[slow_group]), formatter,
+                               timeouts=Timeouts(example=5)).run()
+
+        self.assertEqual(result, (0, 2, 1))
+        self.assertEqual(ran, ['inner', 'slow'])
+        self.assertEqual(inner.error, None)
+        self.assertTrue(isinstance(slow_group.error, TimeoutError))
+        formatter.skip_example_group.assert_called_once_with(nested)
+
+    def run_slowly_recorded_group(self, formatter):
+        ran = []
+        slow_group = ExampleGroup('ContextSlow', timeout=0.05, examples=[
+            Example(lambda: ran.append('first')), Example(lambda: ran.append('second')),
+        ])
+        group = ExampleGroup('DescribeCake', examples=[slow_group, Example(lambda: ran.append('after'))])
+
+        result = ExampleRunner(group, formatter, timeouts=Timeouts(example=5)).run()
+
+        self.assertEqual(result, (2, 2, 0))
+        self.assertEqual(ran, ['first', 'after'])
+        self.assertTrue(isinstance(slow_group.error, TimeoutError))
+        self.assertTrue(isinstance(slow_group.examples[1].error, TimeoutError))
+
+    def test_it_stops_groups_that_time_out_while_formatters_record_results(self):
+        import time
+        formatter = Mock()
+        formatter.record_example.side_effect = lambda example: time.sleep(0.1)
+        self.run_slowly_recorded_group(formatter)
+
+    @patch('describe.spec.runners.Benchmark')
+    def test_it_stops_groups_that_time_out_while_results_are_timed(self, Benchmark):
+        import time
+        benchmark = Benchmark.return_value = MagicMock()
+        benchmark.phase_times.side_effect = lambda: time.sleep(0.1)
+        self.run_slowly_recorded_group(Mock())
+
+    def test_it_prefers_the_timeout_of_the_example(self):
+        timeouts = Timeouts(example=1, group=2)
+        self.assertEqual(timeouts.for_example(Example(None, timeout=3)), 3)
+        self.assertEqual(timeouts.for_example(Example(None)), 1)
+        self.assertEqual(timeouts.for_example(ExampleGroup(None), is_group=True), 2)
+
+
+class DescribeExampleRunnerWithLazyGroups(TestCase):
+    def test_it_loads_groups_when_it_gets_to_them_and_releases_them_after(self):
+        ran = []
+        def loader():
+            ran.append('load')
+            return [Example(lambda: ran.append('inner'))]
+        inner = ExampleGroup('ContextInner', before=lambda: ran.append('before'), loader=loader)
+        group = ExampleGroup('DescribeCake', examples=[Example(lambda: ran.append('outer')), inner])
+
+        result = ExampleRunner(group, Mock()).run()
+
+        self.assertEqual(result, (2, 0, 0))
+        self.assertEqual(ran, ['outer', 'load', 'before', 'inner'])
+        self.assertFalse(inner.is_loaded)
+
+    def test_it_skips_lazy_groups_without_examples(self):
+        formatter = Mock()
+        inner = ExampleGroup('ContextEmpty', loader=list)
+        group = ExampleGroup('DescribeCake', examples=[inner])
+
+        self.assertEqual(ExampleRunner(group, formatter).run(), (0, 0, 1))
+        formatter.skip_example_group.assert_called_once_with(inner)
+
+    def test_it_stops_outer_groups_that_time_out_inside_lazy_groups(self):
+        import time
+        ran = []
+        def slow():
+            ran.append('slow')
+            time.sleep(5)
+        inner = ExampleGroup('ContextInner', loader=lambda: [Example(slow), Example(slow)])
+        slow_group = ExampleGroup('ContextSlow', timeout=0.05, examples=[inner])
+        group = ExampleGroup('DescribeCake', examples=[slow_group, Example(lambda: ran.append('after'))])
+
+        result = ExampleRunner(group, Mock(), timeouts=Timeouts(example=5)).run()
+
+        self.assertEqual(result, (1, 2, 1))
+        self.assertEqual(ran, ['slow', 'after'])
+        self.assertTrue(isinstance(slow_group.error, TimeoutError))
+        self.assertEqual(inner.error, None)
+
+    def test_it_stops_lazy_groups_once_the_failure_limit_is_reached(self):
+        def failing():
+            raise TypeError('boom')
+        inner = ExampleGroup('ContextInner', loader=lambda: [Example(failing), Example(failing)])
+        group = ExampleGroup('DescribeCake', examples=[inner])
+
+        result = ExampleRunner(group, Mock(), failure_limit=FailureLimit(1)).run()
+
+        self.assertEqual(result, (0, 1, 0))
+
+
+class DescribeExampleRunnerPhaseTimes(TestCase):
+    @patch('describe.spec.utils.clock')
+    def test_it_times_the_hooks_of_examples_separately(self, clock):
+        clock.side_effect = iter(range(100)).next
+        example = Example(Mock(), before=[Mock()], after=[Mock()])
+        ExampleRunner(example, Mock()).run()
+
+        self.assertEqual(example.phase_times, (0.0, 1, 1, 1, 0.0))
+        self.assertEqual((example.user_time, example.real_time), (1, 4))
+
+    @patch('describe.spec.utils.clock')
+    def test_it_times_the_hooks_of_groups_without_their_examples(self, clock):
+        clock.side_effect = iter(range(100)).next
+        example = Example(Mock())
+        group = ExampleGroup(Mock(), before=Mock(), after=Mock(), examples=[example])
+        ExampleRunner(group, Mock()).run()
+
+        self.assertEqual(example.real_time, 2)
+        self.assertEqual(group.phase_times, (0.0, 1, 4, 1, 0.0))
+        self.assertEqual(group.real_time, 7)
+
+
+class DescribeExampleRunnerWithProfiler(TestCase):
+    def test_it_profiles_examples_while_they_run(self):
+        profiler = Mock()
+        calls = []
+        profiler.enable.side_effect = lambda example: calls.append('enable')
+        profiler.disable.side_effect = lambda: calls.append('disable')
+        example = Example(lambda: calls.append('example'), before=[lambda: calls.append('before')])
+        ExampleRunner(example, Mock(), profiler=profiler).run()
+
+        self.assertEqual(calls, ['enable', 'before', 'example', 'disable'])
+        profiler.enable.assert_called_once_with(example)
+
+
+class DescribeFailureLimit(TestCase):
+    def test_it_is_reached_after_max_failures(self):
+        limit = FailureLimit(2)
+        limit.record_failure()
+        self.assertFalse(limit.reached)
+        limit.record_failure()
+        self.assertTrue(limit.reached)
+
+    def test_it_can_share_the_count(self):
+        import multiprocessing
+        count = multiprocessing.Value('i', 0)
+        FailureLimit(2, count).record_failure()
+        self.assertEqual(FailureLimit(2, count).num_failures, 1)
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+from unittest import TestCase
+from cStringIO import StringIO
+
+from mock import Mock
+
+from describe.spec.sampling import StackSampler, frame_label, safe_filename
+
+
+class DescribeStackSampler(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.sampler = StackSampler(self.directory, stdout=StringIO())
+
+    def tearDown(self):
+        self.sampler.stop()
+        shutil.rmtree(self.directory)
+
+    def sample_here(self):
+        self.sampler._sample(None, sys._getframe())
+
+    def test_it_tags_samples_with_the_running_example(self):
+        self.sampler.enable(Mock(key='cake_spec:DescribeCake.it_is_sweet'))
+        self.sample_here()
+        self.sample_here()
+        self.sampler.disable()
+        self.sample_here()
+
+        drained = self.sampler.drain()
+        self.assertEqual(sorted(drained, key=str), [None, 'cake_spec:DescribeCake.it_is_sweet'])
+        (stack, count), = drained['cake_spec:DescribeCake.it_is_sweet'].items()
+        self.assertEqual(count, 2)
+        self.assertTrue(stack.endswith(';' + frame_label(self.sample_here.__func__.__code__)), stack)
+        self.assertEqual(self.sampler.drain(), {})
+
+    def test_it_writes_folded_stacks_for_the_run_and_every_example(self):
+        stale = os.path.join(self.directory, 'examples', 'old.folded')
+        os.makedirs(os.path.dirname(stale))
+        open(stale, 'w').close()
+        self.sampler.merge({
+            None: {'main;import_specs': 1},
+            'cake_spec:DescribeCake.it_is_sweet': {'main;it_is_sweet': 2},
+        })
+        self.sampler.merge({'cake_spec:DescribeCake.it_is_sweet': {'main;it_is_sweet': 1, 'main;sugar': 4}})
+        self.sampler.finalize()
+
+        with open(os.path.join(self.directory, 'run.folded')) as handle:
+            self.assertEqual(handle.read(), 'main;import_specs 1\nmain;it_is_sweet 3\nmain;sugar 4\n')
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'examples')),
+                         ['cake_spec_DescribeCake.it_is_sweet.folded'])
+        self.assertTrue('Wrote 8 stack samples of 1 examples' in self.sampler.stdout.getvalue())
+
+    def test_it_samples_while_running(self):
+        if not StackSampler.is_supported():
+            return
+        self.sampler.interval = 0.001
+        self.sampler.start()
+        self.sampler.enable(Mock(key='busy'))
+        start = time.clock()
+        while time.clock() - start < 0.1 and not self.sampler._counts:
+            pass
+        self.sampler.stop()
+        self.assertTrue('busy' in self.sampler.drain())
+
+    def test_it_names_files_after_example_keys(self):
+        self.assertEqual(safe_filename('cake_spec:DescribeCake.it_is_sweet'), 'cake_spec_DescribeCake.it_is_sweet')
+        self.assertEqual(safe_filename('a/b:c d'), 'a_b_c_d')
@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from describe.spec.selection import Selection, get_tags
+from describe.spec.index import IndexEntry, Outline
+
+
+class DescribeGetTags(TestCase):
+    def test_it_reads_the_tags_attribute(self):
+        class DescribeSlow:
+            tags = ('slow', 'db')
+        self.assertEqual(get_tags(DescribeSlow), frozenset(['slow', 'db']))
+
+    def test_it_accepts_a_single_string(self):
+        class DescribeSlow:
+            tags = 'slow'
+        self.assertEqual(get_tags(DescribeSlow), frozenset(['slow']))
+
+    def test_it_is_empty_without_tags(self):
+        self.assertEqual(get_tags(object()), frozenset())
+
+
+class DescribeSelection(TestCase):
+    names = ('DescribeCake', 'WhenFrosted', 'it_is_sweet')
+
+    def test_it_is_false_when_empty(self):
+        self.assertFalse(Selection())
+        self.assertTrue(Selection(['cake']))
+        self.assertTrue(Selection(excluded_tags=['slow']))
+
+    def test_it_selects_everything_when_empty(self):
+        self.assertTrue(Selection().matches('cake_spec', self.names))
+
+    def test_it_matches_substrings_of_the_prettyprinted_path(self):
+        self.assertTrue(Selection(['cake when frosted']).matches('cake_spec', self.names))
+        self.assertTrue(Selection(['Frosted It']).matches('cake_spec', self.names))
+        self.assertFalse(Selection(['when baked']).matches('cake_spec', self.names))
+
+    def test_it_matches_substrings_of_the_key(self):
+        self.assertTrue(Selection(['cake_spec:DescribeCake.WhenFrosted']).matches('cake_spec', self.names))
+
+    def test_it_matches_regular_expressions(self):
+        self.assertTrue(Selection([r'^describe cake .* sweet$']).matches('cake_spec', self.names))
+        self.assertFalse(Selection([r'^when']).matches('cake_spec', self.names))
+
+    def test_it_matches_any_expression(self):
+        self.assertTrue(Selection(['pie', 'sweet']).matches('cake_spec', self.names))
+
+    def test_it_treats_invalid_regular_expressions_as_substrings(self):
+        self.assertFalse(Selection(['sweet(']).matches('cake_spec', self.names))
+        self.assertTrue(Selection(['spec(']).matches('cake_spec(', self.names))
+
+    def test_it_selects_by_tags(self):
+        subject = Selection(tags=['slow'], excluded_tags=['broken'])
+        self.assertTrue(subject.matches('cake_spec', self.names, frozenset(['slow'])))
+        self.assertFalse(subject.matches('cake_spec', self.names, frozenset()))
+        self.assertFalse(subject.matches('cake_spec', self.names, frozenset(['slow', 'broken'])))
+
+    def test_it_selects_entries_with_selected_examples(self):
+        entry = IndexEntry('cake_spec.py', 'cake_spec', 1, 1, [
+            Outline('DescribeCake', True, False, [
+                Outline('WhenFrosted', True, False, [Outline('it_is_sweet')], tags=['slow']),
+                Outline('it_is_tasty'),
+            ]),
+        ])
+        self.assertTrue(Selection(['frosted it is sweet']).selects(entry))
+        self.assertTrue(Selection(tags=['slow']).selects(entry))
+        self.assertFalse(Selection(['tasty'], tags=['slow']).selects(entry))
+        self.assertFalse(Selection(['pie']).selects(entry))
+
+    def test_it_collects_the_names_of_selected_examples_and_their_groups(self):
+        outline = Outline('DescribeCake', True, False, [
+            Outline('WhenFrosted', True, False, [Outline('it_is_sweet')], tags=['slow']),
+            Outline('it_is_tasty'),
+        ])
+        self.assertEqual(Selection(tags=['slow']).selected_names('cake_spec', outline), set([
+            ('DescribeCake',), ('DescribeCake', 'WhenFrosted'), ('DescribeCake', 'WhenFrosted', 'it_is_sweet'),
+        ]))
+        self.assertEqual(Selection(['pie']).selected_names('cake_spec', outline), set())
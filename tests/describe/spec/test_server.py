@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import multiprocessing
+from unittest import TestCase
+from cStringIO import StringIO
+
+from describe.spec.server import SpecServer, SpecClient, write_frame, read_frame, default_socket_path
+
+
+def echo_args(args):
+    print 'ran', ' '.join(args), 'in', os.getcwd()
+    return len(args)
+
+
+def serve(path, count):
+    server = SpecServer(path, echo_args).listen()
+    for _ in range(count):
+        server.serve_one()
+    server.close()
+
+
+class DescribeFrames(TestCase):
+    def test_it_reads_written_frames(self):
+        stream = StringIO()
+        write_frame(stream, 'out', 'hello\nworld')
+        write_frame(stream, 'exit', '0')
+        stream.seek(0)
+
+        self.assertEqual(read_frame(stream), ('out', 'hello\nworld'))
+        self.assertEqual(read_frame(stream), ('exit', '0'))
+        self.assertEqual(read_frame(stream), (None, None))
+
+    def test_it_defaults_the_socket_path_to_the_describe_directory(self):
+        self.assertEqual(default_socket_path('/foo'), '/foo/.describe/server.sock')
+
+
+class DescribeSpecServer(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'server.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def start_server(self, count):
+        process = multiprocessing.Process(target=serve, args=(self.path, count))
+        process.start()
+        for _ in range(100):
+            if os.path.exists(self.path):
+                break
+            process.join(0.05)
+        return process
+
+    def test_it_runs_each_request_in_a_child_and_streams_its_output(self):
+        process = self.start_server(2)
+        try:
+            for args in (['a', 'b'], ['c']):
+                stdout = StringIO()
+                code = SpecClient(self.path, stdout).run(args, cwd=self.directory)
+
+                self.assertEqual(code, len(args))
+                self.assertEqual(stdout.getvalue(), 'ran %s in %s\n' % (' '.join(args), self.directory))
+        finally:
+            process.join(5)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_client_raises_without_a_server(self):
+        import socket
+        with self.assertRaises(socket.error):
+            SpecClient(self.path).run([])
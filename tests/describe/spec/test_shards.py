@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from describe.spec.shards import Shard, stable_hash
+
+
+def history_of(durations):
+    history = Mock()
+    history.duration.side_effect = lambda kind, key: durations.get(key)
+    history.estimates.side_effect = lambda keys, kind: [durations.get(key, 1.0) for key in keys]
+    return history
+
+
+class DescribeShard(TestCase):
+    def test_it_parses_index_and_count(self):
+        shard = Shard.parse('2/8')
+        self.assertEqual((shard.index, shard.count), (2, 8))
+
+    def test_it_rejects_invalid_shards(self):
+        for value in ('0/2', '3/2', '1/0', '1', 'a/b'):
+            self.assertRaises(ValueError, Shard.parse, value)
+
+    def test_it_covers_every_file_exactly_once_without_history(self):
+        keys = ['spec%d' % i for i in range(50)]
+        assignments = Shard(1, 4).assign(keys)
+        for i in range(1, 5):
+            self.assertEqual(Shard(i, 4).assign(keys), assignments)
+        self.assertEqual(sorted(assignments), sorted(keys))
+        self.assertEqual(set(assignments.values()), set([1, 2, 3, 4]))
+
+    def test_it_uses_a_stable_hash_without_history(self):
+        self.assertEqual(Shard(1, 3).assign(['cake_spec']), {'cake_spec': stable_hash('cake_spec') % 3 + 1})
+
+    def test_it_balances_by_duration_with_history(self):
+        history = history_of({'a': 8.0, 'b': 4.0, 'c': 3.0, 'd': 1.0})
+        assignments = Shard(1, 2, history).assign(['d', 'c', 'b', 'a'])
+        self.assertEqual(assignments, {'a': 1, 'b': 2, 'c': 2, 'd': 2})
+
+    def test_it_selects_spec_files_of_its_shard(self):
+        history = history_of({'a': 8.0, 'b': 4.0})
+        spec_files = [('/dir', '/dir/a.py', 'a'), ('/dir', '/dir/b.py', 'b')]
+        self.assertEqual(Shard(1, 2, history).select(spec_files), spec_files[:1])
+        self.assertEqual(Shard(2, 2, history).select(spec_files), spec_files[1:])
@@ -0,0 +1,147 @@
+from unittest import TestCase
+from textwrap import dedent
+
+from describe.spec.static import StaticSpecFinder
+from describe.spec.index import Outline
+
+
+class DescribeStaticSpecFinder(TestCase):
+    def setUp(self):
+        self.subject = StaticSpecFinder()
+
+    def outline(self, source):
+        return self.subject.outline_source(dedent(source))
+
+    def test_it_outlines_spec_classes_and_examples(self):
+        self.assertEqual(self.outline("""
+            from describe import expect
+
+            class DescribeCake(object):
+                def it_is_tasty(self):
+                    pass
+
+                def helper(self):
+                    pass
+
+                class ContextWithFrosting:
+                    def before_each(self):
+                        pass
+
+                    def it_is_sweet(self):
+                        pass
+
+            def it_works_at_module_level():
+                pass
+
+            class Helper(object):
+                pass
+        """), [
+            Outline('DescribeCake', True, False, [
+                Outline('ContextWithFrosting', True, True, [Outline('it_is_sweet')]),
+                Outline('it_is_tasty'),
+            ]),
+            Outline('it_works_at_module_level'),
+        ])
+
+    def test_it_sorts_like_dir(self):
+        outlines = self.outline("""
+            class DescribeB: pass
+            class DescribeA: pass
+            class Describe_C: pass
+        """)
+        self.assertEqual([outline.name for outline in outlines], ['DescribeA', 'DescribeB', 'Describe_C'])
+
+    def test_it_uses_the_last_definition(self):
+        outlines = self.outline("""
+            class DescribeCake:
+                def it_is_tasty(self): pass
+            class DescribeCake:
+                def it_is_sweet(self): pass
+        """)
+        self.assertEqual([child.name for child in outlines[0].children], ['it_is_sweet'])
+
+    def test_it_includes_examples_inherited_from_classes_in_the_file(self):
+        outlines = self.outline("""
+            class SharedExamples(object):
+                def before_all(self): pass
+                def it_is_shared(self): pass
+
+            class DescribeCake(SharedExamples):
+                def it_is_tasty(self): pass
+        """)
+        self.assertEqual(outlines, [
+            Outline('DescribeCake', True, True, [Outline('it_is_shared'), Outline('it_is_tasty')]),
+        ])
+
+    def test_it_reads_literal_tags(self):
+        self.assertEqual(self.outline("""
+            class Slow(object):
+                tags = 'slow'
+
+            class DescribeCake(Slow):
+                def it_is_tasty(self): pass
+                it_is_tasty.tags = ['db', 'network']
+        """), [
+            Outline('DescribeCake', True, False, [Outline('it_is_tasty', tags=['db', 'network'])], tags=['slow']),
+        ])
+
+    def test_it_gives_up_on_computed_tags(self):
+        self.assertEqual(self.outline("""
+            class DescribeCake:
+                tags = compute_tags()
+        """), None)
+
+    def test_it_gives_up_on_bases_from_other_modules(self):
+        self.assertEqual(self.outline("""
+            from shared import SharedExamples
+            class DescribeCake(SharedExamples):
+                def it_is_tasty(self): pass
+        """), None)
+
+    def test_it_ignores_unknown_bases_of_other_classes(self):
+        self.assertEqual(self.outline("""
+            from shared import Base
+            class Helper(Base): pass
+        """), [])
+
+    def test_it_gives_up_on_star_imports(self):
+        self.assertEqual(self.outline("from other_spec import *\n"), None)
+
+    def test_it_gives_up_on_imported_specs(self):
+        self.assertEqual(self.outline("from other_spec import DescribeCake\n"), None)
+
+    def test_it_gives_up_on_conditional_specs(self):
+        self.assertEqual(self.outline("""
+            import sys
+            if sys.platform == 'win32':
+                class DescribeWindows: pass
+        """), None)
+
+    def test_it_gives_up_on_assigned_specs(self):
+        self.assertEqual(self.outline("""
+            class DescribeCake:
+                it_is_tasty = make_example()
+        """), None)
+
+    def test_it_gives_up_on_decorated_spec_classes(self):
+        self.assertEqual(self.outline("""
+            @register
+            class DescribeCake: pass
+        """), None)
+
+    def test_it_gives_up_on_examples_that_are_properties(self):
+        self.assertEqual(self.outline("""
+            class DescribeCake:
+                @property
+                def it_is_tasty(self): pass
+        """), None)
+
+    def test_it_gives_up_on_changing_the_namespace(self):
+        self.assertEqual(self.outline("setattr(module, 'DescribeCake', None)\n"), None)
+        self.assertEqual(self.outline("exec 'class DescribeCake: pass'\n"), None)
+
+    def test_it_gives_up_on_syntax_errors(self):
+        self.assertEqual(self.outline("class DescribeCake(:\n"), None)
+
+    def test_it_returns_none_for_missing_files(self):
+        self.assertEqual(self.subject.outline_file('/does/not/exist_spec.py'), None)
@@ -0,0 +1,82 @@
+import os
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+from cStringIO import StringIO
+
+from mock import Mock
+
+from describe.spec.tracing import Tracer, TracingFormatter
+from describe.spec.utils import Benchmark, EXAMPLE_PHASE_NAMES, GROUP_PHASE_NAMES
+
+
+class DescribeTracer(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tracer = Tracer(os.path.join(self.directory, 'trace.json'), stdout=StringIO())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def names(self, spans):
+        return [span[0] for span in spans]
+
+    def test_it_adds_spans_for_with_blocks(self):
+        with self.tracer.span('cake_spec', 'import', file='cake_spec.py'):
+            pass
+        (name, category, start, end, tid, args), = self.tracer.spans
+        self.assertEqual((name, category, tid, args), ('cake_spec', 'import', 0, {'file': 'cake_spec.py'}))
+        self.assertTrue(start <= end)
+
+    def test_it_adds_spans_for_the_laps_of_a_benchmark(self):
+        benchmark = Benchmark(keep_laps=True).start()
+        benchmark.lap('setup')
+        benchmark.lap('body')
+        benchmark.stop()
+
+        self.tracer.add_benchmark('DescribeCake', 'group', benchmark, GROUP_PHASE_NAMES)
+        self.tracer.add_benchmark('it_is_sweet', 'example', benchmark, EXAMPLE_PHASE_NAMES)
+
+        self.assertEqual(self.names(self.tracer.spans),
+                         ['DescribeCake', 'before_all', 'examples', 'it_is_sweet', 'before_each', 'body'])
+        self.assertEqual(self.tracer.spans[0][2:4], benchmark.span)
+
+    def test_it_merges_the_spans_drained_from_another_track(self):
+        worker = Tracer()
+        worker.track(1, 'worker 0')
+        worker.add('it_is_sweet', 'example', 1.0, 2.0)
+
+        self.tracer.merge(worker.drain())
+
+        self.assertEqual(worker.spans, [])
+        self.assertEqual(self.tracer.tracks, {0: 'main', 1: 'worker 0'})
+        self.assertEqual(self.tracer.spans, [('it_is_sweet', 'example', 1.0, 2.0, 1, None)])
+
+    def test_it_writes_trace_events(self):
+        self.tracer.add('it_is_sweet', 'example', self.tracer.origin + 1, self.tracer.origin + 1.5)
+        self.tracer.save()
+
+        with open(self.tracer.path) as handle:
+            events = json.load(handle)['traceEvents']
+        self.assertIn({'name': 'thread_name', 'ph': 'M', 'pid': self.tracer.pid, 'tid': 0,
+                       'args': {'name': 'main'}}, events)
+        self.assertEqual(events[-1], {'name': 'it_is_sweet', 'cat': 'example', 'ph': 'X', 'pid': self.tracer.pid,
+                                      'tid': 0, 'ts': 1000000.0, 'dur': 500000.0})
+        self.assertIn('Wrote 1 spans to', self.tracer.stdout.getvalue())
+
+
+class DescribeTracingFormatter(TestCase):
+    def test_it_adds_a_span_for_every_call_and_saves_when_finalized(self):
+        formatter, tracer = Mock(), Tracer('trace.json')
+        tracer.save = Mock()
+        subject = TracingFormatter(formatter, tracer)
+
+        self.assertEqual(subject.record_example('example'), formatter.record_example.return_value)
+        subject.finalize()
+
+        formatter.record_example.assert_called_once_with('example')
+        self.assertTrue(formatter.finalize.called)
+        self.assertEqual([span[:2] for span in tracer.spans],
+                         [('record_example', 'formatter'), ('finalize', 'formatter')])
+        tracer.save.assert_called_once_with()
@@ -1,12 +1,17 @@
+import os
 import sys
+import pickle
+import shutil
+import tempfile
 from unittest import TestCase
 from StringIO import StringIO
 from functools import wraps
 
 from mock import Mock, patch
 
-from describe.spec.utils import (tabulate, Benchmark, CallOnce,
-        getargspec, func_equal, accepts_arg, filter_traceback)
+from describe.spec.utils import (tabulate, Benchmark, CallOnce, Timeout, TimeoutError, UserCode,
+        getargspec, func_equal, accepts_arg, filter_traceback, str_traceback, format_stacks,
+        FailureRecord, FrameRecord, native_string, describe_path, ensure_directory)
 
 
 class DescribeFilteredTraceback(TestCase):
@@ -29,6 +34,52 @@ class DescribeFilteredTraceback(TestCase):
 
         self.assertEqual(filter_traceback(Mock(), tb), "bar")
 
+def raise_error():
+    numbers = range(1000)
+    raise ValueError('bad')
+
+
+class DescribeFailureRecord(TestCase):
+    def setUp(self):
+        try:
+            raise_error()
+        except ValueError as e:
+            self.error, self.traceback = e, sys.exc_info()[2]
+
+    def tearDown(self):
+        self.traceback = None
+
+    def test_it_formats_like_filter_traceback(self):
+        for package in ('describe', 'tests'):
+            record = FailureRecord.capture(self.error, self.traceback, ignore_pkg=package)
+            self.assertEqual(record.format(), filter_traceback(self.error, self.traceback, package))
+
+    def test_it_formats_like_str_traceback_when_not_filtered(self):
+        record = FailureRecord.capture(self.error, self.traceback, ignore_pkg='tests')
+        self.assertEqual(record.format(filtered=False), str_traceback(self.error, self.traceback))
+
+    def test_it_is_picklable(self):
+        record = FailureRecord.capture(self.error, self.traceback, with_locals=True)
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+    def test_it_renders_bounded_reprs_of_locals(self):
+        record = FailureRecord.capture(self.error, self.traceback, with_locals=True)
+        self.assertEqual(record.frames[-1].function, 'raise_error')
+        name, value = record.frames[-1].locals[0]
+        self.assertEqual(name, 'numbers')
+        self.assertTrue(len(value) < 100)
+        self.assertTrue('        numbers = [0, 1, 2' in record.format())
+
+    def test_it_can_be_rendered_by_filter_traceback(self):
+        record = FailureRecord([FrameRecord('cake.py', 4, 'it_bakes', 'bake()')], ['ValueError: bad\n'])
+        self.assertEqual(filter_traceback(self.error, record), (
+            'Traceback (most recent call last):\n'
+            '  File "cake.py", line 4, in it_bakes\n'
+            '    bake()\n'
+            'ValueError: bad\n'
+        ))
+
+
 #class DescribeFnReturnsLocals(TestCase):
 #    def test_it_captures_locals_from_function(self):
 #        def foo():
@@ -127,6 +178,26 @@ class DescribeIntegrationGetArgSpec(TestCase):
         self.assertEqual(getargspec(fn), (('a',), None, None, None))
 
 
+class DescribePaths(TestCase):
+    def test_it_returns_paths_in_the_describe_directory(self):
+        self.assertEqual(describe_path('index.json', '/foo'), '/foo/.describe/index.json')
+
+    def test_it_creates_the_directory_of_a_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, '.describe', 'index.json')
+            ensure_directory(path)
+            ensure_directory(path)
+            self.assertTrue(os.path.isdir(os.path.dirname(path)))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_it_encodes_unicode_into_byte_strings(self):
+        self.assertEqual(native_string(u'caf\xe9'), 'caf\xc3\xa9')
+        self.assertTrue(isinstance(native_string(u'cake'), str))
+        self.assertEqual(native_string(None), None)
+
+
 class DescribeCallOnce(TestCase):
     def test_it_can_call_wrapped_fn_once(self):
         m = Mock()
@@ -296,4 +367,83 @@ class TestBenchmark(TestCase):
         self.assertEqual(len(timer.history), 5)
         self.assertTrue(timer.total_time > 0.09)
 
+    @patch('describe.spec.utils.clock')
+    def test_it_splits_time_into_phases(self, clock):
+        clock.side_effect = iter([10, 11, 13, 16, 20]).next
+        timer = Benchmark().start()
+        self.assertEqual(timer.lap('setup'), 1)
+        timer.lap('body')
+        timer.lap('setup')
+        timer.stop()
+        self.assertEqual(timer.phase_times(('setup', 'body', 'teardown')), (4, 2, 0.0))
+        self.assertEqual(timer.total_time, 10)
+
+    @patch('describe.spec.utils.clock')
+    def test_it_keeps_the_times_of_laps(self, clock):
+        clock.side_effect = iter([10, 11, 13, 16]).next
+        timer = Benchmark(keep_laps=True).start()
+        timer.lap('setup')
+        timer.lap('body')
+        timer.stop()
+        self.assertEqual(timer.laps, [('setup', 10, 11), ('body', 11, 13)])
+        self.assertEqual(timer.span, (10, 16))
+
+    def test_it_ignores_laps_while_stopped(self):
+        timer = Benchmark()
+        self.assertEqual(timer.lap('body'), 0)
+        self.assertEqual(timer.phases, {})
+
+    def test_its_clock_does_not_go_back(self):
+        from describe.spec.utils import clock
+        times = [clock() for i in range(100)]
+        self.assertEqual(times, sorted(times))
+
+
+class DescribeTimeout(TestCase):
+    def test_it_interrupts_blocking_calls(self):
+        import time
+        with self.assertRaises(TimeoutError) as context:
+            with Timeout(0.05, 'it_sleeps'):
+                time.sleep(5)
+        self.assertTrue(str(context.exception).startswith('it_sleeps timed out after 0.05s'))
+        self.assertIn('MainThread', context.exception.stacks)
+        self.assertIn('test_it_interrupts_blocking_calls', context.exception.stacks)
+
+    def test_it_does_nothing_without_seconds(self):
+        with Timeout(None) as timeout:
+            pass
+        self.assertFalse(timeout.active)
+
+    def test_it_keeps_outer_timeouts_running(self):
+        import time
+        outer = Timeout(0.1, 'group')
+        with self.assertRaises(TimeoutError) as context:
+            with outer:
+                with Timeout(0.05, 'first'):
+                    pass
+                with Timeout(5, 'second'):
+                    time.sleep(5)
+        self.assertIs(context.exception.timeout, outer)
+
+    def test_it_only_interrupts_user_code(self):
+        import time
+        user_code = UserCode()
+        with Timeout(0.05, 'group', user_code) as timeout:
+            time.sleep(0.1)
+            self.assertIs(user_code.pending.timeout, timeout)
+            with self.assertRaises(TimeoutError):
+                with user_code:
+                    pass
+            self.assertEqual(user_code.pending, None)
+
+    def test_it_drops_pending_timeouts_once_their_block_finishes(self):
+        import time
+        user_code = UserCode()
+        with Timeout(0.05, 'group', user_code):
+            time.sleep(0.1)
+        self.assertEqual(user_code.pending, None)
+        with user_code:
+            pass
 
+    def test_it_lists_the_stacks_of_all_threads(self):
+        self.assertIn('test_it_lists_the_stacks_of_all_threads', format_stacks())
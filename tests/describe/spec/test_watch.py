@@ -0,0 +1,103 @@
+import os
+import sys
+import shutil
+import tempfile
+from unittest import TestCase
+from cStringIO import StringIO
+
+from mock import Mock
+
+from describe.spec.coordinator import SpecCoordinator
+from describe.spec.formatters import StandardResultsFormatter
+from describe.spec.watch import ImportGraph, SpecWatcher
+
+
+class DescribeImportGraph(TestCase):
+    def setUp(self):
+        self.subject = ImportGraph()
+        self.subject.imports = {
+            'app': set(['app.models', 'os']),
+            'app.models': set(['app.db']),
+            'app.db': set(),
+            'models_spec': set(['app.models']),
+            'other_spec': set(['os']),
+        }
+
+    def test_it_only_has_dependencies_within_the_graph(self):
+        self.assertEqual(self.subject.dependencies('app'), set(['app.models']))
+
+    def test_it_finds_all_dependents(self):
+        self.assertEqual(self.subject.dependents(['app.db']), set([
+            'app', 'app.db', 'app.models', 'models_spec',
+        ]))
+
+    def test_it_orders_dependencies_first(self):
+        self.assertEqual(self.subject.reload_order(['models_spec', 'app.models', 'app.db']), [
+            'app.db', 'app.models', 'models_spec',
+        ])
+
+    def test_it_resolves_relative_imports(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(directory, 'models.py')
+            with open(filepath, 'w') as handle:
+                handle.write('from . import db\nfrom .. import settings\nimport json\n')
+            module = Mock(__name__='app.sub.models', __file__=filepath)
+            self.assertEqual(self.subject.imports_of(module, filepath), set([
+                'app.sub', 'app.sub.db', 'app', 'app.settings', 'json',
+            ]))
+        finally:
+            shutil.rmtree(directory)
+
+
+class DescribeSpecWatcher(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('watched_helper.py', 'VALUE = 1\n')
+        self.write('watched_one_spec.py', 'import watched_helper\n'
+            'class DescribeOne:\n    def it_uses_helper(self):\n        assert watched_helper.VALUE == 1\n')
+        self.write('watched_two_spec.py', 'class DescribeTwo:\n    def it_passes(self):\n        pass\n')
+        self.formatters = []
+        self.subject = SpecWatcher(SpecCoordinator(), self.create_formatter)
+
+    def tearDown(self):
+        for name in ('watched_helper', 'watched_one_spec', 'watched_two_spec', 'watched_three_spec'):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.directory)
+
+    def create_formatter(self):
+        self.formatters.append(StandardResultsFormatter(StringIO()))
+        return self.formatters[-1]
+
+    def write(self, filename, source):
+        filepath = os.path.join(self.directory, filename)
+        mtime = os.path.exists(filepath) and os.stat(filepath).st_mtime
+        with open(filepath, 'w') as handle:
+            handle.write(source)
+        if mtime:
+            os.utime(filepath, (mtime + 1, mtime + 1))
+
+    def test_it_runs_everything_at_first(self):
+        self.assertEqual(self.subject.start([self.directory]), (2, 0, 0))
+
+    def test_it_does_nothing_without_changes(self):
+        self.subject.start([self.directory])
+        self.assertEqual(self.subject.poll(), [])
+        self.assertEqual(len(self.formatters), 1)
+
+    def test_it_reloads_and_runs_spec_files_depending_on_a_changed_module(self):
+        self.subject.start([self.directory])
+        self.write('watched_helper.py', 'VALUE = 2\n')
+
+        spec_files = self.subject.poll()
+        self.assertEqual([spec_file.modulepath for spec_file in spec_files], ['watched_one_spec'])
+        self.assertEqual(sys.modules['watched_helper'].VALUE, 2)
+        self.assertEqual(self.formatters[-1].num_examples, 1)
+        self.assertEqual(self.formatters[-1].num_failed, 1)
+
+    def test_it_runs_new_spec_files(self):
+        self.subject.start([self.directory])
+        self.write('watched_three_spec.py', 'class DescribeThree:\n    def it_passes(self):\n        pass\n')
+
+        spec_files = self.subject.poll()
+        self.assertEqual([spec_file.modulepath for spec_file in spec_files], ['watched_three_spec'])